@@ -0,0 +1,240 @@
+"""Run a stream of connector tasks using a single authenticated OMERO session.
+
+The tasks are read as JSON objects, one per line, each of them having an `action` item
+plus the (long) names of the arguments the action accepts on the command line, e.g.:
+
+```
+{"action": "retrieveChildren", "id": "G:4:Project:12345"}
+{"action": "OMEROtoHRM", "imageid": "G:4:Image:42", "dest": "/data/user/src"}
+{"action": "HRMtoOMERO", "dset": "G:4:Dataset:23", "file": "/data/user/dst/x.ics"}
+```
+
+For every task a JSON line is written to stdout once it has finished, containing the
+number of the task (counting from 1), the action, its return value and everything the
+action printed to stdout (which is captured instead of being passed through):
+
+```
+{"task": 1, "action": "retrieveChildren", "status": true, "output": "[...]"}
+```
+"""
+
+import json
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from loguru import logger as log
+
+from . import cli
+from . import omero as _omero
+from .misc import capture_stdout, printlog
+
+
+def read_tasks(stream):
+    """Parse tasks from a stream of JSON lines, skipping empty lines.
+
+    Parameters
+    ----------
+    stream : iterable(str)
+        The stream to read from, e.g. an open file or `sys.stdin`.
+
+    Yields
+    ------
+    dict or ValueError
+        The parsed task or the error raised when parsing the line failed.
+    """
+    for line in stream:
+        if not line.strip():
+            continue
+        try:
+            task = json.loads(line)
+            if not isinstance(task, dict) or "action" not in task:
+                raise ValueError("task needs to be an object with an 'action' item")
+        except ValueError as err:
+            yield ValueError(f"Malformed task [{line.strip()}]: {err}")
+            continue
+        yield task
+
+
+def task_to_argv(task, user):
+    """Convert a task dict into a list of command line arguments.
+
+    Items with a value of `true` are passed as a flag without a value (e.g. `--compact`
+    for `"compact": true`), the ones being `false` are omitted. Lists are passed as
+    several values of the same argument.
+
+    Parameters
+    ----------
+    task : dict
+        The task as returned by `read_tasks()`.
+    user : str
+        The OMERO user name.
+
+    Returns
+    -------
+    list(str)
+        The arguments as expected by `hrm_omero.cli.arguments_parser()`.
+    """
+    argv = ["--user", user, str(task["action"])]
+    for key, value in task.items():
+        if key == "action" or value is False:
+            continue
+        if value is True:
+            argv.append(f"--{key}")
+            continue
+        values = value if isinstance(value, list) else [value]
+        argv.extend([f"--{key}"] + [str(x) for x in values])
+
+    return argv
+
+
+def prepare_task(task, user, hrm_config):
+    """Validate a task and map it to the function performing it.
+
+    Parameters
+    ----------
+    task : dict or ValueError
+        The task as returned by `read_tasks()`.
+    user : str
+        The OMERO user name.
+    hrm_config : dict
+        A parsed HRM configuration file as returned by `hrm_omero.hrm.parse_config()`.
+
+    Returns
+    -------
+    (callable, dict)
+        The function and the keyword arguments as returned by `cli.select_action()`.
+
+    Raises
+    ------
+    ValueError
+        Raised in case the task is malformed or not a valid action.
+    """
+    if isinstance(task, ValueError):
+        raise task
+
+    argv = task_to_argv(task, user)
+    try:
+        args = cli.arguments_parser().parse_args(argv)
+    except SystemExit:
+        raise ValueError(  # pylint: disable-msg=raise-missing-from
+            f"Invalid arguments for action '{task['action']}': {argv[2:]}"
+        )
+    if args.action not in cli.SESSION_ACTIONS:
+        raise ValueError(f"Action '{args.action}' can't be run in batch mode!")
+
+    return cli.select_action(args, hrm_config)
+
+
+def perform_task(conn, number, task, user, hrm_config):
+    """Perform a single task and assemble its result.
+
+    Parameters
+    ----------
+    conn : omero.gateway.BlitzGateway
+        The OMERO connection object.
+    number : int
+        The number of the task in the stream.
+    task : dict or ValueError
+        The task as returned by `read_tasks()`.
+    user : str
+        The OMERO user name.
+    hrm_config : dict
+        A parsed HRM configuration file as returned by `hrm_omero.hrm.parse_config()`.
+
+    Returns
+    -------
+    dict
+        The result of the task, see the module description for details.
+    """
+    action = task.get("action") if isinstance(task, dict) else None
+    with capture_stdout() as captured:
+        try:
+            perform_action, kwargs = prepare_task(task, user, hrm_config)
+            log.info(f"Batch task {number}: {action} {kwargs}")
+            status = bool(perform_action(conn, **kwargs))
+        except Exception as err:  # pylint: disable-msg=broad-except
+            print(f"ERROR: {err}")
+            log.error(f"Batch task {number} failed: {err}")
+            status = False
+
+    return {
+        "task": number,
+        "action": action,
+        "status": status,
+        "output": captured.getvalue(),
+    }
+
+
+def run_batch(conn, task_file, user, hrm_config, jobs=1):
+    """Run all tasks from a file (or stdin) on one authenticated OMERO session.
+
+    Parameters
+    ----------
+    conn : omero.gateway.BlitzGateway
+        The OMERO connection object.
+    task_file : str
+        The file to read the tasks from, `-` meaning stdin.
+    user : str
+        The OMERO user name.
+    hrm_config : dict
+        A parsed HRM configuration file as returned by `hrm_omero.hrm.parse_config()`.
+    jobs : int, optional
+        The number of tasks to run concurrently, by default 1. Each concurrent worker
+        uses its own connection joining the session of `conn`.
+
+    Returns
+    -------
+    bool
+        True in case all tasks succeeded, False otherwise.
+    """
+    if not conn.isConnected() and not conn.connect():
+        printlog("ERROR", "ERROR: unable to connect to OMERO for running the batch!")
+        return False
+
+    stream = sys.stdin if task_file == "-" else open(task_file, "r", encoding="utf-8")
+    try:
+        if jobs > 1:
+            results = _run_concurrently(
+                conn, read_tasks(stream), user, hrm_config, jobs
+            )
+        else:
+            results = (
+                perform_task(conn, number, task, user, hrm_config)
+                for number, task in enumerate(read_tasks(stream), start=1)
+            )
+        success = True
+        for result in results:
+            print(json.dumps(result), flush=True)
+            success = success and result["status"]
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+    return success
+
+
+def _run_concurrently(conn, tasks, user, hrm_config, jobs):
+    """Run tasks in a thread pool, yielding their results as soon as they finish.
+
+    Every task is performed on a connection from an `omero.ConnectionPool` joining the
+    session of `conn`.
+    """
+
+    def _worker_run(pool, number, task):
+        try:
+            with pool.connection() as worker:
+                return perform_task(worker, number, task, user, hrm_config)
+        except Exception as err:  # pylint: disable-msg=broad-except
+            log.error(f"Batch task {number} failed: {err}")
+            action = task.get("action") if isinstance(task, dict) else None
+            output = f"ERROR: {err}\n"
+            return {"task": number, "action": action, "status": False, "output": output}
+
+    with _omero.ConnectionPool(conn, jobs) as pool:
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            futures = [
+                executor.submit(_worker_run, pool, number, task)
+                for number, task in enumerate(tasks, start=1)
+            ]
+            for future in as_completed(futures):
+                yield future.result()
@@ -4,17 +4,30 @@ import argparse
 import os
 import sys
 
-import omero.gateway
-
 from loguru import logger as log
 
 from .__init__ import __version__
+from . import downloadcache
 from . import formatting
 from . import hrm
+from . import inplace
+from . import metrics
 from . import omero as _omero
+from . import profiling
+from . import sessions
 from . import transfer
+from . import treecache
 from .misc import printlog
 
+SESSION_ACTIONS = (
+    "checkCredentials",
+    "retrieveChildren",
+    "search",
+    "OMEROtoHRM",
+    "HRMtoOMERO",
+)
+"""Actions that are performed on an authenticated OMERO connection."""
+
 
 def bool_to_exitstatus(value):
     """Convert a boolean to a POSIX process exit code.
@@ -82,11 +95,35 @@ def arguments_parser():
         help="print requested action and parameters without actually performing it",
     )
 
-    # required arguments group
+    def profile_target(value):
+        # catch the action being taken as FILE, e.g. `--profile checkCredentials`:
+        if value in subparsers.choices:
+            raise argparse.ArgumentTypeError(
+                f"expecting FILE (or '-' for stderr), got action '{value}'"
+            )
+        return value
+
+    argparser.add_argument(
+        "--profile",
+        type=profile_target,
+        default=None,
+        metavar="FILE",
+        help="write a per-phase timing breakdown as JSON to FILE ('-' for stderr)",
+    )
+
+    argparser.add_argument(
+        "--profile-dump",
+        default=None,
+        metavar="FILE",
+        help="run under cProfile and dump the statistics to FILE",
+    )
+
+    # required arguments group (the user is validated in `parse_args()` as it is
+    # not needed for the `serve` action)
     req_args = argparser.add_argument_group(
         "required arguments", "NOTE: MUST be given before any subcommand!"
     )
-    req_args.add_argument("-u", "--user", required=True, help="OMERO username")
+    req_args.add_argument("-u", "--user", help="OMERO username (except for 'serve')")
 
     subparsers = argparser.add_subparsers(
         help=".",
@@ -106,8 +143,82 @@ def arguments_parser():
     parser_subtree.add_argument(
         "--id",
         type=str,
+        nargs="+",
+        required=True,
+        help='ID(s) of the parent object(s), e.g. "ROOT", "G:4:Experimenter:7"',
+    )
+    parser_subtree.add_argument(
+        "--depth",
+        type=int,
+        default=1,
+        help="the number of levels to retrieve (default: 1)",
+    )
+    parser_subtree.add_argument(
+        "--offset",
+        type=int,
+        default=0,
+        help="the number of (sorted) children to skip (default: 0)",
+    )
+    parser_subtree.add_argument(
+        "--limit",
+        type=int,
+        default=None,
+        help="the maximum number of children, adds their total count to the output",
+    )
+    parser_subtree.add_argument(
+        "--compact",
+        action="store_true",
+        default=False,
+        help="print compact JSON, written incrementally while fetching the children",
+    )
+    parser_subtree.add_argument(
+        "--aggregates",
+        action="store_true",
+        default=False,
+        help="add the number of children and the data size to projects and datasets",
+    )
+    parser_subtree.add_argument(
+        "--since",
+        type=str,
+        default=None,
+        help="only list the changes since an etag (of a previous call) or a timestamp",
+    )
+
+    # search parser
+    parser_search = subparsers.add_parser(
+        "search", help="find projects, datasets and images by name (JSON)"
+    )
+    parser_search.add_argument(
+        "--name",
+        type=str,
         required=True,
-        help='ID of the parent object, e.g. "ROOT", "G:4:Experimenter:7',
+        help="the (case-insensitive) text to search for in the object names",
+    )
+    parser_search.add_argument(
+        "--prefix",
+        action="store_true",
+        default=False,
+        help="only match names starting with the given text",
+    )
+    parser_search.add_argument(
+        "--type",
+        type=str,
+        nargs="+",
+        choices=["Project", "Dataset", "Image"],
+        default=None,
+        help="the type(s) of objects to search for (default: all)",
+    )
+    parser_search.add_argument(
+        "--limit",
+        type=int,
+        default=None,
+        help="the maximum number of results per type (default: 100)",
+    )
+    parser_search.add_argument(
+        "--compact",
+        action="store_true",
+        default=False,
+        help="print compact JSON",
     )
 
     # OMEROtoHRM parser
@@ -117,8 +228,9 @@ def arguments_parser():
     parser_o2h.add_argument(
         "-i",
         "--imageid",
+        nargs="+",
         required=True,
-        help='the OMERO ID of the image to download, e.g. "G:4:Image:42"',
+        help='the OMERO ID(s) of the image(s) to download, e.g. "G:4:Image:42"',
     )
     parser_o2h.add_argument(
         "-d",
@@ -127,6 +239,13 @@ def arguments_parser():
         required=True,
         help="the destination directory where to put the downloaded file",
     )
+    parser_o2h.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=None,
+        help="the number of files to download in parallel (default: 4)",
+    )
 
     # HRMtoOMERO parser
     parser_h2o = subparsers.add_parser(
@@ -161,9 +280,235 @@ def arguments_parser():
         help="annotation text to be added to the image in OMERO",
     )
 
+    # batch parser
+    parser_batch = subparsers.add_parser(
+        "batch", help="run tasks given as JSON lines using a single OMERO session"
+    )
+    parser_batch.add_argument(
+        "-f",
+        "--file",
+        type=str,
+        default="-",
+        help="the file to read the tasks from (default: '-' meaning stdin)",
+    )
+    parser_batch.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="the number of tasks to run concurrently (default: 1)",
+    )
+
+    # serve parser
+    parser_serve = subparsers.add_parser(
+        "serve", help="run as a daemon keeping OMERO sessions open (on a Unix socket)"
+    )
+    parser_serve.add_argument(
+        "-s",
+        "--socket",
+        type=str,
+        required=False,
+        help="the socket to listen on (default: 'OMERO_CONNECTOR_SOCKET' from config)",
+    )
+    parser_serve.add_argument(
+        "--idle-timeout",
+        type=int,
+        default=900,
+        help="seconds after which unused sessions are closed (default: 900)",
+    )
+
     return argparser
 
 
+def parse_args(args):
+    """Parse the commandline arguments and check the user has been specified.
+
+    Parameters
+    ----------
+    args : list(str)
+        The commandline arguments to be parsed.
+
+    Returns
+    -------
+    argparse.Namespace
+        The parsed arguments.
+    """
+    argparser = arguments_parser()
+    parsed = argparser.parse_args(args)
+    if parsed.user is None and parsed.action != "serve":
+        argparser.error("the following arguments are required: -u/--user")
+
+    return parsed
+
+
+def select_action(args, hrm_config):
+    """Map the parsed arguments to the function performing the requested action.
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+        The parsed commandline arguments, see `arguments_parser()`.
+    hrm_config : dict
+        A parsed HRM configuration file as returned by `hrm_omero.hrm.parse_config()`.
+
+    Returns
+    -------
+    (callable, dict) or (None, None)
+        The function to be called with the OMERO connection object as its first
+        argument and a dict with the keyword arguments to pass on, or a tuple of
+        `None` values in case no (valid) action was requested.
+
+    Raises
+    ------
+    ValueError
+        Raised in case the HRM configuration has invalid settings for the action.
+    """
+    if args.action == "checkCredentials":
+        log.trace("checkCredentials")
+        return _omero.check_credentials, {}
+
+    if args.action == "retrieveChildren":
+        log.trace("retrieveChildren")
+        # a single ID is passed on as-is, resulting in the (unchanged) output format:
+        kwargs = {
+            "omero_id": args.id[0] if len(args.id) == 1 else args.id,
+            "tree_cache": treecache.from_config(hrm_config),
+            "depth": args.depth,
+            "offset": args.offset,
+            "limit": args.limit,
+            "compact": args.compact,
+            "aggregates": args.aggregates,
+            "since": args.since,
+        }
+        return formatting.print_children_json, kwargs
+
+    if args.action == "search":
+        log.trace("search")
+        kwargs = {
+            "text": args.name,
+            "prefix": args.prefix,
+            "classes": args.type,
+            "limit": args.limit,
+            "compact": args.compact,
+        }
+        return formatting.print_search_json, kwargs
+
+    if args.action == "OMEROtoHRM":
+        log.trace("OMEROtoHRM")
+        if args.jobs is not None:
+            jobs = positive_int(args.jobs, "--jobs")
+        else:
+            jobs = config_positive_int(
+                hrm_config, "OMERO_CONNECTOR_DOWNLOAD_JOBS", transfer.DOWNLOAD_JOBS
+            )
+        chunk_size = config_positive_int(
+            hrm_config,
+            "OMERO_CONNECTOR_DOWNLOAD_CHUNK_SIZE",
+            transfer.DOWNLOAD_CHUNK_SIZE,
+        )
+        kwargs = {
+            "omero_id": args.imageid[0] if len(args.imageid) == 1 else args.imageid,
+            "dest": args.dest,
+            "jobs": jobs,
+            "chunk_size": chunk_size,
+            "download_cache": downloadcache.from_config(hrm_config),
+            "repository_root": hrm_config.get("OMERO_CONNECTOR_REPOSITORY_ROOT", ""),
+        }
+        return transfer.from_omero, kwargs
+
+    if args.action == "HRMtoOMERO":
+        log.trace("HRMtoOMERO")
+        kwargs = {
+            "omero_id": args.dset,
+            "image_file": args.file,
+            "omero_logfile": hrm_config.get("OMERO_DEBUG_LOG", ""),
+            "tree_cache": treecache.from_config(hrm_config),
+            "inplace": inplace.from_config(hrm_config),
+        }
+        return transfer.to_omero, kwargs
+
+    if args.action == "batch":
+        log.trace("batch")
+        from . import batch  # pylint: disable-msg=import-outside-toplevel
+
+        kwargs = {
+            "task_file": args.file,
+            "user": args.user,
+            "hrm_config": hrm_config,
+            "jobs": args.jobs,
+        }
+        return batch.run_batch, kwargs
+
+    return None, None
+
+
+def positive_int(value, name):
+    """Convert a setting to a positive integer.
+
+    Parameters
+    ----------
+    value : int or str
+        The value to convert.
+    name : str
+        The name of the setting (command line option or config key), used for the error
+        message.
+
+    Returns
+    -------
+    int
+
+    Raises
+    ------
+    ValueError
+        Raised in case the value is not an integer or smaller than 1.
+    """
+    try:
+        number = int(value)
+    except ValueError:
+        number = 0
+    if number < 1:
+        raise ValueError(f"Invalid value for {name}: '{value}' (must be 1 or more).")
+    return number
+
+
+def config_positive_int(hrm_config, key, default):
+    """Get a positive integer from the HRM configuration, see `positive_int()`.
+
+    Parameters
+    ----------
+    hrm_config : dict
+        A parsed HRM configuration file as returned by `hrm_omero.hrm.parse_config()`.
+    key : str
+        The name of the configuration item.
+    default : int
+        The value to use in case the item is not set (or empty).
+
+    Returns
+    -------
+    int
+    """
+    value = hrm_config.get(key, "")
+    if not value:
+        return default
+    return positive_int(value, key)
+
+
+def print_dry_run(perform_action, kwargs):
+    """Print the function and parameters that would be called for an action.
+
+    Parameters
+    ----------
+    perform_action : callable
+        The function as returned by `select_action()`.
+    kwargs : dict
+        The keyword arguments as returned by `select_action()`.
+    """
+    printlog("INFO", "*** dry-run, only showing action and parameters ***")
+    printlog("INFO", f"function: {perform_action.__qualname__}")
+    for key, value in kwargs.items():
+        printlog("INFO", f"{key}: [{str(value)}]")
+
+
 def verbosity_to_loglevel(verbosity):
     """Map the verbosity count to a named log level for `loguru`.
 
@@ -224,9 +569,18 @@ def logger_add_file_sink(hrm_config, target=""):
 
 def run_task(args):
     """Parse commandline arguments and initiate the requested tasks."""
-    argparser = arguments_parser()
-    args = argparser.parse_args(args)
+    argv = list(args)
+    args = parse_args(argv)
+
+    with profiling.recording(args.profile, args.profile_dump):
+        with metrics.recording(args.action) as run:
+            run.status = _run_task(args, argv)
 
+    return run.status
+
+
+def _run_task(args, argv):
+    """Perform the task requested by the parsed arguments, see `run_task()`."""
     # one of the downsides of loguru is that the level of an existing logger can't be
     # changed - so to adjust verbosity we actually need to remove the default logger and
     # re-add it with the new level (see https://github.com/Delgan/loguru/issues/138)
@@ -236,10 +590,15 @@ def run_task(args):
 
     log.success(f"Logging verbosity requested: {args.verbosity} ({log_level})")
 
-    hrm_config = hrm.parse_config(args.config)
+    with profiling.phase("parse_config"):
+        hrm_config = hrm.parse_config(args.config)
     host = hrm_config.get("OMERO_HOSTNAME", "localhost")
     port = hrm_config.get("OMERO_PORT", 4064)
-    omero_logfile = hrm_config.get("OMERO_DEBUG_LOG", "")
+    socket_path = hrm_config.get("OMERO_CONNECTOR_SOCKET", "")
+    session_cache = hrm_config.get("OMERO_CONNECTOR_SESSION_CACHE", "")
+    credentials_cache = hrm_config.get("OMERO_CONNECTOR_CREDENTIALS_CACHE", "")
+    if args.action != "checkCredentials":
+        credentials_cache = ""
 
     log_level = hrm_config.get("OMERO_CONNECTOR_LOGLEVEL")
     if log_level:
@@ -249,13 +608,26 @@ def run_task(args):
 
     logger_add_file_sink(hrm_config)
 
+    if args.action == "serve":
+        socket_path = args.socket or socket_path
+        if not socket_path:
+            printlog("ERROR", "ERROR: no socket given for the daemon to listen on!")
+            return False
+        if args.dry_run:
+            printlog("INFO", f"*** dry-run, not starting daemon on [{socket_path}] ***")
+            return True
+        from . import daemon  # pylint: disable-msg=import-outside-toplevel
+
+        return daemon.serve(hrm_config, socket_path, args.idle_timeout)
+
     # NOTE: reading the OMERO password from an environment variable instead of an
     # argument supplied on the command line improves handling of this sensitive data as
     # the value is *NOT* immediately revealed to anyone with shell access by simply
     # looking at the process list (which is an absolute standard procedure to do). Since
-    # it is not passed to any other functions here (except the call to `BlitzGateway`)
-    # this also prevents it from being shown in an annotated stack trace in case an
-    # uncaught exception is coming through.
+    # it is only passed to the functions establishing the connection (`BlitzGateway`,
+    # the session cache or the request to the connector daemon) this also prevents it
+    # from being shown in an annotated stack trace in case an uncaught exception is
+    # coming through.
     # However, this doesn't provide super-high security as it will still be possible for
     # an admin to inspect the environment of a running process. Nevertheless going
     # beyond this seems a bit pointless here as an admin could also modify the code that
@@ -265,62 +637,72 @@ def run_task(args):
         printlog("ERROR", "ERROR: no password given to connect to OMERO!")
         return False
 
-    if args.action == "checkCredentials":
-        log.trace("checkCredentials")
-        perform_action = _omero.check_credentials
-        kwargs = {}
-
-    elif args.action == "retrieveChildren":
-        log.trace("retrieveChildren")
-        perform_action = formatting.print_children_json
-        kwargs = {"omero_id": args.id}
+    try:
+        perform_action, kwargs = select_action(args, hrm_config)
+    except ValueError as err:
+        printlog("ERROR", f"ERROR: {err}")
+        return False
+    if perform_action is None:
+        printlog("ERROR", "No valid action specified that should be performed!")
+        return False
 
-    elif args.action == "OMEROtoHRM":
-        log.trace("OMEROtoHRM")
-        perform_action = transfer.from_omero
-        kwargs = {
-            "omero_id": args.imageid,
-            "dest": args.dest,
-        }
+    if args.dry_run:
+        print_dry_run(perform_action, kwargs)
+        return True
 
-    elif args.action == "HRMtoOMERO":
-        log.trace("HRMtoOMERO")
-        perform_action = transfer.to_omero
-        kwargs = {
-            "omero_id": args.dset,
-            "image_file": args.file,
-            "omero_logfile": omero_logfile,
-        }
+    metrics.configure(hrm_config.get("OMERO_CONNECTOR_METRICS_FILE", ""))
 
-    else:
-        printlog("ERROR", "No valid action specified that should be performed!")
-        return False
+    if credentials_cache:
+        with profiling.phase("credentials_cache"):
+            cached = sessions.lookup_credentials(
+                credentials_cache, host, port, args.user, passwd
+            )
+        if cached is not None:
+            return cached
 
-    conn = omero.gateway.BlitzGateway(
-        username=args.user,
-        passwd=passwd,
-        host=host,
-        port=port,
-        secure=True,
-        useragent="hrm-omero.py",
-    )
+    # hand over the task to a running connector daemon if one is configured:
+    if args.action in SESSION_ACTIONS and socket_path and os.path.exists(socket_path):
+        from . import daemon  # pylint: disable-msg=import-outside-toplevel
 
-    try:
-        if args.dry_run:
-            printlog("INFO", "*** dry-run, only showing action and parameters ***")
-            printlog("INFO", f"function: {perform_action.__qualname__}")
-            for key, value in kwargs.items():
-                printlog("INFO", f"{key}: [{str(value)}]")
+        try:
+            with profiling.phase("daemon_request"):
+                reply = daemon.send_request(socket_path, args.user, passwd, argv)
+            print(reply["output"], end="")
+            return reply["status"]
+        except OSError as err:
+            log.warning(f"Connector daemon unavailable, running task locally: {err}")
 
-            return True
+    with profiling.phase("gateway"):
+        conn = _omero.new_gateway(args.user, passwd, host, port)
 
-        return perform_action(conn, **kwargs)
+    try:
+        if session_cache:
+            with profiling.phase("connect"):
+                connected = sessions.connect(
+                    conn, session_cache, host, port, args.user, passwd
+                )
+            if not connected:
+                printlog("ERROR", "ERROR: logging into OMERO failed!")
+                return False
+
+        with profiling.phase("action"):
+            ret = perform_action(conn, **kwargs)
+        if credentials_cache:
+            ttl = hrm_config.get("OMERO_CONNECTOR_CREDENTIALS_TTL", "")
+            ttl = float(ttl) if ttl else sessions.CREDENTIALS_TTL
+            sessions.record_credentials(
+                credentials_cache, host, port, args.user, passwd, ret, ttl
+            )
+        return ret
 
     except Exception as err:  # pylint: disable-msg=broad-except  # pragma: no cover
         log.error(f"An unforeseen error occured: {err}")
+        metrics.record_error(err)
         return False
     finally:
-        conn.close()
+        # a cached session must not be killed, otherwise it can't be joined again:
+        with profiling.phase("close"):
+            conn.close(hard=not session_cache)
         log.info(f"Closed OMERO connection [user={args.user}].")
 
 
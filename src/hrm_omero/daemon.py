@@ -0,0 +1,419 @@
+"""Persistent connector daemon keeping authenticated OMERO sessions warm.
+
+Running `ome-hrm serve` starts a long-running process listening on a local Unix socket.
+It accepts the very same actions as `hrm_omero.cli.run_task()` but keeps one
+authenticated connection per user alive between requests, so the interpreter startup,
+the parsing of the HRM configuration and the OMERO login only have to be paid once.
+
+The protocol is line-based JSON, each connection carries exactly one request and one
+reply. A request looks like this (`args` are the same ones accepted on the command
+line, the `--user` option being taken from the `user` item):
+
+```
+{"user": "demo01", "password": "...", "args": ["retrieveChildren", "--id", "ROOT"]}
+```
+
+The reply contains the return value of the action and everything it would have printed
+to stdout when called from the command line:
+
+```
+{"status": true, "output": "[...]"}
+```
+"""
+
+import hashlib
+import hmac
+import json
+import os
+import signal
+import socket
+import socketserver
+import stat
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+from loguru import logger as log
+
+from . import cli
+from . import omero as _omero
+from .misc import capture_stdout
+
+
+class _Session:
+
+    """An authenticated OMERO connection together with its bookkeeping data."""
+
+    def __init__(self, passwd):
+        self.conn = None
+        self.salt = os.urandom(16)
+        self.digest = _digest(self.salt, passwd)
+        self.lock = threading.Lock()
+        self.last_used = time.monotonic()
+
+    def matches(self, passwd):
+        """Check if the given password is the one the session was created with."""
+        return hmac.compare_digest(self.digest, _digest(self.salt, passwd))
+
+    def close(self):
+        """Close the connection (if any)."""
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+def _digest(salt, passwd):
+    """Salted digest of a password, used to verify a request may re-use a session."""
+    return hashlib.sha256(salt + passwd.encode("utf-8")).digest()
+
+
+class SessionStore:
+
+    """Container for authenticated OMERO connections, one per user.
+
+    Connections are handed out through the `connection()` context manager, which makes
+    sure a single connection is never used by two threads at the same time (as the
+    `BlitzGateway` is not thread-safe). Requests for different users are independent
+    of each other and may run in parallel.
+
+    Parameters
+    ----------
+    host : str
+        The OMERO server hostname or IP address.
+    port : int
+        The OMERO port number.
+    idle_timeout : int or float
+        The number of seconds after which an unused connection will be closed.
+    """
+
+    def __init__(self, host, port, idle_timeout):
+        self.host = host
+        self.port = port
+        self.idle_timeout = idle_timeout
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def connection(self, user, passwd):
+        """Context manager providing an authenticated connection for a user.
+
+        An existing connection is only re-used if it was established with the same
+        password and is still alive, otherwise a new one is created. A connection that
+        fails to authenticate is dropped right away.
+
+        Parameters
+        ----------
+        user : str
+            The OMERO user name.
+        passwd : str
+            The corresponding OMERO user password.
+
+        Yields
+        ------
+        omero.gateway.BlitzGateway
+            The connection object, exclusively locked for the calling thread.
+
+        Raises
+        ------
+        PermissionError
+            Raised in case logging into OMERO fails.
+        """
+        with self._lock:
+            session = self._sessions.get(user)
+            if session is None or not session.matches(passwd):
+                session = self._replace(user, passwd)
+
+        with session.lock:
+            if session.conn is None or not _is_alive(session.conn):
+                session.close()
+                session.conn = _omero.new_gateway(user, passwd, self.host, self.port)
+                if not session.conn.connect():
+                    self._drop(user, session)
+                    raise PermissionError(f"Logging into OMERO failed for [{user}]!")
+                log.info(f"Established new OMERO session [user={user}].")
+            try:
+                yield session.conn
+            finally:
+                session.last_used = time.monotonic()
+                if self._sessions.get(user) is not session:
+                    session.close()
+                elif not _is_alive(session.conn):
+                    self._drop(user, session)
+
+    def _replace(self, user, passwd):
+        """Register a new session for a user, closing the previous one if it is idle.
+
+        A previous session that is currently in use will be closed by its holder once
+        the running action has finished (see `connection()`).
+        """
+        old = self._sessions.pop(user, None)
+        if old is not None and old.lock.acquire(blocking=False):
+            log.debug(f"Password of [{user}] changed, replacing session.")
+            try:
+                old.close()
+            finally:
+                old.lock.release()
+        session = _Session(passwd)
+        self._sessions[user] = session
+        return session
+
+    def _drop(self, user, session):
+        """Remove a session from the store (unless it was replaced already)."""
+        with self._lock:
+            if self._sessions.get(user) is session:
+                del self._sessions[user]
+        session.close()
+        log.debug(f"Dropped OMERO session [user={user}].")
+
+    def expire(self):
+        """Close all connections that have been idle for longer than the timeout."""
+        deadline = time.monotonic() - self.idle_timeout
+        with self._lock:
+            expired = [
+                (user, session)
+                for user, session in self._sessions.items()
+                if session.last_used < deadline
+            ]
+        for user, session in expired:
+            # skip sessions that got picked up by a request in the meantime:
+            if not session.lock.acquire(blocking=False):
+                continue
+            try:
+                log.info(f"Closing idle OMERO session [user={user}].")
+                self._drop(user, session)
+            finally:
+                session.lock.release()
+
+    def close_all(self):
+        """Close all connections held by the store."""
+        with self._lock:
+            sessions = list(self._sessions.items())
+            self._sessions.clear()
+        for user, session in sessions:
+            session.close()
+            log.info(f"Closed OMERO connection [user={user}].")
+
+
+def _is_alive(conn):
+    """Check if a connection can still be used, without raising any exception."""
+    try:
+        return bool(conn.c) and bool(conn.keepAlive())
+    except Exception:  # pylint: disable-msg=broad-except
+        return False
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+
+    """Handler processing a single JSON request received on the socket."""
+
+    def handle(self):
+        try:
+            request = json.loads(self.rfile.readline())
+            user = request["user"]
+            passwd = request["password"]
+            argv = list(request["args"])
+        except (ValueError, TypeError, KeyError) as err:
+            log.error(f"Received malformed request: {err}")
+            status, output = False, "ERROR: malformed request!\n"
+        else:
+            status, output = self.server.run(user, passwd, argv)
+
+        reply = json.dumps({"status": status, "output": output})
+        self.wfile.write(reply.encode("utf-8") + b"\n")
+
+
+class ConnectorServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+
+    """Unix socket server running connector actions on cached OMERO sessions.
+
+    Parameters
+    ----------
+    socket_path : str
+        The path of the Unix socket to listen on.
+    hrm_config : dict
+        A parsed HRM configuration file as returned by `hrm_omero.hrm.parse_config()`.
+    idle_timeout : int or float, optional
+        The number of seconds after which an unused session will be closed, by default
+        900.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, socket_path, hrm_config, idle_timeout=900):
+        self.hrm_config = hrm_config
+        self.sessions = SessionStore(
+            host=hrm_config.get("OMERO_HOSTNAME", "localhost"),
+            port=hrm_config.get("OMERO_PORT", 4064),
+            idle_timeout=idle_timeout,
+        )
+        _remove_stale_socket(socket_path)
+        old_umask = os.umask(0o177)
+        try:
+            super().__init__(socket_path, _RequestHandler)
+        finally:
+            os.umask(old_umask)
+
+    def service_actions(self):
+        self.sessions.expire()
+
+    def server_close(self):
+        super().server_close()
+        self.sessions.close_all()
+        try:
+            os.unlink(self.server_address)
+        except FileNotFoundError:
+            pass
+
+    def run(self, user, passwd, argv):
+        """Run a connector action for a user, capturing its stdout.
+
+        Parameters
+        ----------
+        user : str
+            The OMERO user name.
+        passwd : str
+            The corresponding OMERO user password.
+        argv : list(str)
+            The command line arguments describing the action, see `cli.run_task()`.
+
+        Returns
+        -------
+        (bool, str)
+            The return value of the action and its output.
+        """
+        with capture_stdout() as captured:
+            status = self._run(user, passwd, argv)
+        return status, captured.getvalue()
+
+    def _run(self, user, passwd, argv):
+        """Parse the arguments and run the action, see `run()` for details."""
+        try:
+            args = cli.arguments_parser().parse_args(["--user", user] + argv)
+        except SystemExit:
+            print(f"ERROR: invalid arguments: {argv}")
+            return False
+
+        if args.action not in cli.SESSION_ACTIONS:
+            print(f"ERROR: action '{args.action}' can't be run by the daemon!")
+            return False
+
+        try:
+            perform_action, kwargs = cli.select_action(args, self.hrm_config)
+        except ValueError as err:
+            print(f"ERROR: {err}")
+            return False
+        if args.dry_run:
+            cli.print_dry_run(perform_action, kwargs)
+            return True
+
+        log.info(f"Running [{args.action}] for [{user}]...")
+        try:
+            with self.sessions.connection(user, passwd) as conn:
+                return perform_action(conn, **kwargs)
+        except PermissionError as err:
+            log.warning(err)
+            print("ERROR logging into OMERO.")
+            return False
+        except Exception as err:  # pylint: disable-msg=broad-except
+            log.error(f"An unforeseen error occured: {err}")
+            return False
+
+
+def _remove_stale_socket(socket_path):
+    """Remove a left-over socket file, refusing to do so if it is still in use.
+
+    Raises
+    ------
+    RuntimeError
+        Raised in case another daemon is already listening on the socket or the path
+        exists but is not a socket.
+    """
+    if not os.path.exists(socket_path):
+        return
+
+    if not stat.S_ISSOCK(os.stat(socket_path).st_mode):
+        raise RuntimeError(f"Path [{socket_path}] exists but is not a socket!")
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(socket_path)
+        except OSError:
+            log.warning(f"Removing stale socket [{socket_path}].")
+            os.unlink(socket_path)
+            return
+
+    raise RuntimeError(f"Another daemon is already listening on [{socket_path}]!")
+
+
+def serve(hrm_config, socket_path, idle_timeout=900):
+    """Run the connector daemon until it receives SIGTERM or SIGINT.
+
+    Parameters
+    ----------
+    hrm_config : dict
+        A parsed HRM configuration file as returned by `hrm_omero.hrm.parse_config()`.
+    socket_path : str
+        The path of the Unix socket to listen on.
+    idle_timeout : int or float, optional
+        The number of seconds after which an unused session will be closed, by default
+        900.
+
+    Returns
+    -------
+    bool
+        True after the daemon has been shut down regularly.
+    """
+    server = ConnectorServer(socket_path, hrm_config, idle_timeout)
+    # turn SIGTERM into a regular exit so the `finally` clause below gets executed:
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    log.success(f"Connector daemon listening on [{socket_path}].")
+    try:
+        server.serve_forever()
+    except (KeyboardInterrupt, SystemExit):
+        log.info("Connector daemon shutting down...")
+    finally:
+        server.server_close()
+
+    return True
+
+
+def send_request(socket_path, user, passwd, argv, timeout=None):
+    """Submit an action to a running connector daemon and wait for the reply.
+
+    Parameters
+    ----------
+    socket_path : str
+        The path of the Unix socket the daemon is listening on.
+    user : str
+        The OMERO user name.
+    passwd : str
+        The corresponding OMERO user password.
+    argv : list(str)
+        The command line arguments describing the action, see `cli.run_task()`.
+    timeout : float, optional
+        The socket timeout in seconds, by default `None` (blocking).
+
+    Returns
+    -------
+    dict
+        The reply of the daemon, having the items `status` (bool) and `output` (str).
+
+    Raises
+    ------
+    OSError
+        Raised in case the daemon can't be reached or closed the connection without
+        sending a reply.
+    """
+    request = json.dumps({"user": user, "password": passwd, "args": argv})
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(socket_path)
+        sock.sendall(request.encode("utf-8") + b"\n")
+        with sock.makefile("rb") as stream:
+            reply = stream.readline()
+
+    if not reply:
+        raise ConnectionError(f"No reply received from daemon at [{socket_path}]!")
+
+    return json.loads(reply)
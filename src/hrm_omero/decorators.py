@@ -3,6 +3,7 @@
 import functools
 from loguru import logger as log
 
+from . import profiling
 from .misc import OmeroId
 
 
@@ -16,15 +17,16 @@ def connect_and_set_group(func):
     In addition it also checks the `omero_id` parameter and ensures it is an
     object of type `hrm_omero.misc.OmeroId`. In case the parameter received is a
     string, it will automatically create the corresponding `OmeroId` object,
-    which also checks the values of the ID for sanity.
+    which also checks the values of the ID for sanity. A list of IDs is converted
+    element-wise, the group of the first one is used for the connection then.
 
     Other Parameters
     ----------------
     conn : omero.gateway.BlitzGateway
         The OMERO connection object.
-    omero_id : str or hrm_omero.misc.OmeroId
+    omero_id : str or hrm_omero.misc.OmeroId or list
         The fully qualified ID of an OMERO object (e.g. `G:23:Image:42`) as
-        a string or as an `hrm_omero.misc.OmeroId` object directly.
+        a string or as an `hrm_omero.misc.OmeroId` object directly, or a list of them.
     """
 
     @functools.wraps(func)
@@ -35,9 +37,10 @@ def connect_and_set_group(func):
         ----------
         conn : omero.gateway.BlitzGateway
             The OMERO connection object.
-        omero_id : str or hrm_omero.misc.OmeroId
+        omero_id : str or hrm_omero.misc.OmeroId or list
             The fully qualified ID of an OMERO object (e.g. `G:23:Image:42`) as
-            a string or as an `hrm_omero.misc.OmeroId` object directly.
+            a string or as an `hrm_omero.misc.OmeroId` object directly, or a list of
+            them.
 
         Raises
         ------
@@ -46,6 +49,22 @@ def connect_and_set_group(func):
         ValueError
             Raised in case a malformed `omero_id` was given.
         """
+        # if the ID is passed as a string parse it into an OmeroId object:
+        if isinstance(omero_id, str):
+            omero_id = OmeroId(omero_id)
+        elif isinstance(omero_id, list):
+            omero_id = [OmeroId(x) if isinstance(x, str) else x for x in omero_id]
+        group = omero_id[0].group if isinstance(omero_id, list) else omero_id.group
+
+        # connections from a pool share their session with other threads, so the group
+        # must only be set for the connection itself (see `omero.ConnectionPool`):
+        pool = getattr(conn, "hrm_omero_pool", None)
+        if pool is not None:
+            with profiling.phase("set_group"):
+                pool.set_group(conn, group)
+            log.debug(f"Set OMERO call context group to [{group}].")
+            return func(conn, omero_id, *args, **kwargs)
+
         # the connection might be closed (e.g. after importing an image), so force
         # re-establish it (note that `conn._connected` might even report the wrong
         # state initially, or also after reconnecting!)
@@ -58,19 +77,17 @@ def connect_and_set_group(func):
         # `conn.getObject()` return `None`
         #
         ##### WARNING - WARNING - WARNING - WARNING - WARNING - WARNING - WARNING #####
-        conn.connect()
+        with profiling.phase("connect"):
+            conn.connect()
         if not conn._connected:  # pylint: disable-msg=protected-access
             raise RuntimeError("Failed to (re-)establish connection to OMERO!")
         username = conn.getUser().getName()
         log.success(f"Successfully (re-)connected to OMERO as [{username}].")
 
-        # if the ID is passed as a string parse it into an OmeroId object:
-        if isinstance(omero_id, str):
-            omero_id = OmeroId(omero_id)
-
         # set the OMERO group for the current connection session:
-        conn.setGroupForSession(omero_id.group)
-        log.debug(f"Set OMERO session group to [{omero_id.group}].")
+        with profiling.phase("set_group"):
+            conn.setGroupForSession(group)
+        log.debug(f"Set OMERO session group to [{group}].")
 
         return func(conn, omero_id, *args, **kwargs)
 
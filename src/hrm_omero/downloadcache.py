@@ -0,0 +1,256 @@
+"""Host-wide cache for original files downloaded from OMERO.
+
+Teaching datasets and other popular filesets are downloaded over and over again into
+the `HRM_DATA` folders of different users (or of the same user for several jobs). If a
+directory is configured via `OMERO_CONNECTOR_DOWNLOAD_CACHE` in the HRM configuration
+file, every file downloaded by `hrm_omero.transfer.from_omero()` is added to it and
+subsequent requests for the same file are served from there instead of OMERO.
+
+Files are keyed by the SHA1 hash OMERO has recorded for them or by the ID of the
+`OriginalFile` object if there is no such hash (the cache must therefore only be used
+for a single OMERO server). They are materialised into the destination (and added to
+the cache) using `hrm_omero.misc.materialise()` with its default methods, i.e. as
+reflinks if supported by the file system or by copying them otherwise. Hardlinks are
+deliberately not used: the files of all users would share their inode with the cache
+entry, so changing the permissions or contents of one of them would affect the cache
+and every other copy. Entries with a known hash are verified before they are used.
+
+The size of the cache is bounded by `OMERO_CONNECTOR_DOWNLOAD_CACHE_SIZE` (in bytes,
+default `DOWNLOAD_CACHE_SIZE`), the least recently used entries are evicted once it is
+exceeded. Sizes and access times are tracked in an SQLite database in the cache
+directory, so several connector processes can use the cache at the same time. Like
+for `hrm_omero.treecache`, any error accessing the cache is logged and treated like a
+cache miss.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from loguru import logger as log
+
+from .misc import materialise
+
+DOWNLOAD_CACHE_SIZE = 50 * 1024 ** 3
+"""Default maximum size of the download cache in bytes."""
+
+HASH_CHUNK_SIZE = 8 * 1024 * 1024
+"""Number of bytes read at once when verifying a cached file."""
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    last_used REAL NOT NULL
+)
+"""
+
+
+class DownloadCache:
+
+    """Size-bounded LRU cache for original files, see the module description.
+
+    Parameters
+    ----------
+    path : str
+        The cache directory, will be created (only accessible by the owner) if it
+        doesn't exist yet.
+    max_size : int, optional
+        The maximum total size of the cached files in bytes, by default
+        `DOWNLOAD_CACHE_SIZE`.
+    """
+
+    def __init__(self, path, max_size=DOWNLOAD_CACHE_SIZE):
+        self.path = path
+        self.max_size = max_size
+
+    def __str__(self):
+        return f"{self.path} (max_size={self.max_size})"
+
+    @staticmethod
+    def key(file_id, sha1=None):
+        """Get the cache key of an original file.
+
+        Parameters
+        ----------
+        file_id : int or str
+            The ID of the `OriginalFile` object in OMERO.
+        sha1 : str, optional
+            The SHA1 hash recorded by OMERO (if any).
+
+        Returns
+        -------
+        str
+            The hash (if given) or the ID prefixed by `id-`.
+        """
+        return sha1.lower() if sha1 else f"id-{file_id}"
+
+    def entry_path(self, key):
+        """Get the path of the cache entry with the given key."""
+        return os.path.join(self.path, "files", key[-2:], key)
+
+    @contextmanager
+    def _database(self):
+        """Context manager providing a database connection within a transaction."""
+        os.makedirs(self.path, mode=0o700, exist_ok=True)
+        database = sqlite3.connect(os.path.join(self.path, "index.db"), timeout=30)
+        try:
+            database.execute("PRAGMA journal_mode=WAL")
+            with database:
+                database.execute(_SCHEMA)
+                yield database
+        finally:
+            database.close()
+
+    def fetch(self, file_id, target, size, sha1=None):
+        """Materialise a cached original file.
+
+        Parameters
+        ----------
+        file_id : int or str
+            The ID of the `OriginalFile` object in OMERO.
+        target : str
+            The path of the file to create (including missing parent directories).
+        size : int
+            The size of the original file, a cached file of a different size will be
+            discarded.
+        sha1 : str, optional
+            The SHA1 hash recorded by OMERO (if any), a cached file having a different
+            hash will be discarded.
+
+        Returns
+        -------
+        bool
+            True in case the file was materialised from the cache, False otherwise.
+        """
+        key = self.key(file_id, sha1)
+        path = self.entry_path(key)
+        try:
+            if not os.path.exists(path):
+                return False
+            if os.path.getsize(path) != size:
+                log.warning(f"Discarding cached file [{path}] having a wrong size.")
+                self._remove(key)
+                return False
+            if sha1 and _sha1(path) != sha1.lower():
+                log.warning(f"Discarding cached file [{path}] having a wrong hash.")
+                self._remove(key)
+                return False
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            method = materialise(path, target)
+            with self._database() as database:
+                database.execute(
+                    "INSERT OR REPLACE INTO entries VALUES (?, ?, ?)",
+                    (key, size, time.time()),
+                )
+        except (OSError, sqlite3.Error) as err:
+            log.warning(f"Unable to use download cache [{self.path}]: {err}")
+            return False
+        log.debug(f"Materialised [{target}] from download cache using {method}.")
+        return True
+
+    def store(self, file_id, source, sha1=None):
+        """Add a downloaded original file to the cache, evicting old entries.
+
+        Parameters
+        ----------
+        file_id : int or str
+            The ID of the `OriginalFile` object in OMERO.
+        source : str
+            The downloaded file.
+        sha1 : str, optional
+            The SHA1 hash recorded by OMERO (if any).
+        """
+        key = self.key(file_id, sha1)
+        path = self.entry_path(key)
+        try:
+            size = os.path.getsize(source)
+            if size > self.max_size:
+                log.debug(f"Not caching [{source}], it exceeds the cache size.")
+                return
+            os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            materialise(source, tmp)
+            os.replace(tmp, path)
+            with self._database() as database:
+                database.execute(
+                    "INSERT OR REPLACE INTO entries VALUES (?, ?, ?)",
+                    (key, size, time.time()),
+                )
+            log.debug(f"Added [{source}] to download cache as [{key}].")
+            self.evict()
+        except (OSError, sqlite3.Error) as err:
+            log.warning(f"Unable to add [{source}] to download cache: {err}")
+
+    def evict(self):
+        """Remove the least recently used entries until the size limit is met.
+
+        Returns
+        -------
+        list(str)
+            The keys of the removed entries.
+        """
+        evicted = []
+        with self._database() as database:
+            rows = database.execute(
+                "SELECT key, size FROM entries ORDER BY last_used DESC"
+            ).fetchall()
+            total = 0
+            for key, size in rows:
+                total += size
+                if total > self.max_size:
+                    evicted.append(key)
+            database.executemany(
+                "DELETE FROM entries WHERE key = ?", [(key,) for key in evicted]
+            )
+        for key in evicted:
+            self._unlink(key)
+        if evicted:
+            log.debug(f"Evicted {len(evicted)} file(s) from download cache.")
+        return evicted
+
+    def _remove(self, key):
+        """Remove an entry from the index and the file system."""
+        with self._database() as database:
+            database.execute("DELETE FROM entries WHERE key = ?", (key,))
+        self._unlink(key)
+
+    def _unlink(self, key):
+        """Remove the file of an entry (if present)."""
+        try:
+            os.unlink(self.entry_path(key))
+        except FileNotFoundError:
+            pass
+
+
+def _sha1(path):
+    """Compute the SHA1 hash of a file."""
+    hasher = hashlib.sha1()
+    with open(path, "rb") as infile:
+        for data in iter(lambda: infile.read(HASH_CHUNK_SIZE), b""):
+            hasher.update(data)
+    return hasher.hexdigest()
+
+
+def from_config(hrm_config):
+    """Create the download cache configured in the HRM configuration file (if any).
+
+    Parameters
+    ----------
+    hrm_config : dict
+        A parsed HRM configuration file as returned by `hrm_omero.hrm.parse_config()`.
+
+    Returns
+    -------
+    DownloadCache or None
+        The cache object or None in case `OMERO_CONNECTOR_DOWNLOAD_CACHE` is not set.
+    """
+    path = hrm_config.get("OMERO_CONNECTOR_DOWNLOAD_CACHE", "")
+    if not path:
+        return None
+
+    max_size = hrm_config.get("OMERO_CONNECTOR_DOWNLOAD_CACHE_SIZE", "")
+    return DownloadCache(path, int(max_size) if max_size else DOWNLOAD_CACHE_SIZE)
@@ -1,46 +1,280 @@
 """Output formatting functions."""
 
+import itertools
 import json
+import sys
 
-from . import tree
+from . import search, tree
 from .misc import printlog
+from .treenode import json_default
 
 
-def tree_to_json(obj_tree):
+def tree_to_json(obj_tree, compact=False):
     """Create a JSON object with a given format from a tree.
 
     Parameters
     ----------
-    obj_tree : list(dict)
+    obj_tree : list(dict) or list(hrm_omero.treenode.TreeNode)
         The object tree as generated by `hrm_omero.tree.gen_children()`.
+    compact : bool, optional
+        If set to True, no whitespace will be used for indentation and after separators,
+        by default False.
 
     Returns
     -------
     str
         The JSON-formatted representation of the object tree.
     """
-    return json.dumps(obj_tree, sort_keys=True, indent=4, separators=(",", ": "))
+    if compact:
+        separators = (",", ":")
+        return json.dumps(
+            obj_tree, sort_keys=True, separators=separators, default=json_default
+        )
+    return json.dumps(
+        obj_tree, sort_keys=True, indent=4, separators=(",", ": "), default=json_default
+    )
 
 
-def print_children_json(conn, omero_id):
-    """Print the child nodes of the given ID in JSON format.
+def write_json_array(nodes, stream=None):
+    """Incrementally write nodes as a compact JSON array.
+
+    Parameters
+    ----------
+    nodes : iterable(dict) or iterable(hrm_omero.treenode.TreeNode)
+        The nodes to write, e.g. from the `hrm_omero.tree.iter_children()` generator.
+    stream : file-like, optional
+        The stream to write to, by default `sys.stdout`.
+    """
+    stream = stream or sys.stdout
+    stream.write("[")
+    for i, node in enumerate(nodes):
+        if i:
+            stream.write(",")
+        stream.write(tree_to_json(node, compact=True))
+    stream.write("]")
+
+
+def print_children_json(
+    conn,
+    omero_id,
+    tree_cache=None,
+    depth=1,
+    offset=0,
+    limit=None,
+    compact=False,
+    aggregates=False,
+    since=None,
+):
+    """Print the child nodes of the given ID(s) in JSON format.
+
+    Parameters
+    ----------
+    conn : omero.gateway.BlitzGateway
+        The OMERO connection object.
+    omero_id : str or hrm_omero.misc.OmeroId or list
+        An object denoting an OMERO target or a list of them. For a list, a JSON object
+        will be printed having the children of each target under its ID as a key.
+    tree_cache : hrm_omero.treecache.TreeCache, optional
+        The cache to use for the child nodes, by default `None`.
+    depth : int, optional
+        The number of levels to generate, by default 1. Nodes that have not been
+        expanded (at the lowest level) will have the `load_on_demand` property set, see
+        `hrm_omero.tree.expand_nodes()` for details.
+    offset : int, optional
+        The number of (sorted) children to skip, by default 0.
+    limit : int, optional
+        The maximum number of children to print, by default `None`. If given (or in
+        case `offset` is non-zero), the children are printed as a page as returned by
+        `hrm_omero.tree.gen_children_page()`, including their total number.
+    compact : bool, optional
+        If set to True, the JSON will be printed without any whitespace. Unless a page
+        has been requested, it will be written incrementally while the children are
+        being fetched (see `print_children_json_stream()`), by default False.
+    aggregates : bool, optional
+        If set to True, project and dataset nodes will contain their number of children
+        and the size of their data, see `hrm_omero.tree.add_aggregates()`. By default
+        False.
+    since : str, optional
+        An etag or a timestamp, if given only the changes since then will be printed
+        (see `print_children_changes_json()`), ignoring `depth`, `offset`, `limit` and
+        `aggregates`. By default `None`.
+
+    Returns
+    -------
+    bool
+        True in case printing the nodes was successful, False otherwise.
+    """
+    if since is not None:
+        return print_children_changes_json(conn, omero_id, since, compact)
+
+    paged = offset or limit is not None
+    if compact and not paged:
+        return print_children_json_stream(conn, omero_id, tree_cache, depth, aggregates)
+
+    omero_ids = omero_id if isinstance(omero_id, list) else [omero_id]
+    nodes = {}
+    try:
+        for node_id in omero_ids:
+            if paged:
+                page = tree.gen_children_page(
+                    conn, node_id, offset, limit, tree_cache, aggregates
+                )
+                children = page["children"]
+                nodes[str(node_id)] = page
+            else:
+                children = tree.gen_children(conn, node_id, tree_cache, aggregates)
+                nodes[str(node_id)] = children
+            tree.expand_nodes(conn, children, depth - 1, tree_cache, aggregates)
+    except:  # pylint: disable-msg=bare-except
+        printlog("ERROR", "ERROR generating OMERO tree / node!")
+        return False
+
+    if isinstance(omero_id, list):
+        print(tree_to_json(nodes, compact))
+    else:
+        print(tree_to_json(nodes[str(omero_id)], compact))
+    return True
+
+
+def print_children_json_stream(
+    conn, omero_id, tree_cache=None, depth=1, aggregates=False
+):
+    """Print the child nodes of the given ID(s) as compact JSON while fetching them.
+
+    The output is identical to the one of `print_children_json()` with `compact=True`
+    but the children are printed one by one as produced by the
+    `hrm_omero.tree.iter_children()` generator instead of assembling the full tree in
+    memory first. Like the sorted keys of the non-streaming output, several IDs are
+    processed in the order of their string representation (ignoring duplicates). Note
+    that an error occurring while printing will leave the output incomplete (followed
+    by an error message).
 
     Parameters
     ----------
     conn : omero.gateway.BlitzGateway
         The OMERO connection object.
-    omero_id : hrm_omero.misc.OmeroId
-        An object denoting an OMERO target.
+    omero_id : str or hrm_omero.misc.OmeroId or list
+        An object denoting an OMERO target or a list of them.
+    tree_cache : hrm_omero.treecache.TreeCache, optional
+        The cache to use for the child nodes, by default `None`.
+    depth : int, optional
+        The number of levels to generate, by default 1.
+    aggregates : bool, optional
+        Add the aggregate values to the nodes, see `print_children_json()`.
 
     Returns
     -------
     bool
         True in case printing the nodes was successful, False otherwise.
     """
+
+    def expanded_children(node_id):
+        children = tree.iter_children(conn, node_id, tree_cache, aggregates=aggregates)
+        # expand the children in chunks, so each level is queried once per chunk:
+        while True:
+            chunk = list(itertools.islice(children, tree.STREAM_CHUNK_SIZE))
+            tree.expand_nodes(conn, chunk, depth - 1, tree_cache, aggregates)
+            yield from chunk
+            if len(chunk) < tree.STREAM_CHUNK_SIZE:
+                return
+
     try:
-        children = tree.gen_children(conn, omero_id)
+        if isinstance(omero_id, list):
+            omero_ids = {str(x): x for x in omero_id}
+            sys.stdout.write("{")
+            for i, key in enumerate(sorted(omero_ids)):
+                node_id = omero_ids[key]
+                sys.stdout.write(("," if i else "") + json.dumps(key) + ":")
+                write_json_array(expanded_children(node_id))
+            sys.stdout.write("}")
+        else:
+            write_json_array(expanded_children(omero_id))
+        sys.stdout.write("\n")
     except:  # pylint: disable-msg=bare-except
+        print()
         printlog("ERROR", "ERROR generating OMERO tree / node!")
         return False
-    print(tree_to_json(children))
+    return True
+
+
+def print_children_changes_json(conn, omero_id, since, compact=False):
+    """Print the changes of the children of the given ID(s) in JSON format.
+
+    Parameters
+    ----------
+    conn : omero.gateway.BlitzGateway
+        The OMERO connection object.
+    omero_id : str or hrm_omero.misc.OmeroId or list
+        An object denoting an OMERO target or a list of them. For a list, a JSON object
+        will be printed having the changes of each target under its ID as a key.
+    since : str
+        The etag returned by a previous call or a timestamp, see
+        `hrm_omero.tree.parse_since()` for the supported formats.
+    compact : bool, optional
+        If set to True, the JSON will be printed without any whitespace, by default
+        False.
+
+    Returns
+    -------
+    bool
+        True in case printing the changes was successful, False otherwise.
+    """
+    try:
+        tree.parse_since(since)
+    except ValueError as err:
+        printlog("ERROR", f"ERROR: {err}")
+        return False
+
+    omero_ids = omero_id if isinstance(omero_id, list) else [omero_id]
+    changes = {}
+    try:
+        for node_id in omero_ids:
+            changes[str(node_id)] = tree.gen_children_changes(conn, node_id, since)
+    except:  # pylint: disable-msg=bare-except
+        printlog("ERROR", "ERROR generating OMERO tree / node changes!")
+        return False
+
+    if isinstance(omero_id, list):
+        print(tree_to_json(changes, compact))
+    else:
+        print(tree_to_json(changes[str(omero_id)], compact))
+    return True
+
+
+def print_search_json(
+    conn, text, prefix=False, classes=None, limit=None, compact=False
+):
+    """Print the objects matching a name search in JSON format.
+
+    Parameters
+    ----------
+    conn : omero.gateway.BlitzGateway
+        The OMERO connection object.
+    text : str
+        The (case-insensitive) text to search for.
+    prefix : bool, optional
+        Only match names starting with the text, by default False.
+    classes : list(str), optional
+        The classes to search for, by default `None` meaning projects, datasets and
+        images.
+    limit : int, optional
+        The maximum number of hits per class, by default `None` meaning
+        `hrm_omero.search.SEARCH_LIMIT`.
+    compact : bool, optional
+        If set to True, the JSON will be printed without any whitespace, by default
+        False.
+
+    Returns
+    -------
+    bool
+        True in case the search was successful, False otherwise.
+    """
+    limit = search.SEARCH_LIMIT if limit is None else limit
+    try:
+        hits = search.search(conn, text, prefix, classes, limit)
+    except:  # pylint: disable-msg=bare-except
+        printlog("ERROR", "ERROR searching OMERO objects!")
+        return False
+
+    print(tree_to_json(hits, compact))
     return True
@@ -4,7 +4,6 @@ import os.path
 import re
 import shlex
 
-from bs4 import BeautifulSoup
 from loguru import logger as log
 
 
@@ -234,6 +233,8 @@ def parse_summary(fname):
             log.debug(f"Found [{candidate}], will use it instead of [{fname}].")
             fname = candidate
 
+    from bs4 import BeautifulSoup  # pylint: disable-msg=import-outside-toplevel
+
     log.debug(f"Trying to parse job parameter summary file [{fname}]...")
 
     try:
@@ -0,0 +1,193 @@
+"""In-place import of HRM results into OMERO.
+
+Deconvolution results are often tens of gigabytes large, uploading them through the
+OMERO importer takes a considerable amount of time even if the OMERO server could
+access them directly. If configured via `OMERO_CONNECTOR_INPLACE_IMPORT` in the HRM
+configuration file, `hrm_omero.transfer.to_omero()` uses one of OMERO's in-place
+import transfer modes instead:
+
+* `ln` creates a hardlink of the file in the managed repository,
+* `ln_s` creates a symbolic link (note that deleting the file in the HRM will then
+  break the image in OMERO),
+* `cp` copies the file into the managed repository on the file system,
+* `auto` picks `ln` if the file is on the same file system as the managed repository
+  and `cp` otherwise.
+
+The importer creates the links / copies on the machine running the connector, so the
+managed repository has to be accessible (and writable) there, see
+`OMERO_CONNECTOR_REPOSITORY_ROOT`. The files are passed to the importer using the path
+the OMERO server sees them at, which might differ from the one used by the HRM. The
+mapping is configured as a list of `hrm_prefix=server_prefix` items separated by
+semicolons in `OMERO_CONNECTOR_INPLACE_PATHS` (using the HRM paths as-is if empty),
+the server-side paths have to be accessible on the connector's machine as well.
+
+Before every import a pre-flight check (see `InplaceImport.prepare()`) confirms the
+server-side path refers to the very same file and the managed repository is
+writable, otherwise (or if the in-place import fails) the file is uploaded as usual.
+"""
+
+import os
+
+from loguru import logger as log
+
+INPLACE_TRANSFERS = ("ln", "ln_s", "cp")
+"""Transfer modes of the OMERO importer doing an in-place import."""
+
+
+class InplaceImport:
+
+    """Configuration and pre-flight check of in-place imports.
+
+    Parameters
+    ----------
+    transfer : str
+        The transfer mode, one of `INPLACE_TRANSFERS` or `auto`.
+    repository_root : str
+        The location of OMERO's managed repository on the local file system.
+    paths : list(tuple(str, str)), optional
+        The mapping of HRM path prefixes to the ones used by the OMERO server, by
+        default `None` meaning the paths are identical.
+
+    Raises
+    ------
+    ValueError
+        Raised in case an unknown transfer mode was given.
+    """
+
+    def __init__(self, transfer, repository_root, paths=None):
+        if transfer != "auto" and transfer not in INPLACE_TRANSFERS:
+            raise ValueError(f"Invalid in-place import transfer mode '{transfer}'.")
+        self.transfer = transfer
+        self.repository_root = repository_root
+        self.paths = paths or []
+
+    def __str__(self):
+        return f"{self.transfer} (repository={self.repository_root})"
+
+    def server_path(self, image_file):
+        """Map the path of a file in the HRM to the one used by the OMERO server.
+
+        Parameters
+        ----------
+        image_file : str
+            The path of the file in the HRM.
+
+        Returns
+        -------
+        str or None
+            The path on the server (using the longest matching prefix) or `None` in
+            case no prefix matches.
+        """
+        image_file = os.path.abspath(image_file)
+        if not self.paths:
+            return image_file
+
+        matches = []
+        for hrm_prefix, server_prefix in self.paths:
+            hrm_prefix = hrm_prefix.rstrip("/")
+            if image_file.startswith(f"{hrm_prefix}/"):
+                matches.append((hrm_prefix, server_prefix.rstrip("/")))
+        if not matches:
+            return None
+        hrm_prefix, server_prefix = max(matches, key=lambda x: len(x[0]))
+        return server_prefix + image_file[len(hrm_prefix) :]
+
+    def prepare(self, image_file):
+        """Check if a file can be imported in-place and determine the transfer mode.
+
+        Parameters
+        ----------
+        image_file : str
+            The path of the file in the HRM.
+
+        Returns
+        -------
+        (str, str) or None
+            The transfer mode and the server-side path of the file to be passed to the
+            importer, or `None` in case the file has to be uploaded.
+        """
+        server_path = self.server_path(image_file)
+        if server_path is None:
+            log.debug(f"No in-place import path mapping for [{image_file}].")
+            return None
+
+        try:
+            if not os.path.samefile(image_file, server_path):
+                log.warning(f"[{server_path}] is not the same file as [{image_file}]!")
+                return None
+            root = self.repository_root
+            if not os.path.isdir(root) or not os.access(root, os.W_OK | os.X_OK):
+                log.warning(f"Managed repository [{root}] is not writable.")
+                return None
+            same_device = os.stat(server_path).st_dev == os.stat(root).st_dev
+        except OSError as err:
+            log.warning(f"In-place import check for [{server_path}] failed: {err}")
+            return None
+
+        transfer = self.transfer
+        if transfer == "auto":
+            transfer = "ln" if same_device else "cp"
+        elif transfer == "ln" and not same_device:
+            log.warning(f"Can't hardlink [{server_path}] into the managed repository.")
+            return None
+        log.debug(f"Using in-place import ({transfer}) for [{server_path}].")
+        return transfer, server_path
+
+
+def parse_paths(mapping):
+    """Parse a path mapping of the form `hrm_prefix=server_prefix;...`.
+
+    Parameters
+    ----------
+    mapping : str
+        The mapping as given in the HRM configuration file.
+
+    Returns
+    -------
+    list(tuple(str, str))
+        The pairs of HRM and server prefixes.
+
+    Raises
+    ------
+    ValueError
+        Raised in case an item doesn't contain a `=`.
+    """
+    paths = []
+    for item in mapping.split(";"):
+        if not item.strip():
+            continue
+        if "=" not in item:
+            raise ValueError(f"Invalid in-place import path mapping '{item}'.")
+        hrm_prefix, server_prefix = item.split("=", 1)
+        paths.append((hrm_prefix.strip(), server_prefix.strip()))
+    return paths
+
+
+def from_config(hrm_config):
+    """Create the in-place import settings from the HRM configuration file (if any).
+
+    Parameters
+    ----------
+    hrm_config : dict
+        A parsed HRM configuration file as returned by `hrm_omero.hrm.parse_config()`.
+
+    Returns
+    -------
+    InplaceImport or None
+        The settings or None in case `OMERO_CONNECTOR_INPLACE_IMPORT` is not set.
+
+    Raises
+    ------
+    ValueError
+        Raised in case the configuration is invalid, e.g. if the managed repository
+        (`OMERO_CONNECTOR_REPOSITORY_ROOT`) is not configured.
+    """
+    transfer = hrm_config.get("OMERO_CONNECTOR_INPLACE_IMPORT", "")
+    if not transfer:
+        return None
+
+    repository_root = hrm_config.get("OMERO_CONNECTOR_REPOSITORY_ROOT", "")
+    if not repository_root:
+        raise ValueError("In-place import requires OMERO_CONNECTOR_REPOSITORY_ROOT!")
+    paths = parse_paths(hrm_config.get("OMERO_CONNECTOR_INPLACE_PATHS", ""))
+    return InplaceImport(transfer, repository_root, paths)
@@ -0,0 +1,292 @@
+"""Prometheus metrics of connector runs, exported through a textfile collector.
+
+If `OMERO_CONNECTOR_METRICS_FILE` is set in the HRM configuration file, every call of
+the connector (except for dry-runs and the daemon itself) updates the given file in
+the Prometheus text format, so it can be picked up by the *textfile collector* of the
+node exporter (the file name therefore has to end in `.prom`). The following metrics
+are provided:
+
+* `hrm_omero_actions_total{action,status}` - the number of runs per action, `status`
+  being either `success` or `failure`.
+* `hrm_omero_action_duration_seconds{action}` - a histogram of the run times.
+* `hrm_omero_transferred_bytes_total{direction}` - the number of bytes downloaded from
+  (`direction="download"`) or uploaded to (`direction="upload"`) OMERO.
+* `hrm_omero_failures_total{action,error}` - the number of failed runs by the class
+  name of the exception that caused them, `ActionFailed` being used for actions that
+  reported a failure without raising an exception.
+
+As every call is a separate process the accumulated values are kept in a JSON file
+next to the metrics file (having an additional `.json` suffix). Updates of both files
+are serialized through an exclusive lock on a third one (suffix `.lock`) and the files
+are replaced atomically, so concurrent calls will neither lose updates nor will the
+node exporter ever see a partially written file.
+
+Note that transfers performed by the connector daemon are not accounted for, only the
+runs of the processes handing over their tasks to it.
+"""
+
+import contextlib
+import fcntl
+import json
+import os
+import tempfile
+import threading
+import time
+
+from loguru import logger as log
+
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+"""Upper bounds (in seconds) of the run time histogram buckets."""
+
+_ACTIVE = None
+
+
+class Run:
+
+    """Measurements of a single connector run.
+
+    Parameters
+    ----------
+    action : str
+        The name of the action being run.
+
+    Attributes
+    ----------
+    target : str
+        The metrics file to be updated, empty meaning the run will not be recorded.
+    status : bool
+        The result of the run.
+    error : str or None
+        The class name of the exception causing the run to fail (if any).
+    transferred : dict
+        The number of bytes transferred, keyed by direction.
+    """
+
+    def __init__(self, action):
+        self.action = action
+        self.target = ""
+        self.status = False
+        self.error = None
+        self.transferred = {}
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+        self.duration = 0.0
+
+    def add_bytes(self, direction, count):
+        """Account for transferred data, may be called from several threads."""
+        with self._lock:
+            self.transferred[direction] = self.transferred.get(direction, 0) + count
+
+    def finish(self):
+        """Stop the clock of the run."""
+        self.duration = time.perf_counter() - self._start
+
+
+def configure(target):
+    """Set the metrics file to be updated by the active run (if any).
+
+    Parameters
+    ----------
+    target : str
+        The path of the metrics file, empty meaning the run will not be recorded.
+    """
+    if _ACTIVE is not None:
+        _ACTIVE.target = target
+
+
+def add_bytes(direction, count):
+    """Account for data transferred during the active run (if any).
+
+    Parameters
+    ----------
+    direction : str
+        Either `download` or `upload`.
+    count : int
+        The number of bytes transferred.
+    """
+    if _ACTIVE is not None:
+        _ACTIVE.add_bytes(direction, count)
+
+
+def record_error(err):
+    """Record the exception causing the active run (if any) to fail.
+
+    Parameters
+    ----------
+    err : Exception
+        The exception, only its class name will be recorded.
+    """
+    if _ACTIVE is not None:
+        _ACTIVE.error = type(err).__name__
+
+
+@contextlib.contextmanager
+def recording(action):
+    """Context manager measuring a run and updating the metrics file afterwards.
+
+    The metrics file is only updated if one has been set through `configure()` while
+    the context was active. Failing to update it is logged but not considered an error.
+
+    Parameters
+    ----------
+    action : str
+        The name of the action being run.
+
+    Yields
+    ------
+    Run
+        The object collecting the measurements, its `status` attribute is expected to
+        be set to the result of the run.
+    """
+    global _ACTIVE  # pylint: disable-msg=global-statement
+
+    run = Run(action)
+    _ACTIVE = run
+    try:
+        yield run
+    except BaseException as err:
+        run.status = False
+        run.error = type(err).__name__
+        raise
+    finally:
+        _ACTIVE = None
+        run.finish()
+        if run.target:
+            try:
+                update(run.target, run)
+            except OSError as err:
+                log.warning(f"Unable to update metrics file [{run.target}]: {err}")
+
+
+def update(target, run):
+    """Add the measurements of a run to the metrics file.
+
+    Parameters
+    ----------
+    target : str
+        The path of the metrics file.
+    run : Run
+        The measurements to be added.
+    """
+    state_file = f"{target}.json"
+    with open(f"{target}.lock", "a", encoding="utf-8") as lockfile:
+        fcntl.flock(lockfile, fcntl.LOCK_EX)
+        state = _load_state(state_file)
+        _add_run(state, run)
+        _write_atomically(state_file, json.dumps(state))
+        _write_atomically(target, render(state))
+    log.debug(f"Updated metrics file [{target}].")
+
+
+def _load_state(state_file):
+    """Read the accumulated values, starting from scratch if they can't be parsed."""
+    try:
+        with open(state_file, "r", encoding="utf-8") as infile:
+            return json.load(infile)
+    except FileNotFoundError:
+        pass
+    except ValueError as err:
+        log.warning(f"Discarding invalid metrics state [{state_file}]: {err}")
+    return {"actions": {}, "durations": {}, "transferred": {}, "failures": {}}
+
+
+def _add_run(state, run):
+    """Update the accumulated values (as returned by `_load_state()`) with a run."""
+    status = "success" if run.status else "failure"
+    actions = state["actions"].setdefault(run.action, {})
+    actions[status] = actions.get(status, 0) + 1
+
+    hist = state["durations"].setdefault(
+        run.action, {"buckets": [0] * len(LATENCY_BUCKETS), "sum": 0.0, "count": 0}
+    )
+    for i, bound in enumerate(LATENCY_BUCKETS):
+        if run.duration <= bound:
+            hist["buckets"][i] += 1
+    hist["sum"] += run.duration
+    hist["count"] += 1
+
+    for direction, count in run.transferred.items():
+        state["transferred"][direction] = state["transferred"].get(direction, 0) + count
+
+    if not run.status:
+        error = run.error or "ActionFailed"
+        failures = state["failures"].setdefault(run.action, {})
+        failures[error] = failures.get(error, 0) + 1
+
+
+def render(state):
+    """Format the accumulated values in the Prometheus text format.
+
+    Parameters
+    ----------
+    state : dict
+        The accumulated values as stored in the JSON file next to the metrics file.
+
+    Returns
+    -------
+    str
+        The content for the metrics file.
+    """
+    lines = [
+        "# HELP hrm_omero_actions_total Number of connector runs per action.",
+        "# TYPE hrm_omero_actions_total counter",
+    ]
+    for action, statuses in sorted(state["actions"].items()):
+        for status, count in sorted(statuses.items()):
+            labels = _labels(action=action, status=status)
+            lines.append(f"hrm_omero_actions_total{labels} {count}")
+
+    lines.append(
+        "# HELP hrm_omero_action_duration_seconds Run time of connector actions."
+    )
+    lines.append("# TYPE hrm_omero_action_duration_seconds histogram")
+    for action, hist in sorted(state["durations"].items()):
+        for bound, count in zip(LATENCY_BUCKETS, hist["buckets"]):
+            labels = _labels(action=action, le=str(float(bound)))
+            lines.append(f"hrm_omero_action_duration_seconds_bucket{labels} {count}")
+        count = hist["count"]
+        labels = _labels(action=action, le="+Inf")
+        lines.append(f"hrm_omero_action_duration_seconds_bucket{labels} {count}")
+        labels = _labels(action=action)
+        lines.append(f"hrm_omero_action_duration_seconds_sum{labels} {hist['sum']}")
+        lines.append(f"hrm_omero_action_duration_seconds_count{labels} {count}")
+
+    lines.append(
+        "# HELP hrm_omero_transferred_bytes_total Bytes transferred from / to OMERO."
+    )
+    lines.append("# TYPE hrm_omero_transferred_bytes_total counter")
+    for direction, count in sorted(state["transferred"].items()):
+        labels = _labels(direction=direction)
+        lines.append(f"hrm_omero_transferred_bytes_total{labels} {count}")
+
+    lines.append("# HELP hrm_omero_failures_total Failed connector runs by error.")
+    lines.append("# TYPE hrm_omero_failures_total counter")
+    for action, errors in sorted(state["failures"].items()):
+        for error, count in sorted(errors.items()):
+            labels = _labels(action=action, error=error)
+            lines.append(f"hrm_omero_failures_total{labels} {count}")
+
+    return "\n".join(lines) + "\n"
+
+
+def _labels(**labels):
+    """Format a label set, escaping the values as required by the text format."""
+    escaped = []
+    for name, value in labels.items():
+        value = value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        escaped.append(f'{name}="{value}"')
+    return "{" + ",".join(escaped) + "}"
+
+
+def _write_atomically(path, content):
+    """Replace a file by a new (world-readable) one having the given content."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmpname = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        os.fchmod(fd, 0o644)  # the node exporter usually runs as a different user
+        with os.fdopen(fd, "w", encoding="utf-8") as outfile:
+            outfile.write(content)
+        os.replace(tmpname, path)
+    except BaseException:
+        os.unlink(tmpname)
+        raise
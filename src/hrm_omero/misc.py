@@ -1,6 +1,11 @@
 """Miscellaneous functions used across the package."""
 
+import contextlib
+import io
 import os
+import shutil
+import sys
+import threading
 
 from loguru import logger as log
 
@@ -138,3 +143,164 @@ def changemodes(basepath, elements, dmode=0o775, fmode=0o664):
             for fname in filenames:
                 log.trace(f"Adjusting permissions on [{fname}] to [{fmode:o}]...")
                 os.chmod(os.path.join(dirpath, fname), mode=fmode)
+
+
+MATERIALISE_METHODS = ("reflink", "copy_file_range", "copy")
+"""Default methods tried (in this order) by `materialise()`.
+
+Hardlinks are not included, as the target would share its inode (and hence its
+permissions and contents) with the source.
+"""
+
+_FICLONE = 0x40049409
+"""The Linux `ioctl` request for cloning a file (i.e. creating a reflink)."""
+
+
+def materialise(source, target, methods=MATERIALISE_METHODS):
+    """Create a file with the contents of an existing one, avoiding a copy if possible.
+
+    The methods are tried in the given order until one of them succeeds:
+
+    * `link` creates a hardlink, only possible on the same file system. Note that the
+      target shares the inode (including permissions and contents) with the source
+      then, so it is not part of the default methods.
+    * `reflink` creates a copy-on-write clone (e.g. on Btrfs or XFS).
+    * `copy_file_range` copies the contents inside the kernel (or the storage system,
+      e.g. for NFS or GPFS) using `os.copy_file_range()`, requiring Python 3.8.
+    * `copy` copies the contents (using `shutil.copyfile()`, which uses the kernel's
+      in-place copy functions where available).
+
+    Parameters
+    ----------
+    source : str
+        The existing file.
+    target : str
+        The file to create, must not exist yet.
+    methods : tuple(str), optional
+        The methods to try, by default `MATERIALISE_METHODS`.
+
+    Returns
+    -------
+    str
+        The method that succeeded.
+
+    Raises
+    ------
+    FileExistsError
+        Raised in case the target already exists.
+    OSError
+        Raised (being the error of the last method) in case all methods failed.
+    """
+    if os.path.lexists(target):
+        raise FileExistsError(f"target [{target}] already exists")
+
+    error = OSError(f"no method to materialise [{source}] given")
+    for method in methods:
+        try:
+            if method == "link":
+                os.link(source, target)
+            elif method == "reflink":
+                _reflink(source, target)
+            elif method == "copy_file_range":
+                _copy_file_range(source, target)
+            elif method == "copy":
+                shutil.copyfile(source, target)
+            else:
+                raise ValueError(f"unknown method '{method}'")
+        except OSError as err:
+            log.trace(f"Unable to {method} [{source}] to [{target}]: {err}")
+            if method != "link":
+                with contextlib.suppress(FileNotFoundError):
+                    os.unlink(target)
+            error = err
+            continue
+        log.trace(f"Materialised [{source}] as [{target}] using {method}.")
+        return method
+    raise error
+
+
+def _reflink(source, target):
+    """Clone a file using the `FICLONE` ioctl (Linux only)."""
+    import fcntl  # pylint: disable-msg=import-outside-toplevel
+
+    with open(source, "rb") as infile, open(target, "xb") as outfile:
+        fcntl.ioctl(outfile.fileno(), _FICLONE, infile.fileno())
+
+
+def _copy_file_range(source, target):
+    """Copy a file using `os.copy_file_range()` (Linux only)."""
+    copy_file_range = getattr(os, "copy_file_range", None)
+    if copy_file_range is None:
+        raise OSError("os.copy_file_range() is not available")
+
+    with open(source, "rb") as infile, open(target, "xb") as outfile:
+        remaining = os.fstat(infile.fileno()).st_size
+        while remaining > 0:
+            copied = copy_file_range(infile.fileno(), outfile.fileno(), remaining)
+            if copied == 0:
+                raise OSError(f"unexpected end of [{source}] ({remaining} bytes left)")
+            remaining -= copied
+
+
+class _ThreadLocalStdout:
+
+    """Proxy for `sys.stdout` redirecting writes of selected threads into buffers.
+
+    Threads that did not register a buffer (see `capture_stdout()`) will continue to
+    write to the original stream, so `print()` calls from unrelated threads are not
+    affected by the redirection.
+    """
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._local = threading.local()
+
+    @property
+    def buffer(self):
+        """The buffer registered for the current thread (or `None`)."""
+        return getattr(self._local, "buffer", None)
+
+    @buffer.setter
+    def buffer(self, value):
+        self._local.buffer = value
+
+    def write(self, text):
+        target = self.buffer if self.buffer is not None else self._stream
+        return target.write(text)
+
+    def flush(self):
+        target = self.buffer if self.buffer is not None else self._stream
+        target.flush()
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+_STDOUT_LOCK = threading.Lock()
+
+
+@contextlib.contextmanager
+def capture_stdout():
+    """Context manager capturing everything the current thread prints to stdout.
+
+    As opposed to `contextlib.redirect_stdout()` this is safe to be used from several
+    threads concurrently, each of them getting their own buffer. This is required to
+    collect the output of functions like `printlog()` when running tasks in parallel.
+
+    Yields
+    ------
+    io.StringIO
+        The buffer receiving the captured output.
+    """
+    with _STDOUT_LOCK:
+        if not isinstance(sys.stdout, _ThreadLocalStdout):
+            sys.stdout = _ThreadLocalStdout(sys.stdout)
+        proxy = sys.stdout
+
+    previous = proxy.buffer
+    captured = io.StringIO()
+    proxy.buffer = captured
+    try:
+        yield captured
+    finally:
+        proxy.buffer = previous
@@ -1,13 +1,17 @@
-"""Functions related to direct interaction with OMERO."""
+"""Functions related to direct interaction with OMERO.
 
+NOTE: the OMERO Python bindings (and `Ice`, `yaml`) are imported inside the functions
+requiring them as loading them takes a considerable amount of time that should not be
+spent for calls that don't need them (e.g. `--dry-run` or `--help`).
+"""
+
+import queue
+import threading
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 
-import yaml
-from Ice import ConnectionLostException  # pylint: disable-msg=no-name-in-module
 from loguru import logger as log
 
-import omero.gateway
-
 from .decorators import connect_and_set_group
 from .misc import printlog
 
@@ -38,6 +42,8 @@ def connect(user, passwd, host, port=4064):  # pragma: no cover
         The OMERO connection object.
     """
     log.warning("'connect()' is DEPRECATED, will be removed in an upcoming release!")
+    import omero.gateway  # pylint: disable-msg=import-outside-toplevel
+
     conn = omero.gateway.BlitzGateway(
         user, passwd, host=host, port=port, secure=True, useragent="HRM-OMERO.connector"
     )
@@ -47,6 +53,223 @@ def connect(user, passwd, host, port=4064):  # pragma: no cover
     return conn
 
 
+def new_gateway(user, passwd, host, port=4064):
+    """Create a new (not yet connected) OMERO gateway object.
+
+    Parameters
+    ----------
+    user : str
+        The OMERO user name (e.g. `demo_user_01`).
+    passwd : str
+        The corresponding OMERO user password.
+    host : str
+        The OMERO server hostname or IP address.
+    port : int, optional
+        The OMERO port number, by default 4064.
+
+    Returns
+    -------
+    omero.gateway.BlitzGateway
+        The OMERO connection object, `connect()` has not been called on it yet.
+    """
+    import omero.gateway  # pylint: disable-msg=import-outside-toplevel
+
+    return omero.gateway.BlitzGateway(
+        username=user,
+        passwd=passwd,
+        host=host,
+        port=port,
+        secure=True,
+        useragent="hrm-omero.py",
+    )
+
+
+def join_session(conn):
+    """Create an additional connection joining the session of an established one.
+
+    As `BlitzGateway` objects must not be shared across threads, every thread needs its
+    own connection. Joining the existing session avoids sending the credentials (and
+    having the server authenticate them) again.
+
+    Note that the returned connection should be closed using `close(hard=False)` as
+    otherwise the (shared) session will be terminated on the server.
+
+    Parameters
+    ----------
+    conn : omero.gateway.BlitzGateway
+        An established OMERO connection object.
+
+    Returns
+    -------
+    omero.gateway.BlitzGateway
+        A new connection object using the same session as `conn`.
+
+    Raises
+    ------
+    RuntimeError
+        Raised in case joining the session fails.
+    """
+    import omero.gateway  # pylint: disable-msg=import-outside-toplevel
+
+    session_key = conn.getEventContext().sessionUuid
+    worker = omero.gateway.BlitzGateway(
+        host=conn.host, port=conn.port, secure=True, useragent="hrm-omero.py"
+    )
+    if not worker.connect(sUuid=session_key):
+        raise RuntimeError("Failed to join existing OMERO session!")
+
+    log.debug(f"Joined OMERO session [user={conn.getUser().getName()}].")
+    return worker
+
+
+class ConnectionPool:
+
+    """A pool of OMERO connections sharing the session of an authenticated one.
+
+    `BlitzGateway` objects are not thread-safe, so every thread needs its own
+    connection. The pool creates up to `size` worker connections on demand by joining
+    the session of `conn` (see `join_session()`) and hands them out through the
+    `connection()` context manager, blocking in case all of them are in use.
+
+    As all workers share one session on the server, switching the group of the session
+    (`setGroupForSession()`) would affect all of them. The group of a worker is
+    therefore tracked by its own call context (`SERVICE_OPTS`) instead, which is also
+    what `hrm_omero.decorators.connect_and_set_group()` does for pooled
+    connections. Operations that really require the session group to be switched (e.g.
+    imports) have to use `session_group()`, which serializes them.
+
+    Parameters
+    ----------
+    conn : omero.gateway.BlitzGateway
+        An established OMERO connection object.
+    size : int
+        The maximum number of worker connections.
+
+    Example
+    -------
+    >>> with ConnectionPool(conn, 4) as pool:
+    ...     with pool.connection(group=7) as worker:
+    ...         image = worker.getObject("Image", 42)
+    """
+
+    def __init__(self, conn, size):
+        if size < 1:
+            raise ValueError(f"Invalid pool size: {size}")
+        self.conn = conn
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._workers = []
+        self._lock = threading.Lock()
+        self._session_lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @contextmanager
+    def connection(self, group=None):
+        """Context manager handing out a worker connection for exclusive use.
+
+        Parameters
+        ----------
+        group : int or str, optional
+            The group to set on the worker's call context, by default `None` which will
+            leave it unchanged.
+
+        Yields
+        ------
+        omero.gateway.BlitzGateway
+            The worker connection.
+        """
+        with self._slots:
+            worker = self._checkout()
+            try:
+                if group is not None:
+                    self.set_group(worker, group)
+                yield worker
+            finally:
+                self._idle.put(worker)
+
+    def _checkout(self):
+        """Get an idle worker that is still alive or create a new one."""
+        try:
+            worker = self._idle.get_nowait()
+        except queue.Empty:
+            worker = None
+
+        if worker is not None:
+            try:
+                if worker.keepAlive():
+                    return worker
+            except Exception:  # pylint: disable-msg=broad-except
+                pass
+            log.debug("Pooled OMERO connection is not alive any more, replacing it.")
+            self._discard(worker)
+
+        worker = join_session(self.conn)
+        worker.hrm_omero_pool = self
+        with self._lock:
+            self._workers.append(worker)
+        return worker
+
+    def _discard(self, worker):
+        """Remove a worker from the pool and close it (keeping the session)."""
+        with self._lock:
+            self._workers.remove(worker)
+        worker.close(hard=False)
+
+    def set_group(self, worker, group):
+        """Set the group on the call context of a worker unless it is already set.
+
+        Parameters
+        ----------
+        worker : omero.gateway.BlitzGateway
+            A connection handed out by the pool.
+        group : int or str
+            The group ID, `-1` meaning all groups of the user.
+        """
+        current = worker.SERVICE_OPTS.getOmeroGroup()
+        if current is not None and str(current) == str(group):
+            return
+        worker.SERVICE_OPTS.setOmeroGroup(group)
+        log.trace(f"Set group of pooled OMERO connection to [{group}].")
+
+    @contextmanager
+    def session_group(self, worker, group):
+        """Context manager switching the group of the (shared) session.
+
+        Only one worker at a time may hold the session group, so this should only be
+        used for operations not respecting the call context.
+
+        Parameters
+        ----------
+        worker : omero.gateway.BlitzGateway
+            A connection handed out by the pool.
+        group : int or str
+            The group ID.
+
+        Yields
+        ------
+        omero.gateway.BlitzGateway
+            The worker connection.
+        """
+        with self._session_lock:
+            worker.setGroupForSession(group)
+            yield worker
+
+    def close(self):
+        """Close all worker connections without terminating the shared session."""
+        with self._lock:
+            workers = list(self._workers)
+            self._workers.clear()
+        for worker in workers:
+            worker.close(hard=False)
+        log.debug(f"Closed {len(workers)} pooled OMERO connection(s).")
+
+
 def check_credentials(conn):
     """Check if supplied credentials are valid and print a message to stdout.
 
@@ -61,6 +284,9 @@ def check_credentials(conn):
         True if connecting was successful (i.e. credentials are correct), False
         otherwise.
     """
+    # pylint: disable-msg=import-outside-toplevel
+    from Ice import ConnectionLostException  # pylint: disable-msg=no-name-in-module
+
     log.debug("Trying to connect to OMERO...")
     connected = conn.connect()
     if connected:
@@ -94,6 +320,8 @@ def extract_image_id(fname):
         The OMERO ID of the newly imported image, e.g. `1568386` or `None` in case
         parsing the file failed for any reason.
     """
+    import yaml  # pylint: disable-msg=import-outside-toplevel
+
     try:
         with open(fname, "r", encoding="utf-8") as stream:
             parsed = yaml.safe_load(stream)
@@ -133,6 +361,8 @@ def add_annotation_keyvalue(conn, omero_id, annotation):
     RuntimeError
         Raised in case re-establishing the OMERO connection fails.
     """
+    import omero.gateway  # pylint: disable-msg=import-outside-toplevel
+
     log.trace(f"Adding a map annotation to {omero_id}")
     target_obj = conn.getObject(omero_id.obj_type, omero_id.obj_id)
     if target_obj is None:
@@ -0,0 +1,190 @@
+"""Per-phase timing of connector runs, requested through the `--profile` option.
+
+Code paths worth measuring are wrapped in a `phase()` context manager, e.g.
+
+```
+with profiling.phase("connect"):
+    conn.connect()
+```
+
+which is a no-op unless a `Profiler` has been activated through `recording()`. In that
+case the wall-clock and CPU time spent in each phase is collected and written as JSON
+(to stderr or a file) once the run has finished:
+
+```
+{"phases": [{"phase": "parse_config", "start": 0.0001, "wall": 0.0004, "cpu": 0.0004},
+            {"phase": "connect", "start": 0.0009, "wall": 0.8143, "cpu": 0.0912,
+             "parent": "action"}, ...],
+ "total": {"wall": 1.2345, "cpu": 0.3456}}
+```
+
+Phases may be nested, in which case the name of the enclosing phase is given as
+`parent` (and its time includes the one of the nested phase). Note that CPU times are
+measured for the whole process, so phases running concurrently in several threads will
+see each other's CPU usage.
+"""
+
+import contextlib
+import json
+import sys
+import threading
+import time
+
+from loguru import logger as log
+
+_ACTIVE = None
+
+
+class Profiler:
+
+    """Collector for the wall-clock and CPU times of named phases."""
+
+    def __init__(self):
+        self.phases = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._wall_start = time.perf_counter()
+        self._cpu_start = time.process_time()
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """Context manager measuring the time spent in the enclosed block.
+
+        Parameters
+        ----------
+        name : str
+            The name of the phase to be used in the report.
+        """
+        stack = self._local.__dict__.setdefault("stack", [])
+        parent = stack[-1] if stack else None
+        stack.append(name)
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield
+        finally:
+            entry = {
+                "phase": name,
+                "start": round(wall_start - self._wall_start, 6),
+                "wall": round(time.perf_counter() - wall_start, 6),
+                "cpu": round(time.process_time() - cpu_start, 6),
+            }
+            if parent is not None:
+                entry["parent"] = parent
+            stack.pop()
+            with self._lock:
+                self.phases.append(entry)
+
+    def report(self):
+        """Assemble the collected timings.
+
+        Returns
+        -------
+        dict
+            The phases (sorted by their start time) and the totals since the profiler
+            has been created, see the module description for details.
+        """
+        with self._lock:
+            phases = sorted(self.phases, key=lambda x: x["start"])
+        return {
+            "phases": phases,
+            "total": {
+                "wall": round(time.perf_counter() - self._wall_start, 6),
+                "cpu": round(time.process_time() - self._cpu_start, 6),
+            },
+        }
+
+
+def phase(name):
+    """Measure a phase using the active profiler (if any).
+
+    Parameters
+    ----------
+    name : str
+        The name of the phase to be used in the report.
+
+    Returns
+    -------
+    context manager
+        The `Profiler.phase()` context of the active profiler or a no-op context in
+        case profiling has not been requested.
+    """
+    if _ACTIVE is None:
+        return contextlib.ExitStack()  # no-op context manager
+    return _ACTIVE.phase(name)
+
+
+@contextlib.contextmanager
+def recording(target=None, dump_file=None):
+    """Context manager activating a profiler for the enclosed block.
+
+    Parameters
+    ----------
+    target : str, optional
+        Where to write the timing report to, `-` meaning stderr. If `None` (the default)
+        no report will be written.
+    dump_file : str, optional
+        If given, the enclosed block is additionally run under `cProfile` and its
+        statistics are dumped into this file (to be inspected e.g. via `pstats`).
+
+    Yields
+    ------
+    Profiler or None
+        The active profiler or `None` in case neither `target` nor `dump_file` was
+        given (in which case nothing is recorded at all).
+    """
+    global _ACTIVE  # pylint: disable-msg=global-statement
+
+    if target is None and dump_file is None:
+        yield None
+        return
+
+    profiler = Profiler()
+    cprofile = None
+    if dump_file is not None:
+        import cProfile  # pylint: disable-msg=import-outside-toplevel
+
+        cprofile = cProfile.Profile()
+        cprofile.enable()
+
+    _ACTIVE = profiler
+    try:
+        yield profiler
+    finally:
+        _ACTIVE = None
+        if cprofile is not None:
+            cprofile.disable()
+            _dump(cprofile, dump_file)
+        if target is not None:
+            write_report(profiler.report(), target)
+
+
+def _dump(cprofile, dump_file):
+    """Write the `cProfile` statistics into a file, logging failures."""
+    try:
+        cprofile.dump_stats(dump_file)
+        log.info(f"Wrote cProfile statistics to [{dump_file}].")
+    except OSError as err:
+        log.error(f"Unable to write cProfile statistics to [{dump_file}]: {err}")
+
+
+def write_report(report, target):
+    """Write a timing report as JSON.
+
+    Parameters
+    ----------
+    report : dict
+        The report as returned by `Profiler.report()`.
+    target : str
+        The file to write the report to, `-` meaning stderr.
+    """
+    if target == "-":
+        print(json.dumps(report), file=sys.stderr)
+        return
+
+    try:
+        with open(target, "w", encoding="utf-8") as outfile:
+            json.dump(report, outfile, indent=2)
+        log.info(f"Wrote timing report to [{target}].")
+    except OSError as err:
+        log.error(f"Unable to write timing report to [{target}]: {err}")
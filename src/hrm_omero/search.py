@@ -0,0 +1,170 @@
+"""Functions to search OMERO objects by name.
+
+Locating an object in the tree requires expanding it level by level, which takes a lot
+of calls for users having thousands of datasets. Instead the objects can be searched
+by (a part of) their name across all groups of the user. Each hit carries the IDs of
+its ancestors in the tree (starting with the group), so the HRM can expand the tree
+straight to it:
+
+```json
+{
+    "class": "Image",
+    "id": "G:4:Image:1566150",
+    "label": "test-image.tif",
+    "owner": "somebody",
+    "path": [
+        "G:4:ExperimenterGroup:4",
+        "G:4:Experimenter:9",
+        "G:4:Project:12",
+        "G:4:Dataset:23"
+    ]
+}
+```
+
+An image contained in several datasets results in one hit per dataset, images that
+are not contained in any dataset (and are therefore not shown in the tree) have an
+empty path.
+"""
+
+from loguru import logger as log
+
+from .tree import gen_node_dict
+
+SEARCH_LIMIT = 100
+"""Default maximum number of hits per class."""
+
+_FROM_GROUP = (
+    "join {a}.details.group g join {a}.details.owner o "
+    "where lower({a}.name) like :pattern escape '!' and g.name != 'user' and g.id in "
+    "(select m.parent.id from GroupExperimenterMap m where m.child.id = :uid) "
+    "order by lower({a}.name), {a}.id"
+)
+
+SEARCH_QUERIES = {
+    "Project": (
+        "select p.id, p.name, g.id, o.omeName, o.id from Project p "
+        + _FROM_GROUP.format(a="p"),
+        ["Experimenter"],
+    ),
+    "Dataset": (
+        "select d.id, d.name, g.id, o.omeName, coalesce(powner.id, o.id), p.id "
+        "from Dataset d left outer join d.projectLinks pl left outer join pl.parent p "
+        "left outer join p.details.owner powner " + _FROM_GROUP.format(a="d"),
+        ["Experimenter", "Project"],
+    ),
+    "Image": (
+        "select i.id, i.name, g.id, o.omeName, coalesce(powner.id, downer.id), p.id, "
+        "d.id from Image i left outer join i.datasetLinks dl left outer join dl.parent d "
+        "left outer join d.details.owner downer left outer join d.projectLinks pl "
+        "left outer join pl.parent p left outer join p.details.owner powner "
+        + _FROM_GROUP.format(a="i"),
+        ["Experimenter", "Project", "Dataset"],
+    ),
+}
+"""HQL projections searching objects by name, together with the classes of their path.
+
+Every query returns the ID, name, group ID and owner name of the matching objects,
+followed by the IDs of the ancestors (in the order of the listed classes) below the
+group. The `Experimenter` is the owner of the top-level container, as the tree shows
+datasets under the owner of their project.
+"""
+
+
+def like_pattern(text, prefix=False):
+    """Create a (case-insensitive) HQL `like` pattern matching a name.
+
+    Parameters
+    ----------
+    text : str
+        The text to search for, wildcards (`%` and `_`) are escaped using `!`.
+    prefix : bool, optional
+        If set to True the name has to start with the text, otherwise it may be
+        contained anywhere. By default False.
+
+    Returns
+    -------
+    str
+        The pattern to use with `escape '!'`.
+    """
+    escaped = text.lower().replace("!", "!!").replace("%", "!%").replace("_", "!_")
+    return f"{escaped}%" if prefix else f"%{escaped}%"
+
+
+def gen_hit(obj_class, row):
+    """Create a search hit from a result row of a query in `SEARCH_QUERIES`.
+
+    Parameters
+    ----------
+    obj_class : str
+        The class of the object, one of the keys of `SEARCH_QUERIES`.
+    row : list
+        The (unwrapped) result row.
+
+    Returns
+    -------
+    dict
+        The hit, having the items of a tree node (see `hrm_omero.tree.gen_obj_dict()`)
+        except for `children` and the IDs of its ancestors in `path`.
+    """
+    obj_id, name, gid, owner = row[:4]
+    hit = gen_node_dict(obj_class, obj_id, name, owner, f"G:{gid}:")
+    del hit["children"]
+
+    path = []
+    if row[4] is not None:
+        path.append(f"G:{gid}:ExperimenterGroup:{gid}")
+        for path_class, path_id in zip(SEARCH_QUERIES[obj_class][1], row[4:]):
+            if path_id is not None:
+                path.append(f"G:{gid}:{path_class}:{path_id}")
+    hit["path"] = path
+    return hit
+
+
+def search(conn, text, prefix=False, classes=None, limit=SEARCH_LIMIT):
+    """Search projects, datasets and images by name in all groups of the user.
+
+    Parameters
+    ----------
+    conn : omero.gateway.BlitzGateway
+        The OMERO connection object.
+    text : str
+        The (case-insensitive) text to search for.
+    prefix : bool, optional
+        Only match names starting with the text, by default False.
+    classes : list(str), optional
+        The classes to search for, by default `None` meaning all of `SEARCH_QUERIES`.
+    limit : int, optional
+        The maximum number of hits per class, by default `SEARCH_LIMIT`.
+
+    Returns
+    -------
+    list(dict)
+        The hits as described in `gen_hit()`, grouped by class and sorted by name.
+
+    Raises
+    ------
+    RuntimeError
+        Raised in case the OMERO connection can't be established.
+    """
+    # pylint: disable-msg=import-outside-toplevel
+    from omero.rtypes import rlong, rstring, unwrap
+    from omero.sys import ParametersI
+
+    if not conn.isConnected() and not conn.connect():
+        raise RuntimeError("Failed to establish connection to OMERO!")
+
+    params = ParametersI()
+    params.add("uid", rlong(conn.getUserId()))
+    params.add("pattern", rstring(like_pattern(text, prefix)))
+    params.page(0, limit)
+    ctx = conn.SERVICE_OPTS.copy()
+    ctx.setOmeroGroup(-1)
+    query_service = conn.getQueryService()
+
+    hits = []
+    for obj_class in classes or SEARCH_QUERIES:
+        query = SEARCH_QUERIES[obj_class][0]
+        result = query_service.projection(query, params, ctx)
+        hits.extend(gen_hit(obj_class, unwrap(row)) for row in result)
+    log.debug(f"Found {len(hits)} objects matching '{text}'.")
+    return hits
@@ -0,0 +1,413 @@
+"""Functions to cache OMERO session keys and credential checks on disk.
+
+Each call of the connector is a separate process, so by default every single one of
+them has to do a full (password based) login to OMERO. If a cache directory is
+configured via `OMERO_CONNECTOR_SESSION_CACHE` in the HRM configuration file, the
+session key (UUID) of a successful login is stored there and subsequent calls will
+simply join that session instead.
+
+A cached session is only joined if the password supplied with the request matches the
+one that was used to create the session. For this purpose a salted (slow) hash of the
+password is stored next to the session key, the password itself is never written to
+disk. Note that this also means a cached session stays usable with the *previous*
+password until it expires on the OMERO server in case the password is changed there.
+
+Similarly, if `OMERO_CONNECTOR_CREDENTIALS_CACHE` is configured, the result of a
+successful `checkCredentials` call is remembered for a short time (see
+`OMERO_CONNECTOR_CREDENTIALS_TTL`), so repeated checks can be answered without asking
+the OMERO server. Failed checks are counted per user and password and will make
+subsequent checks with the *same* password back off (exponentially) before contacting
+the server again. A check with a different password is never throttled, otherwise
+anyone able to reach the connector could lock out a user by sending wrong passwords.
+"""
+
+import hashlib
+import hmac
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from loguru import logger as log
+
+from .misc import printlog
+
+HASH_ITERATIONS = 100000
+"""Number of PBKDF2 iterations used for hashing passwords."""
+
+CREDENTIALS_TTL = 300
+"""Default time in seconds a successful credentials check is cached."""
+
+BACKOFF_BASE = 2
+"""Delay in seconds after the second failed check, doubled on every further failure."""
+
+BACKOFF_MAX = 300
+"""Maximum delay in seconds between credentials checks after failures."""
+
+
+def password_hash(passwd, salt):
+    """Calculate a salted, deliberately slow hash of a password.
+
+    Parameters
+    ----------
+    passwd : str
+        The password to be hashed.
+    salt : bytes
+        The salt to be used.
+
+    Returns
+    -------
+    str
+        The hash in hexadecimal notation.
+    """
+    digest = hashlib.pbkdf2_hmac(
+        "sha256", passwd.encode("utf-8"), salt, HASH_ITERATIONS
+    )
+    return digest.hex()
+
+
+def password_matches(passwd, salt_hex, hash_hex):
+    """Check if a password matches a hash created by `password_hash()`.
+
+    Parameters
+    ----------
+    passwd : str
+        The password to be checked.
+    salt_hex : str
+        The salt used for the hash in hexadecimal notation.
+    hash_hex : str
+        The hash in hexadecimal notation.
+
+    Returns
+    -------
+    bool
+        True in case the password matches the hash, False otherwise.
+    """
+    return hmac.compare_digest(password_hash(passwd, bytes.fromhex(salt_hex)), hash_hex)
+
+
+def cache_file(cache_dir, host, port, user):
+    """Assemble the path of the cache file for a given user on a given server.
+
+    Parameters
+    ----------
+    cache_dir : str
+        The cache directory (for session keys or credential checks).
+    host : str
+        The OMERO server hostname or IP address.
+    port : int or int-like
+        The OMERO port number.
+    user : str
+        The OMERO user name.
+
+    Returns
+    -------
+    pathlib.Path
+        The full path of the cache file, named by a hash of the user, host and port.
+    """
+    name = hashlib.sha256(f"{user}@{host}:{port}".encode("utf-8")).hexdigest()
+    return Path(cache_dir) / f"{name}.json"
+
+
+def write_private(path, data):
+    """Atomically write a dict as JSON into a file only accessible by the owner.
+
+    The file is created with mode `0600` (and its parent directory with `0700` if it
+    doesn't exist yet) and moved into place once it is complete, so concurrent readers
+    will never see a partially written file.
+
+    Parameters
+    ----------
+    path : pathlib.Path
+        The target file.
+    data : dict
+        The (JSON serializable) content to be written.
+    """
+    path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+    # `mkstemp()` creates the file with mode 0600 already:
+    fd, tmpname = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as outfile:
+            json.dump(data, outfile)
+        os.replace(tmpname, path)
+    except BaseException:
+        os.unlink(tmpname)
+        raise
+
+
+def read_private(path):
+    """Read a JSON file written by `write_private()`.
+
+    Parameters
+    ----------
+    path : pathlib.Path
+        The file to read.
+
+    Returns
+    -------
+    dict or None
+        The parsed content or None in case the file doesn't exist, can't be parsed or
+        is accessible by other users than the owner.
+    """
+    try:
+        if path.stat().st_mode & 0o077:
+            log.warning(f"Ignoring [{path}] as it is accessible by other users!")
+            return None
+        with open(path, "r", encoding="utf-8") as infile:
+            return json.load(infile)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as err:
+        log.warning(f"Unable to read [{path}]: {err}")
+        return None
+
+
+def load_session_key(cache_dir, host, port, user, passwd):
+    """Load a cached session key, given the password matches the cached one.
+
+    Parameters
+    ----------
+    cache_dir : str
+        The directory where session keys are cached.
+    host : str
+        The OMERO server hostname or IP address.
+    port : int or int-like
+        The OMERO port number.
+    user : str
+        The OMERO user name.
+    passwd : str
+        The OMERO user password.
+
+    Returns
+    -------
+    str or None
+        The session key (UUID) or None in case there is no (matching) cache entry.
+    """
+    entry = read_private(cache_file(cache_dir, host, port, user))
+    if entry is None:
+        return None
+
+    try:
+        if not password_matches(passwd, entry["salt"], entry["hash"]):
+            log.info(f"Password doesn't match the cached session of [{user}].")
+            return None
+        return entry["session"]
+    except (KeyError, TypeError, ValueError) as err:
+        log.warning(f"Invalid session cache entry for [{user}]: {err}")
+        return None
+
+
+def store_session_key(cache_dir, host, port, user, passwd, session_key):
+    """Store a session key in the cache, together with a hash of the password.
+
+    Parameters
+    ----------
+    cache_dir : str
+        The directory where session keys are cached.
+    host : str
+        The OMERO server hostname or IP address.
+    port : int or int-like
+        The OMERO port number.
+    user : str
+        The OMERO user name.
+    passwd : str
+        The OMERO user password.
+    session_key : str
+        The session key (UUID) to be stored.
+    """
+    salt = os.urandom(16)
+    entry = {
+        "session": session_key,
+        "salt": salt.hex(),
+        "hash": password_hash(passwd, salt),
+        "created": time.time(),
+    }
+    try:
+        write_private(cache_file(cache_dir, host, port, user), entry)
+        log.debug(f"Cached OMERO session key of [{user}].")
+    except OSError as err:
+        log.warning(f"Unable to cache OMERO session key: {err}")
+
+
+def drop_session_key(cache_dir, host, port, user):
+    """Remove a cached session key (if present).
+
+    Parameters
+    ----------
+    cache_dir : str
+        The directory where session keys are cached.
+    host : str
+        The OMERO server hostname or IP address.
+    port : int or int-like
+        The OMERO port number.
+    user : str
+        The OMERO user name.
+    """
+    try:
+        cache_file(cache_dir, host, port, user).unlink()
+        log.debug(f"Removed cached OMERO session key of [{user}].")
+    except FileNotFoundError:
+        pass
+    except OSError as err:
+        log.warning(f"Unable to remove cached OMERO session key: {err}")
+
+
+def connect(conn, cache_dir, host, port, user, passwd):
+    """Connect to OMERO by joining a cached session, falling back to a password login.
+
+    In case a new session had to be created it is *detached* from the connection (so
+    it will survive `conn.close(hard=False)`) and its key is stored in the cache.
+
+    Parameters
+    ----------
+    conn : omero.gateway.BlitzGateway
+        The (not yet connected) OMERO connection object.
+    cache_dir : str
+        The directory where session keys are cached.
+    host : str
+        The OMERO server hostname or IP address.
+    port : int or int-like
+        The OMERO port number.
+    user : str
+        The OMERO user name.
+    passwd : str
+        The OMERO user password.
+
+    Returns
+    -------
+    bool
+        True in case the connection could be established, False otherwise.
+    """
+    session_key = load_session_key(cache_dir, host, port, user, passwd)
+    if session_key is not None:
+        log.debug(f"Trying to join cached OMERO session of [{user}]...")
+        if conn.connect(sUuid=session_key):
+            if conn.getEventContext().sessionUuid == session_key:
+                log.success(f"Joined cached OMERO session of [{user}].")
+                return True
+        else:
+            log.info(f"Cached OMERO session of [{user}] expired, logging in again.")
+            drop_session_key(cache_dir, host, port, user)
+
+    if not conn.isConnected() and not conn.connect():
+        log.warning(f"Logging into OMERO failed for [{user}].")
+        return False
+
+    conn.c.getSession().detachOnDestroy()
+    store_session_key(
+        cache_dir, host, port, user, passwd, conn.getEventContext().sessionUuid
+    )
+    return True
+
+
+def lookup_credentials(cache_dir, host, port, user, passwd):
+    """Try to answer a credentials check from the cache.
+
+    Parameters
+    ----------
+    cache_dir : str
+        The directory where credential checks are cached.
+    host : str
+        The OMERO server hostname or IP address.
+    port : int or int-like
+        The OMERO port number.
+    user : str
+        The OMERO user name.
+    passwd : str
+        The OMERO user password.
+
+    Returns
+    -------
+    bool or None
+        True in case the credentials match a successful check that is not yet expired,
+        False in case checks for this user and password are currently throttled due to
+        previous failures and None in case the OMERO server needs to be asked.
+    """
+    entry = read_private(cache_file(cache_dir, host, port, user))
+    if entry is None:
+        return None
+
+    now = time.time()
+    try:
+        if entry.get("hash") and entry["expires"] > now:
+            if password_matches(passwd, entry["salt"], entry["hash"]):
+                printlog("SUCCESS", f"Credentials for [{user}] verified (cached).")
+                return True
+
+        if entry.get("retry_after", 0) > now and password_matches(
+            passwd, entry["failed_salt"], entry["failed_hash"]
+        ):
+            wait = int(entry["retry_after"] - now) + 1
+            printlog(
+                "WARNING",
+                f"ERROR logging into OMERO: too many failed attempts for [{user}], "
+                f"please retry in {wait} seconds.",
+            )
+            return False
+    except (KeyError, TypeError, ValueError) as err:
+        log.warning(f"Invalid credentials cache entry for [{user}]: {err}")
+
+    return None
+
+
+def record_credentials(cache_dir, host, port, user, passwd, valid, ttl=CREDENTIALS_TTL):
+    """Record the result of a credentials check in the cache.
+
+    A successful check stores a salted hash of the password that will be accepted for
+    `ttl` seconds and resets the failure count. A failed check stores a salted hash of
+    the wrong password, increments the failure count in case the password is the same
+    as the one of the previous failure (starting from one otherwise) and sets the time
+    before which no further check with this password will be sent to the server. Note
+    that concurrent processes might occasionally lose an increment of the count.
+
+    Parameters
+    ----------
+    cache_dir : str
+        The directory where credential checks are cached.
+    host : str
+        The OMERO server hostname or IP address.
+    port : int or int-like
+        The OMERO port number.
+    user : str
+        The OMERO user name.
+    passwd : str
+        The OMERO user password.
+    valid : bool
+        The result of the credentials check.
+    ttl : int or float, optional
+        The time in seconds a successful check is cached, by default `CREDENTIALS_TTL`.
+    """
+    path = cache_file(cache_dir, host, port, user)
+    now = time.time()
+    if valid:
+        salt = os.urandom(16)
+        entry = {
+            "salt": salt.hex(),
+            "hash": password_hash(passwd, salt),
+            "expires": now + ttl,
+            "failures": 0,
+        }
+    else:
+        entry = read_private(path) or {}
+        failures = 1
+        try:
+            if password_matches(passwd, entry["failed_salt"], entry["failed_hash"]):
+                failures = int(entry.get("failures", 0)) + 1
+        except (KeyError, TypeError, ValueError):
+            pass
+        if failures == 1:
+            salt = os.urandom(16)
+            entry["failed_salt"] = salt.hex()
+            entry["failed_hash"] = password_hash(passwd, salt)
+        delay = 0
+        if failures > 1:
+            delay = min(BACKOFF_BASE * 2 ** (failures - 2), BACKOFF_MAX)
+        entry["failures"] = failures
+        entry["retry_after"] = now + delay
+        log.info(f"Credentials check for [{user}] failed {failures} time(s).")
+
+    try:
+        write_private(path, entry)
+    except OSError as err:
+        log.warning(f"Unable to cache credentials check: {err}")
@@ -1,22 +1,53 @@
 """Transfer related functions."""
 
+import contextlib
+import fcntl
+import hashlib
+import json
 import os
 import tempfile
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
 from io import BytesIO
 from pathlib import Path
 import stat
 
 from loguru import logger as log
-from PIL import Image
 
 from . import hrm
+from . import metrics
+from . import profiling
 from .decorators import connect_and_set_group
-from .omero import extract_image_id, add_annotation_keyvalue
-from .misc import printlog, changemodes
+from .omero import ConnectionPool, extract_image_id, add_annotation_keyvalue
+from .misc import printlog, changemodes, materialise
+
+DOWNLOAD_JOBS = 4
+"""Default number of original files of a fileset being downloaded in parallel."""
+
+DOWNLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+"""Default number of bytes requested from OMERO's raw file store at once."""
+
+REPOSITORY_METHODS = ("reflink", "copy_file_range", "copy")
+"""Methods used to materialise files from a local managed repository.
+
+Hardlinks are deliberately not used, as the files would share their inode (and hence
+their permissions and contents) with the ones of the repository. See
+`hrm_omero.misc.materialise()` for details.
+"""
+
+MANIFEST_NAME = ".hrm-omero-manifest.json"
+"""Name of the file recording size and hash of the downloaded files in a directory."""
 
 
 @connect_and_set_group
-def from_omero(conn, omero_id, dest):
+def from_omero(  # pylint: disable-msg=too-many-arguments
+    conn,
+    omero_id,
+    dest,
+    jobs=1,
+    chunk_size=DOWNLOAD_CHUNK_SIZE,
+    download_cache=None,
+    repository_root="",
+):
     """Download the corresponding original file(s) from an image ID.
 
     This only works for image IDs that were created with OMERO 5.0 or later as previous
@@ -30,14 +61,43 @@ def from_omero(conn, omero_id, dest):
     file from OMERO and puts it into the appropriate place so HRM will show it as a
     preview until the user hits "re-generate preview".
 
+    Downloaded files are verified against the SHA1 hash stored by OMERO (computed while
+    writing them). Size and hash of every file are recorded in a manifest
+    (`MANIFEST_NAME`) in the destination directory, so files that already exist are
+    skipped if they are identical to the ones in OMERO (requiring only a `stat()` call
+    in case they are recorded in the manifest), see `is_identical()`.
+
+    Several images can be requested at once, e.g. multiple series of a LIF or CZI file.
+    They are resolved to their filesets in a single query (see `query_filesets()`) and
+    every distinct fileset is downloaded only once, while a thumbnail is fetched for
+    each of the images.
+
+    If the managed repository of OMERO is accessible on the local file system (e.g. on
+    a shared GPFS), the original files are taken from there instead of transferring
+    them through OMERO, see `copy_from_repository()`.
+
     Parameters
     ----------
     conn : omero.gateway.BlitzGateway
         The OMERO connection object.
-    omero_id : hrm_omero.misc.OmeroId
-        The ID of the OMERO image to be downloaded.
+    omero_id : hrm_omero.misc.OmeroId or list(hrm_omero.misc.OmeroId)
+        The ID of the OMERO image to be downloaded, or a list of image IDs.
     dest : str
         The destination path.
+    jobs : int, optional
+        The maximum number of original files to download in parallel (each on its own
+        connection joining the session of `conn`), by default 1. See
+        `download_files()` for details.
+    chunk_size : int, optional
+        The number of bytes to request at once, by default `DOWNLOAD_CHUNK_SIZE`. The
+        progress of a download is recorded after each chunk, so an interrupted download
+        can be resumed from there, see `download_original_file()`.
+    download_cache : hrm_omero.downloadcache.DownloadCache, optional
+        The cache to materialise the original files from (if present there) and to add
+        the downloaded ones to, by default `None`.
+    repository_root : str, optional
+        The location of OMERO's managed repository on the local file system, by default
+        empty meaning files are always downloaded through OMERO.
 
     Returns
     -------
@@ -49,11 +109,12 @@ def from_omero(conn, omero_id, dest):
     ValueError
         Raised in case an object that is not of type `Image` was requested.
     """
-    log.trace(f"Downloading {omero_id.obj_type}:{omero_id.obj_id} to [{dest}]...")
+    omero_ids = omero_id if isinstance(omero_id, list) else [omero_id]
+    log.trace(f"Downloading {', '.join(str(x) for x in omero_ids)} to [{dest}]...")
 
     # conn.setGroupForSession(-1)
     conn.SERVICE_OPTS.setOmeroGroup(-1)  # still working with OMERO-5.6.3
-    if omero_id.obj_type != "Image":
+    if any(x.obj_type != "Image" for x in omero_ids):
         raise ValueError("Currently only the download of 'Image' objects is supported!")
 
     # check if dest is a directory, rewrite it otherwise:
@@ -62,69 +123,615 @@ def from_omero(conn, omero_id, dest):
         # specifying a file *name* for the target doesn't have an effect on how the
         # downloaded file will be called actually!
         dest = os.path.dirname(dest)
-    from omero_model_OriginalFileI import OriginalFileI
 
-    # use image objects and getFileset() methods to determine original files,
-    # see the following OME forum thread for some more details:
+    # resolve the images to their filesets, see the following OME forum thread for
+    # some more details on how original files are related to images:
     # https://www.openmicroscopy.org/community/viewtopic.php?f=6&t=7563
-    target_obj = conn.getObject(omero_id.obj_type, omero_id.obj_id)
-    if not target_obj:
-        printlog("ERROR", f"ERROR: can't find image with ID [{omero_id.obj_id}]!")
-        return False
+    with profiling.phase("fileset_query"):
+        images, filesets = query_filesets(conn, [int(x.obj_id) for x in omero_ids])
 
-    fset = target_obj.getFileset()
-    if not fset:  # pragma: no cover
-        printlog("ERROR", f"ERROR: no original file(s) for [{omero_id.obj_id}] found!")
-        return False
+    for obj_id in [int(x.obj_id) for x in omero_ids]:
+        if obj_id not in images:
+            printlog("ERROR", f"ERROR: can't find image with ID [{obj_id}]!")
+            return False
+        # images without a fileset or whose fileset has no original files:
+        if images[obj_id][0] not in filesets:
+            printlog("ERROR", f"ERROR: no original file(s) for [{obj_id}] found!")
+            return False
 
     # NOTE: the idea of offering to download the OME-TIFF from OMERO (i.e. the converted
     # data) as an alternative has been discarded for the moment - see upstream HRM
     # ticket #398 (http://hrm.svi.nl:8080/redmine/issues/398)
-    downloads = []
-    # assemble a list of items to download
-    for fset_file in fset.listFiles():
-        # for foo in dir(fset_file):
-        #     log.error(foo)
-        file_name = fset_file.getName()
-        file_path = fset_file.getPath()
-        downloads.append((fset_file.getId(), os.path.join(file_path, file_name)))
+    targets = {}
+    for fset_id, downloads in filesets.items():
+        log.debug(f"Downloading fileset [{fset_id}] ({len(downloads)} file(s))...")
+        targets[fset_id] = download_fileset(
+            conn, downloads, dest, jobs, chunk_size, download_cache, repository_root
+        )
+        if targets[fset_id] is None:
+            return False
+
+    # NOTE: for filesets with a single file or e.g. ICS/IDS pairs it makes
+    # sense to use the target name of the first file to construct the name for
+    # the thumbnail, but it is unclear whether this is a universal approach. If several
+    # images of the same fileset were requested, their name is appended in brackets
+    # (like HRM does for the sub-images of a file), replacing path separators as image
+    # names often contain the path of the original file:
+    fset_images = [images[int(x.obj_id)][0] for x in omero_ids]
+    with profiling.phase("thumbnail"):
+        for image_id in omero_ids:
+            fset_id, image_name = images[int(image_id.obj_id)]
+            thumbnail_name = targets[fset_id][0]
+            if fset_images.count(fset_id) > 1:
+                thumbnail_name += f" ({image_name.replace(os.sep, '_')})"
+            fetch_thumbnail(conn, image_id, thumbnail_name)
+    return True
 
+
+def query_filesets(conn, image_ids):
+    """Resolve images to their (distinct) filesets and original files in one query.
+
+    Parameters
+    ----------
+    conn : omero.gateway.BlitzGateway
+        The OMERO connection object.
+    image_ids : list(int)
+        The IDs of the images.
+
+    Returns
+    -------
+    (dict, dict)
+        The fileset ID (`None` for images without a fileset) and the name of each image
+        found in OMERO, keyed by the image ID, and the original files of every fileset
+        keyed by its ID. The files are given as tuples of the form `(file_id, path,
+        size, sha1)` as expected by `download_fileset()`, `path` being the full path of
+        the file in the managed repository.
+    """
+    # pylint: disable-msg=import-outside-toplevel
+    from omero.rtypes import rlist, rlong, unwrap
+    from omero.sys import ParametersI
+
+    query = (
+        "select i.id, i.name, fs.id, f.id, f.path, f.name, f.size, f.hash, h.value "
+        "from Image i left outer join i.fileset fs left outer join fs.usedFiles u "
+        "left outer join u.originalFile f left outer join f.hasher h "
+        "where i.id in (:ids) order by fs.id, f.id"
+    )
+    params = ParametersI()
+    params.add("ids", rlist([rlong(x) for x in image_ids]))
+    result = conn.getQueryService().projection(query, params, conn.SERVICE_OPTS)
+
+    images = {}
+    filesets = {}
+    seen = set()
+    for row in result:
+        image_id, image_name, fset_id, *file_row = unwrap(row)
+        images[image_id] = (fset_id, image_name)
+        file_id, path, name, size, file_hash, hasher = file_row
+        # each file is returned once per requested image of its fileset:
+        if file_id is None or file_id in seen:
+            continue
+        seen.add(file_id)
+        sha1 = file_hash.lower() if hasher == "SHA1-160" and file_hash else None
+        path = os.path.join(path, name)
+        filesets.setdefault(fset_id, []).append((file_id, path, size or 0, sha1))
+    log.debug(f"Resolved {len(images)} image(s) to {len(filesets)} fileset(s).")
+    return images, filesets
+
+
+def download_fileset(  # pylint: disable-msg=too-many-arguments,too-many-locals
+    conn,
+    downloads,
+    dest,
+    jobs=1,
+    chunk_size=DOWNLOAD_CHUNK_SIZE,
+    download_cache=None,
+    repository_root="",
+):
+    """Download the original files of a fileset, see `from_omero()` for details.
+
+    Like `download_files()` this is all-or-nothing: if downloading any of the files
+    fails, the ones materialised from the managed repository or the download cache are
+    removed again and no manifest entries are written, so the fileset is never
+    reported as complete. Files that already existed before are left untouched.
+
+    Parameters
+    ----------
+    conn : omero.gateway.BlitzGateway
+        The OMERO connection object.
+    downloads : list(tuple)
+        The files of the fileset as returned by `query_filesets()`.
+    dest : str
+        The destination directory, the files are placed there relative to their common
+        prefix in the managed repository.
+    jobs : int, optional
+        The maximum number of files to download in parallel, by default 1.
+    chunk_size : int, optional
+        The number of bytes to request at once, by default `DOWNLOAD_CHUNK_SIZE`.
+    download_cache : hrm_omero.downloadcache.DownloadCache, optional
+        The download cache to use, by default `None`.
+    repository_root : str, optional
+        The location of the managed repository on the local file system, by default
+        empty.
+
+    Returns
+    -------
+    list(str) or None
+        The paths of the files (in the order given) or `None` in case the download
+        failed.
+    """
     # determine the common prefix, e.g. `hrm-test-02_3/2022-02/17/14-34-16.480/`
     all_files = [x[1] for x in downloads]
     strip = os.path.commonprefix(all_files).rindex("/") + 1
 
     # strip the common prefix, check if any of the files already exist:
+    downloads = list(downloads)
     top_level = []
-    for i, pair in enumerate(downloads):
-        rel_path = pair[1][strip:]
+    manifest = read_manifest(dest)
+    missing = []
+    sources = {}
+    for i, (file_id, file_path, file_size, sha1) in enumerate(downloads):
+        rel_path = file_path[strip:]
         log.trace(f"relative path: {rel_path}")
         top_level.append(rel_path.split("/")[0])
         abs_path = os.path.join(dest, rel_path)
-        downloads[i] = (pair[0], abs_path)
-        if os.path.exists(abs_path):
+        downloads[i] = (file_id, abs_path, file_size, sha1)
+        if not os.path.exists(abs_path):
+            missing.append(downloads[i])
+            sources[abs_path] = file_path
+        elif is_identical(abs_path, file_size, sha1, manifest.get(rel_path)):
+            printlog("SUCCESS", f"ID {file_id} already downloaded as '{rel_path}'")
+        else:
             printlog("ERROR", f"ERROR: file '{abs_path}' already existing!")
-            return False
+            return None
+
+    # take the files from the local repository or the download cache if possible:
+    pending = []
+    materialised = []
+    for item in missing:
+        source = os.path.join(repository_root, sources[item[1]])
+        if repository_root and copy_from_repository(source, *item[1:]):
+            printlog("SUCCESS", f"ID {item[0]} taken from the managed repository")
+            materialised.append(item[1])
+        elif download_cache is not None and download_cache.fetch(*item):
+            printlog("SUCCESS", f"ID {item[0]} taken from the download cache")
+            materialised.append(item[1])
+        else:
+            pending.append(item)
+
+    # now initiate the downloads for all remaining original files:
+    hashes = download_files(conn, pending, jobs, chunk_size)
+    if hashes is None:
+        # remove the materialised files again so no incomplete fileset is left behind,
+        # a retry can take them from the repository or the cache once more:
+        for abs_path in materialised:
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(abs_path)
+        return None
+
+    if download_cache is not None:
+        for file_id, abs_path, _, sha1 in pending:
+            download_cache.store(file_id, abs_path, sha1)
+
+    with profiling.phase("changemodes"):
+        changemodes(dest, top_level)
+
+    entries = {}
+    for file_id, abs_path, file_size, sha1 in downloads:
+        stat_result = os.stat(abs_path)
+        entries[os.path.relpath(abs_path, dest)] = {
+            "file_id": file_id,
+            "size": stat_result.st_size,
+            "sha1": hashes.get(abs_path, sha1),
+            "mtime": stat_result.st_mtime,
+        }
+    try:
+        update_manifest(dest, entries)
+    except OSError as err:
+        log.warning(f"Unable to write download manifest to [{dest}]: {err}")
 
-    # now initiate the downloads for all original files:
-    for (file_id, tgt) in downloads:
-        try:
-            log.trace(f"Downloading original file [{file_id}] to [{tgt}]...")
-            os.makedirs(os.path.dirname(tgt), exist_ok=True)
-            conn.c.download(OriginalFileI(file_id), tgt)
-        except Exception as err:  # pylint: disable-msg=broad-except
-            printlog("ERROR", f"ERROR: downloading {file_id} to '{tgt}' failed: {err}")
-            return False
-        printlog("SUCCESS", f"ID {file_id} downloaded as '{os.path.basename(tgt)}'")
+    return [x[1] for x in downloads]
 
-    changemodes(dest, top_level)
 
-    # NOTE: for filesets with a single file or e.g. ICS/IDS pairs it makes
-    # sense to use the target name of the first file to construct the name for
-    # the thumbnail, but it is unclear whether this is a universal approach:
-    fetch_thumbnail(conn, omero_id, downloads[0][1])
+def copy_from_repository(source, target, size, sha1):
+    """Materialise an original file from a managed repository on the local file system.
+
+    The file is only used if it is readable and identical to the original file in
+    OMERO (requiring its SHA1 hash being known, see `is_identical()`), it is then
+    materialised using one of the `REPOSITORY_METHODS`.
+
+    Parameters
+    ----------
+    source : str
+        The location of the file in the local managed repository.
+    target : str
+        The path of the file to create (including missing parent directories).
+    size : int
+        The size of the original file in OMERO.
+    sha1 : str or None
+        The SHA1 hash of the original file in OMERO.
+
+    Returns
+    -------
+    bool
+        True in case the file was materialised, False if it has to be downloaded.
+    """
+    if sha1 is None:
+        log.debug(f"No hash known for [{source}], can't use the repository.")
+        return False
+    try:
+        if not os.access(source, os.R_OK):
+            log.debug(f"File [{source}] is not readable in the local repository.")
+            return False
+        with profiling.phase("repository_verify"):
+            identical = is_identical(source, size, sha1)
+        if not identical:
+            log.warning(f"File [{source}] doesn't match the original file in OMERO!")
+            return False
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with profiling.phase("repository_copy"):
+            method = materialise(source, target, REPOSITORY_METHODS)
+    except OSError as err:
+        log.warning(f"Unable to use [{source}] from the local repository: {err}")
+        return False
+    log.debug(f"Materialised [{target}] from the local repository using {method}.")
     return True
 
 
+def download_files(conn, downloads, jobs=1, chunk_size=DOWNLOAD_CHUNK_SIZE):
+    """Download original files from OMERO, largest first and optionally in parallel.
+
+    The files are scheduled in descending order of their size, so the largest members
+    of a fileset don't end up being the last ones transferred by a single worker. For
+    more than one job, every worker uses its own connection (see
+    `hrm_omero.omero.ConnectionPool`) with its call context set to all groups of the
+    user.
+
+    Downloading is all-or-nothing: after the first failure no further downloads are
+    started and the files completed so far are turned back into partial downloads
+    (marked as complete), so no incomplete fileset is left behind while a retry will
+    only transfer the missing data (see `download_original_file()`).
+
+    Parameters
+    ----------
+    conn : omero.gateway.BlitzGateway
+        The (connected) OMERO connection object.
+    downloads : list(tuple)
+        The files to download as tuples of the form `(file_id, target_path, size,
+        sha1)`, `sha1` being the expected hash (or `None` if unknown).
+    jobs : int, optional
+        The maximum number of files to download in parallel, by default 1.
+    chunk_size : int, optional
+        The number of bytes to request at once, by default `DOWNLOAD_CHUNK_SIZE`.
+
+    Returns
+    -------
+    dict or None
+        The SHA1 hashes of the downloaded files keyed by their target path, or `None`
+        in case downloading any of them failed.
+    """
+    downloads = sorted(downloads, key=lambda item: item[2], reverse=True)
+    jobs = max(1, min(jobs, len(downloads)))
+    log.debug(f"Downloading {len(downloads)} original file(s) using {jobs} job(s)...")
+    started = []
+    hashes = {}
+    try:
+        if jobs == 1:
+            for file_id, tgt, _, sha1 in downloads:
+                started.append((file_id, tgt))
+                hashes[tgt] = _download_file(conn, file_id, tgt, chunk_size, sha1)
+        else:
+            _download_parallel(conn, downloads, jobs, chunk_size, started, hashes)
+    except Exception as err:  # pylint: disable-msg=broad-except
+        printlog("ERROR", f"ERROR: downloading original files failed: {err}")
+        for file_id, tgt in started:
+            if os.path.exists(tgt):
+                size = os.path.getsize(tgt)
+                os.replace(tgt, f"{tgt}.part")
+                write_progress(tgt, {"file_id": file_id, "size": size, "offset": size})
+        return None
+    return hashes
+
+
+def _download_parallel(conn, downloads, jobs, chunk_size, started, hashes):
+    """Download files using a pool of connections, see `download_files()`."""
+
+    def fetch(pool, file_id, tgt, sha1):
+        with pool.connection(group=-1) as worker:
+            hashes[tgt] = _download_file(worker, file_id, tgt, chunk_size, sha1)
+
+    with ConnectionPool(conn, jobs) as pool:
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            futures = []
+            for file_id, tgt, _, sha1 in downloads:
+                started.append((file_id, tgt))
+                futures.append(executor.submit(fetch, pool, file_id, tgt, sha1))
+            done, _ = wait(futures, return_when=FIRST_EXCEPTION)
+            for future in futures:
+                future.cancel()
+            # re-raise the first error (if any), after the running downloads finished:
+            for future in done:
+                future.result()
+
+
+def _download_file(conn, file_id, tgt, chunk_size, sha1=None):
+    """Download a single original file, creating the target directory if required."""
+    log.trace(f"Downloading original file [{file_id}] to [{tgt}]...")
+    os.makedirs(os.path.dirname(tgt), exist_ok=True)
+    try:
+        with profiling.phase("download"):
+            transferred, digest = download_original_file(
+                conn, file_id, tgt, chunk_size, sha1
+            )
+    except Exception as err:
+        raise RuntimeError(f"downloading {file_id} to '{tgt}' failed: {err}") from err
+    metrics.add_bytes("download", transferred)
+    printlog("SUCCESS", f"ID {file_id} downloaded as '{os.path.basename(tgt)}'")
+    return digest
+
+
+def download_original_file(
+    conn, file_id, target, chunk_size=DOWNLOAD_CHUNK_SIZE, sha1=None
+):
+    """Download an original file in chunks, resuming a previously interrupted download.
+
+    The file is read in chunks (range reads) through a raw file store using the call
+    context of the connection (`conn.SERVICE_OPTS`) instead of the group of the session
+    (as `conn.c.download()` does), so it can also be used with connections from a
+    `hrm_omero.omero.ConnectionPool`.
+
+    The data is written to `<target>.part`, which is renamed to `target` once it is
+    complete. After every chunk the data is flushed to disk and the offset reached is
+    recorded in a progress file (`<target>.part.json`, see `write_progress()`). If the
+    download gets interrupted, the next call for the same file will discard anything
+    beyond the recorded offset and continue from there.
+
+    The SHA1 hash of the file is computed while writing the chunks (only the part of a
+    resumed download that is already on disk has to be read once more) and compared to
+    the expected one (if given). In case they don't match, the partial file is removed.
+
+    Parameters
+    ----------
+    conn : omero.gateway.BlitzGateway
+        The OMERO connection object.
+    file_id : int
+        The ID of the original file.
+    target : str
+        The path of the file to create.
+    chunk_size : int, optional
+        The number of bytes to request at once, by default `DOWNLOAD_CHUNK_SIZE`.
+    sha1 : str, optional
+        The expected SHA1 hash of the file (hex digest), by default `None` meaning the
+        hash will be computed but not verified.
+
+    Returns
+    -------
+    (int, str)
+        The number of bytes actually transferred (i.e. without the resumed part) and
+        the SHA1 hash of the file.
+
+    Raises
+    ------
+    IOError
+        Raised in case the file can't be read completely or its hash doesn't match.
+    """
+    partial = f"{target}.part"
+    store = conn.c.sf.createRawFileStore()
+    try:
+        store.setFileId(int(file_id), conn.SERVICE_OPTS)
+        size = store.size(conn.SERVICE_OPTS)
+        offset = _resume_offset(target, int(file_id), size)
+        if offset:
+            log.info(f"Resuming download of [{file_id}] at {offset} of {size} bytes.")
+        with open(partial, "r+b" if offset else "wb") as outfile:
+            outfile.truncate(offset)
+            hasher = _hash_stream(outfile, offset, chunk_size)
+            start = offset
+            while offset < size:
+                chunk = store.read(offset, min(chunk_size, size - offset))
+                if not chunk:
+                    raise IOError(f"unexpected end of file at {offset} of {size} bytes")
+                outfile.write(chunk)
+                hasher.update(chunk)
+                outfile.flush()
+                os.fsync(outfile.fileno())
+                offset += len(chunk)
+                write_progress(
+                    target, {"file_id": int(file_id), "size": size, "offset": offset}
+                )
+    finally:
+        store.close()
+
+    digest = hasher.hexdigest()
+    if sha1 is not None and digest != sha1.lower():
+        for leftover in [partial, f"{partial}.json"]:
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(leftover)
+        raise IOError(f"SHA1 mismatch for [{file_id}]: expected {sha1}, got {digest}")
+
+    os.replace(partial, target)
+    with contextlib.suppress(FileNotFoundError):
+        os.unlink(f"{partial}.json")
+    return offset - start, digest
+
+
+def _hash_stream(stream, length, chunk_size):
+    """Create a SHA1 hasher fed with the first bytes of a stream (leaving it there)."""
+    hasher = hashlib.sha1()
+    stream.seek(0)
+    remaining = length
+    while remaining > 0:
+        data = stream.read(min(chunk_size, remaining))
+        if not data:
+            raise IOError(f"unexpected end of partial file, {remaining} bytes missing")
+        hasher.update(data)
+        remaining -= len(data)
+    stream.seek(length)
+    return hasher
+
+
+def is_identical(path, size, sha1, entry=None):
+    """Check if an existing file is identical to the original one in OMERO.
+
+    Parameters
+    ----------
+    path : str
+        The path of the existing file.
+    size : int
+        The size of the original file in OMERO.
+    sha1 : str or None
+        The SHA1 hash of the original file in OMERO (if known).
+    entry : dict, optional
+        The entry of the file in the manifest of its directory (see `read_manifest()`)
+        if present. In case size, hash and modification time recorded there match,
+        the file is considered identical without reading it.
+
+    Returns
+    -------
+    bool
+        True in case the file is identical, False if it differs or if this can't be
+        determined (no hash being known).
+    """
+    stat_result = os.stat(path)
+    if stat_result.st_size != size or sha1 is None:
+        return False
+
+    if (
+        entry
+        and entry.get("size") == size
+        and entry.get("sha1") == sha1
+        and entry.get("mtime") == stat_result.st_mtime
+    ):
+        return True
+
+    hasher = hashlib.sha1()
+    with open(path, "rb") as infile:
+        for data in iter(lambda: infile.read(DOWNLOAD_CHUNK_SIZE), b""):
+            hasher.update(data)
+    return hasher.hexdigest() == sha1
+
+
+def read_manifest(directory):
+    """Read the manifest of the files downloaded to a directory.
+
+    Parameters
+    ----------
+    directory : str
+        The directory containing the manifest (`MANIFEST_NAME`).
+
+    Returns
+    -------
+    dict
+        The entries of the manifest keyed by the path of the files relative to the
+        directory, each having the items `file_id`, `size`, `sha1` and `mtime`. Empty in
+        case there is no (valid) manifest.
+    """
+    try:
+        with open(os.path.join(directory, MANIFEST_NAME), "r", encoding="utf-8") as inf:
+            manifest = json.load(inf)
+    except (OSError, ValueError):
+        return {}
+    return manifest if isinstance(manifest, dict) else {}
+
+
+def write_manifest(directory, manifest):
+    """Atomically replace the manifest of the files downloaded to a directory.
+
+    Note that this doesn't protect against concurrent modifications, use
+    `update_manifest()` to add entries to an existing manifest.
+
+    Parameters
+    ----------
+    directory : str
+        The directory to write the manifest (`MANIFEST_NAME`) to.
+    manifest : dict
+        The entries as described in `read_manifest()`.
+    """
+    fd, tmpname = tempfile.mkstemp(dir=directory, prefix=f"{MANIFEST_NAME}.tmp-")
+    try:
+        os.fchmod(fd, 0o664)
+        with os.fdopen(fd, "w", encoding="utf-8") as outfile:
+            json.dump(manifest, outfile, indent=1, sort_keys=True)
+        os.replace(tmpname, os.path.join(directory, MANIFEST_NAME))
+    except BaseException:
+        os.unlink(tmpname)
+        raise
+
+
+def update_manifest(directory, entries):
+    """Add entries to the manifest of a directory, replacing existing ones.
+
+    The manifest is read, updated and written while holding an exclusive lock on a
+    lock file next to it, so concurrent downloads into the same directory don't lose
+    each other's entries.
+
+    Parameters
+    ----------
+    directory : str
+        The directory containing the manifest (`MANIFEST_NAME`).
+    entries : dict
+        The entries to add as described in `read_manifest()`.
+    """
+    lock_path = os.path.join(directory, f"{MANIFEST_NAME}.lock")
+    with open(lock_path, "a", encoding="utf-8") as lockfile:
+        fcntl.flock(lockfile, fcntl.LOCK_EX)
+        manifest = read_manifest(directory)
+        manifest.update(entries)
+        write_manifest(directory, manifest)
+
+
+def _resume_offset(target, file_id, size):
+    """Determine the offset to resume a download at from its progress file."""
+    progress = read_progress(target)
+    if progress.get("file_id") != file_id or progress.get("size") != size:
+        return 0
+    try:
+        available = os.path.getsize(f"{target}.part")
+    except OSError:
+        return 0
+    return min(int(progress.get("offset", 0)), available, size)
+
+
+def read_progress(target):
+    """Read the progress file of a partial download.
+
+    Parameters
+    ----------
+    target : str
+        The path of the file being downloaded (without the `.part` suffix).
+
+    Returns
+    -------
+    dict
+        The recorded progress (see `write_progress()`), empty in case there is no
+        (valid) progress file.
+    """
+    try:
+        with open(f"{target}.part.json", "r", encoding="utf-8") as infile:
+            progress = json.load(infile)
+    except (OSError, ValueError):
+        return {}
+    return progress if isinstance(progress, dict) else {}
+
+
+def write_progress(target, progress):
+    """Atomically replace the progress file of a partial download.
+
+    Parameters
+    ----------
+    target : str
+        The path of the file being downloaded (without the `.part` suffix).
+    progress : dict
+        The progress of the download, having the items `file_id` (the ID of the
+        original file), `size` (its total size) and `offset` (the number of bytes that
+        have been written to the partial file and flushed to disk).
+    """
+    progress_file = f"{target}.part.json"
+    with open(f"{progress_file}.tmp", "w", encoding="utf-8") as outfile:
+        json.dump(progress, outfile)
+    os.replace(f"{progress_file}.tmp", progress_file)
+
+
 def fetch_thumbnail(conn, omero_id, dest):
     """Download the thumbnail of a given image from OMERO.
 
@@ -151,6 +758,8 @@ def fetch_thumbnail(conn, omero_id, dest):
     # explanation in the decorator definition for more details
     #
     ##### WARNING - WARNING - WARNING - WARNING - WARNING - WARNING - WARNING #####
+    from PIL import Image  # pylint: disable-msg=import-outside-toplevel
+
     log.info(f"Trying to fetch thumbnail for OMERO image [{omero_id.obj_id}]...")
     log.trace(f"Requested target location: [{dest}].")
 
@@ -180,7 +789,15 @@ def fetch_thumbnail(conn, omero_id, dest):
 
 
 @connect_and_set_group
-def to_omero(conn, omero_id, image_file, omero_logfile="", _fetch_zip_only=False):
+def to_omero(  # pylint: disable-msg=too-many-arguments
+    conn,
+    omero_id,
+    image_file,
+    omero_logfile="",
+    tree_cache=None,
+    inplace=None,
+    _fetch_zip_only=False,
+):
     """Upload an image into a specific dataset in OMERO.
 
     In case we know from the suffix that a given  format is not supported by OMERO, the
@@ -192,6 +809,10 @@ def to_omero(conn, omero_id, image_file, omero_logfile="", _fetch_zip_only=False
 
     [1]: https://github.com/ome/omero-py/blob/master/src/omero/plugins/import.py
 
+    If configured (see `hrm_omero.inplace`), the file is imported in-place instead of
+    uploading it, falling back to a regular upload if the pre-flight check or the
+    in-place import itself fails.
+
     Parameters
     ----------
     conn : omero.gateway.BlitzGateway
@@ -205,6 +826,12 @@ def to_omero(conn, omero_id, image_file, omero_logfile="", _fetch_zip_only=False
         If the parameter is non-empty the `--debug ALL` option will be added to the
         `omero` call with the output being placed in the specified file. If the
         parameter is omitted or empty, debug messages will be disabled.
+    tree_cache : hrm_omero.treecache.TreeCache, optional
+        The tree cache whose entry for the target dataset will be invalidated after a
+        successful import, by default `None`.
+    inplace : hrm_omero.inplace.InplaceImport, optional
+        The settings for importing the file in-place, by default `None` meaning the
+        file will be uploaded.
     _fetch_zip_only : bool, optional
         Replaces all parameters to the import call by `--advanced-help`, which is
         **intended for INTERNAL TESTING ONLY**. No actual import will be attempted!
@@ -255,7 +882,7 @@ def to_omero(conn, omero_id, image_file, omero_logfile="", _fetch_zip_only=False
     # thread: https://forum.image.sc/t/automated-uploader-to-omero-in-python/38290
     # https://gitlab.com/openmicroscopy/incubator/omero-python-importer/-/blob/master/import.py)
     # and also see https://pypi.org/project/omero-upload/
-    from omero.cli import CLI
+    from omero.cli import CLI  # pylint: disable-msg=import-outside-toplevel
 
     cli = CLI()
     cli.loadplugins()
@@ -281,18 +908,50 @@ def to_omero(conn, omero_id, image_file, omero_logfile="", _fetch_zip_only=False
 
     #### for ann_id in annotations:
     ####     import_args.extend(['--annotation_link', str(ann_id)])
-    import_args.append(image_file)
+
+    # try an in-place import first (if possible), uploading the file otherwise:
+    attempts = [([], image_file)]
+    if inplace is not None:
+        with profiling.phase("inplace_check"):
+            prepared = inplace.prepare(image_file)
+        if prepared is not None:
+            attempts.insert(0, (["--transfer", prepared[0]], prepared[1]))
+
     if _fetch_zip_only:
         # calling 'import --advanced-help' will trigger the download of OMERO.java.zip
         # in case it is not yet present (the extract_image_id() call will then fail,
         # resulting in the whole function returning "False")
         printlog("WARNING", "As '_fetch_zip_only' is set NO IMPORT WILL BE ATTEMPTED!")
         import_args = ["import", "--advanced-help"]
-    log.debug(f"import_args: {import_args}")
+        attempts = [([], None)]
+    # the importer is using the group of the session, which is shared with other
+    # threads in case the connection is part of a pool:
+    pool = getattr(conn, "hrm_omero_pool", None)
     try:
-        cli.invoke(import_args, strict=True)
+        for transfer_args, import_path in attempts:
+            attempt_args = import_args + transfer_args
+            if import_path is not None:
+                attempt_args.append(import_path)
+            log.debug(f"import_args: {attempt_args}")
+            if pool is not None:
+                session_group = pool.session_group(conn, omero_id.group)
+            else:
+                session_group = contextlib.ExitStack()  # no-op context manager
+            try:
+                with session_group, profiling.phase("import"):
+                    cli.invoke(attempt_args, strict=True)
+                break
+            except Exception as err:  # pylint: disable-msg=broad-except
+                if not transfer_args:
+                    import_args = attempt_args
+                    raise
+                printlog("WARNING", f"In-place import failed, uploading instead: {err}")
+                with contextlib.suppress(FileNotFoundError):
+                    os.unlink(cap_stdout)
         imported_id = extract_image_id(cap_stdout)
         log.success(f"Imported OMERO image ID: {imported_id}")
+        if not transfer_args:
+            metrics.add_bytes("upload", os.path.getsize(image_file))
     except PermissionError as err:
         printlog("ERROR", err)
         omero_userdir = os.environ.get("OMERO_USERDIR", "<not-set>")
@@ -316,9 +975,13 @@ def to_omero(conn, omero_id, image_file, omero_logfile="", _fetch_zip_only=False
 
     target_id = f"G:{omero_id.group}:Image:{imported_id}"
     try:
-        summary = hrm.parse_summary(image_file)
-        add_annotation_keyvalue(conn, target_id, summary)
+        with profiling.phase("annotation"):
+            summary = hrm.parse_summary(image_file)
+            add_annotation_keyvalue(conn, target_id, summary)
     except Exception as err:  # pragma: no cover # pylint: disable-msg=broad-except
         log.error(f"Creating a parameter summary from [{image_file}] failed: {err}")
 
+    if tree_cache is not None:
+        tree_cache.invalidate(str(omero_id))
+
     return True
@@ -1,8 +1,173 @@
 """Functions related to OMERO's tree view."""
 
+import itertools
+import math
+import time
+from datetime import datetime
+
 from loguru import logger as log
 
 from .decorators import connect_and_set_group
+from .misc import OmeroId
+from .treecache import cached
+from .treenode import TreeNode
+
+CHILDREN_QUERIES = {
+    "Experimenter": [
+        (
+            "Project",
+            "p",
+            "o.id",
+            "from Project p join p.details.owner o where o.id in (:ids)",
+        ),
+        # OMERO.web is showing "orphaned" datasets (i.e. that do NOT belong to a
+        # certain project) at the top level, next to the projects - so we are going to
+        # add them to the tree at the same hierarchy level:
+        (
+            "Dataset",
+            "d",
+            "o.id",
+            "from Dataset d join d.details.owner o where o.id in (:ids) and not exists "
+            "(select l from ProjectDatasetLink l where l.child = d.id)",
+        ),
+    ],
+    "Project": [
+        (
+            "Dataset",
+            "d",
+            "l.parent.id",
+            "from ProjectDatasetLink l join l.child d join d.details.owner o "
+            "where l.parent.id in (:ids)",
+        ),
+    ],
+    "Dataset": [
+        (
+            "Image",
+            "i",
+            "l.parent.id",
+            "from DatasetImageLink l join l.child i join i.details.owner o "
+            "where l.parent.id in (:ids)",
+        ),
+    ],
+}
+"""HQL clauses to query the children of nodes, with their class, alias and parent ID.
+
+The clauses are used to assemble projections (returning ID, name and owner name, sorted
+by name on the server) and count queries, for a single node or for several nodes of the
+same class at once (`:ids`). HQL doesn't support `UNION`, so the children of an
+`Experimenter` (its projects and orphaned datasets) require two queries.
+"""
+
+AGGREGATE_QUERIES = {
+    "Project": (
+        "select p.id, "
+        "(select count(pl.id) from ProjectDatasetLink pl where pl.parent.id = p.id), "
+        "(select sum(f.size) from OriginalFile f where f.id in "
+        "(select e.originalFile.id from FilesetEntry e, DatasetImageLink il, "
+        "ProjectDatasetLink pl2 where e.fileset.id = il.child.fileset.id "
+        "and il.parent.id = pl2.child.id and pl2.parent.id = p.id)) "
+        "from Project p where p.id in (:ids)"
+    ),
+    "Dataset": (
+        "select d.id, "
+        "(select count(dl.id) from DatasetImageLink dl where dl.parent.id = d.id), "
+        "(select sum(f.size) from OriginalFile f where f.id in "
+        "(select e.originalFile.id from FilesetEntry e, DatasetImageLink il "
+        "where e.fileset.id = il.child.fileset.id and il.parent.id = d.id)) "
+        "from Dataset d where d.id in (:ids)"
+    ),
+}
+"""HQL projections for the number of children and the size of the data of nodes.
+
+Each query covers all nodes of one class on a tree level at once and returns their ID,
+the number of their (direct) children and the sum of the sizes of the original files
+imported for the images they contain. Files shared by several images (e.g. of a
+multi-series fileset) are counted only once per node.
+"""
+
+LINK_CLASSES = {"Project": "ProjectDatasetLink", "Dataset": "DatasetImageLink"}
+"""Classes of the links (aliased `l` in `CHILDREN_QUERIES`) to the children of a node.
+
+The children of an `Experimenter` are not linked to it, but whether a dataset is shown
+at this level depends on it being linked to a project.
+"""
+
+MODEL_CLASSES = {
+    "Project": "ome.model.containers.Project",
+    "Dataset": "ome.model.containers.Dataset",
+    "Image": "ome.model.core.Image",
+    "ProjectDatasetLink": "ome.model.containers.ProjectDatasetLink",
+    "DatasetImageLink": "ome.model.containers.DatasetImageLink",
+}
+"""Fully qualified model class names, as used for the entity type in OMERO's event log."""
+
+STREAM_CHUNK_SIZE = 1000
+"""Number of children fetched per query by `iter_children()`."""
+
+GROUP_MEMBERS_QUERY = (
+    "select g.id, g.name, e.id, e.omeName, e.firstName, e.middleName, e.lastName "
+    "from GroupExperimenterMap m join m.parent g join m.child e "
+    "where g.name != 'user' and g.id in "
+    "(select m2.parent.id from GroupExperimenterMap m2 where m2.child.id = :uid)"
+)
+"""HQL projection for the groups of a user (except for `user`) and their members."""
+
+
+def gen_node_dict(obj_class, obj_id, label, owner, id_pfx=""):
+    """Create a tree node dict from its plain values.
+
+    Parameters
+    ----------
+    obj_class : str
+        The OMERO class of the object, e.g. `Project`.
+    obj_id : int or str
+        The OMERO ID of the object.
+    label : str
+        The label (name) to use for the node.
+    owner : str or int or None
+        The owner of the object, see `gen_obj_dict()` for details.
+    id_pfx : str, optional
+        A string prefix that will be added to the `id` value, by default ''.
+
+    Returns
+    -------
+    dict
+        A dictionary having the structure described in `gen_obj_dict()`.
+    """
+    return {
+        "label": label,
+        "class": obj_class,
+        "owner": owner,
+        "id": id_pfx + f"{obj_class}:{obj_id}",
+        "children": [],
+    }
+
+
+def gen_node(obj_class, obj_id, label, owner, id_pfx="", load_on_demand=False):
+    """Create a (compact) tree node from its plain values.
+
+    Parameters
+    ----------
+    obj_class : str
+        The OMERO class of the object, e.g. `Project`.
+    obj_id : int or str
+        The OMERO ID of the object.
+    label : str
+        The label (name) to use for the node.
+    owner : str or int or None
+        The owner of the object, see `gen_obj_dict()` for details.
+    id_pfx : str, optional
+        A string prefix that will be added to the `id` value, by default ''.
+    load_on_demand : bool, optional
+        The value of the `load_on_demand` property, by default False.
+
+    Returns
+    -------
+    hrm_omero.treenode.TreeNode
+        The node, serializing to the same structure as the dict of `gen_obj_dict()`.
+    """
+    node_id = id_pfx + f"{obj_class}:{obj_id}"
+    return TreeNode(obj_class, node_id, label, owner, load_on_demand=load_on_demand)
 
 
 def gen_obj_dict(obj, id_pfx=""):
@@ -29,25 +194,21 @@ def gen_obj_dict(obj, id_pfx=""):
             }
         ```
     """
-    obj_dict = {}
-    obj_dict["label"] = obj.getName()
-    obj_dict["class"] = obj.OMERO_CLASS
+    label = obj.getName()
     if obj.OMERO_CLASS == "Experimenter":
-        obj_dict["owner"] = obj.getId()
-        obj_dict["label"] = obj.getFullName()
+        owner = obj.getId()
+        label = obj.getFullName()
     elif obj.OMERO_CLASS == "ExperimenterGroup":
         # for some reason getOwner() et al. return nothing on a group, so we
         # simply put it to None for group objects:
-        obj_dict["owner"] = None
+        owner = None
     else:
-        obj_dict["owner"] = obj.getOwnerOmeName()
-    obj_dict["id"] = id_pfx + f"{obj.OMERO_CLASS}:{obj.getId()}"
-    obj_dict["children"] = []
-    return obj_dict
+        owner = obj.getOwnerOmeName()
+    return gen_node_dict(obj.OMERO_CLASS, obj.getId(), label, owner, id_pfx)
 
 
 @connect_and_set_group
-def gen_children(conn, omero_id):
+def gen_children(conn, omero_id, cache=None, aggregates=False):
     """Get the children for a given node.
 
     Parameters
@@ -56,78 +217,779 @@ def gen_children(conn, omero_id):
         The OMERO connection object.
     omero_id : hrm_omero.misc.OmeroId
         An object denoting an OMERO target.
+    cache : hrm_omero.treecache.TreeCache, optional
+        The cache to look up the children in (and to store them after generating
+        them), by default `None` meaning the children will always be generated.
+    aggregates : bool, optional
+        If set to True, `Project` and `Dataset` nodes will have their number of
+        children and the size of their data added, see `add_aggregates()`. By default
+        False.
 
     Returns
     -------
-    list
-        A list with children nodes (of type `dict`), having the `load_on_demand`
-        property set to `True` required by the jqTree JavaScript library (except for
-        nodes of type `Dataset` as they are the last / lowest level).
+    list(hrm_omero.treenode.TreeNode)
+        A list with children nodes (see `gen_node()`), sorted by their label and
+        having the `load_on_demand` property set to `True` required by the jqTree
+        JavaScript library (except for nodes of type `Dataset` as they are the last /
+        lowest level). Use `hrm_omero.treenode.json_default()` to serialize them.
     """
     if omero_id.obj_type == "BaseTree":
-        return gen_base_tree(conn)
+        return gen_base_tree(conn, cache)
 
     log.debug(f"generating children for [{omero_id}]")
 
-    # conn.SERVICE_OPTS.setOmeroGroup(gid)
-    obj = conn.getObject(omero_id.obj_type, omero_id.obj_id)
-    # we need different child-wrappers, depending on the object type:
-    if omero_id.obj_type == "Experimenter":
-        children_wrapper = []
-        for proj in conn.listProjects(omero_id.obj_id):
-            children_wrapper.append(proj)
-        # OMERO.web is showing "orphaned" datasets (i.e. that do NOT belong to a
-        # certain project) at the top level, next to the projects - so we are going to
-        # add them to the tree at the same hierarchy level:
-        for dataset in conn.listOrphans("Dataset", eid=omero_id.obj_id):
-            children_wrapper.append(dataset)
-
-    elif omero_id.obj_type == "ExperimenterGroup":
+    if omero_id.obj_type == "ExperimenterGroup":
         log.warning(
             f"{__name__} has been called with omero_id='{str(omero_id)}', but "
             "'ExperimenterGroup' trees should be generated via `gen_group_tree()`!",
         )
         return []
 
+    return cached(
+        cache,
+        conn,
+        omero_id.group,
+        _cache_key(omero_id, aggregates=aggregates),
+        lambda: _gen_child_nodes(conn, omero_id, aggregates=aggregates),
+    )
+
+
+@connect_and_set_group
+def gen_children_page(
+    conn, omero_id, offset=0, limit=None, cache=None, aggregates=False
+):
+    """Get a page of the children of a given node, together with their total count.
+
+    Parameters
+    ----------
+    conn : omero.gateway.BlitzGateway
+        The OMERO connection object.
+    omero_id : hrm_omero.misc.OmeroId
+        An object denoting an OMERO target.
+    offset : int, optional
+        The number of (sorted) children to skip, by default 0.
+    limit : int, optional
+        The maximum number of children to return, by default `None` (no limit).
+    cache : hrm_omero.treecache.TreeCache, optional
+        The cache to use for the page, by default `None`.
+    aggregates : bool, optional
+        Add the aggregate values to the children, see `gen_children()`.
+
+    Returns
+    -------
+    dict
+        A dict with the requested page of children (see `gen_children()`) in its
+        `children` item, the total number of children of the node in `total` and the
+        requested `offset` and `limit`.
+    """
+    page = {"children": [], "total": 0, "offset": offset, "limit": limit}
+    end = None if limit is None else offset + limit
+    if omero_id.obj_type == "BaseTree":
+        tree = gen_base_tree(conn, cache)
+        page.update(children=tree[offset:end], total=len(tree))
+        return page
+
+    def generate():
+        log.debug(f"generating children [{offset}:{end}] for [{omero_id}]")
+        page["children"] = _gen_child_nodes(conn, omero_id, offset, limit, aggregates)
+        page["total"] = count_children(conn, omero_id)
+        return page
+
+    node = _cache_key(omero_id, f"{offset}:{limit}", aggregates)
+    return cached(cache, conn, omero_id.group, node, generate)
+
+
+def _cache_key(omero_id, page=None, aggregates=False):
+    """Assemble the tree cache key for (a page of) the children of a node."""
+    key = str(omero_id)
+    if page is not None:
+        key += f"#{page}"
+    if aggregates:
+        key += "#aggregates"
+    return key
+
+
+def _gen_child_nodes(conn, omero_id, offset=0, limit=None, aggregates=False):
+    """Generate the (sorted) children of a node, see `gen_children()` for details."""
+    # build the nodes from plain values instead of (lazy-loading) object wrappers,
+    # setting the on-demand flag unless the children are the last level:
+    rows = query_children(conn, omero_id, offset, limit)
+    return _gen_nodes(conn, omero_id, rows, aggregates)
+
+
+def _gen_nodes(conn, omero_id, rows, aggregates=False):
+    """Create the nodes for the rows of the children of a node."""
+    pfx = "G:" + omero_id.group + ":"
+    on_demand = omero_id.obj_type != "Dataset"
+    children = [gen_node(*row, pfx, on_demand) for row in rows]
+
+    if aggregates:
+        add_aggregates(conn, children)
+
+    return children
+
+
+@connect_and_set_group
+def iter_children(
+    conn, omero_id, cache=None, chunk_size=STREAM_CHUNK_SIZE, aggregates=False
+):
+    """Generator variant of `gen_children()`, yielding the children one by one.
+
+    The children are fetched from OMERO in chunks (sorted on the server), so only one
+    chunk of nodes has to be kept in memory at any time. Children requiring several
+    queries (i.e. the ones of an `Experimenter`) are fetched at once and merged (see
+    `merge_children()`) instead, then converted to nodes chunk-wise. In case a cache is
+    given, the children are looked up in (or stored to) the cache as a whole instead.
+
+    Parameters
+    ----------
+    conn : omero.gateway.BlitzGateway
+        The OMERO connection object.
+    omero_id : hrm_omero.misc.OmeroId
+        An object denoting an OMERO target.
+    cache : hrm_omero.treecache.TreeCache, optional
+        The cache to use for the children, by default `None`.
+    chunk_size : int, optional
+        The number of children to fetch per query, by default `STREAM_CHUNK_SIZE`.
+    aggregates : bool, optional
+        Add the aggregate values to the children (querying them once per chunk), see
+        `gen_children()`.
+
+    Yields
+    ------
+    hrm_omero.treenode.TreeNode
+        The children nodes as described in `gen_children()`.
+    """
+    if omero_id.obj_type == "BaseTree":
+        yield from gen_base_tree(conn, cache)
+        return
+
+    if omero_id.obj_type not in CHILDREN_QUERIES:
+        log.warning(f"Objects of type '{omero_id.obj_type}' don't have any children!")
+        return
+
+    if cache is not None:
+        children = cached(
+            cache,
+            conn,
+            omero_id.group,
+            _cache_key(omero_id, aggregates=aggregates),
+            lambda: _gen_child_nodes(conn, omero_id, aggregates=aggregates),
+        )
+        yield from children
+        return
+
+    if len(CHILDREN_QUERIES[omero_id.obj_type]) > 1:
+        # fetch the rows only once instead of merging them again for every chunk:
+        rows = query_children(conn, omero_id)
+        chunks = (rows[i : i + chunk_size] for i in range(0, len(rows), chunk_size))
     else:
-        children_wrapper = obj.listChildren()
+        chunks = _query_chunks(conn, omero_id, chunk_size)
+
+    for chunk in chunks:
+        yield from _gen_nodes(conn, omero_id, chunk, aggregates)
+
 
-    # now process children:
-    children = []
-    for child in children_wrapper:
-        children.append(gen_obj_dict(child, "G:" + omero_id.group + ":"))
-    children = sorted(children, key=lambda d: d["label"].lower())
+def _query_chunks(conn, omero_id, chunk_size):
+    """Query the children of a node (using a single query) chunk by chunk."""
+    offset = 0
+    while True:
+        rows = query_children(conn, omero_id, offset, chunk_size)
+        yield rows
+        if len(rows) < chunk_size:
+            return
+        offset += chunk_size
 
-    # set the on-demand flag unless the children are the last level:
-    if not omero_id.obj_type == "Dataset":
-        for child in children:
-            child["load_on_demand"] = True
 
+def expand_nodes(conn, nodes, depth, cache=None, aggregates=False):
+    """Recursively replace the on-demand children of nodes by the actual ones.
+
+    Nodes having the `load_on_demand` property set will get their children generated
+    and the property removed, down to the given depth. Children that are already
+    present (e.g. the members of a group in the base tree) are descended into without
+    counting as a level.
+
+    The nodes are expanded level by level, querying the children of all nodes of the
+    same class and group on a level at once (see `query_children_of()`). The group is
+    set on the call context of the queries, so the connection has to be established
+    already (e.g. by the preceding call to `gen_children()`) and the group of the
+    session is left untouched.
+
+    Parameters
+    ----------
+    conn : omero.gateway.BlitzGateway
+        The (connected) OMERO connection object.
+    nodes : list(hrm_omero.treenode.TreeNode)
+        The nodes to be expanded (in place), as returned by `gen_children()`.
+    depth : int
+        The number of levels to expand, nothing will be done for values below 1.
+    cache : hrm_omero.treecache.TreeCache, optional
+        The cache to use for the child nodes, by default `None`.
+    aggregates : bool, optional
+        Add the aggregate values to the generated children, see `gen_children()`.
+    """
+    pending = _on_demand_nodes(nodes, depth)
+    while pending:
+        _gen_level(conn, [node for node, _ in pending], cache, aggregates)
+        level = []
+        for node, node_depth in pending:
+            level.extend(_on_demand_nodes(node["children"], node_depth - 1))
+        pending = level
+
+
+def _on_demand_nodes(nodes, depth):
+    """Collect the nodes to be expanded next, together with their remaining depth."""
+    if depth < 1:
+        return []
+
+    found = []
+    for node in nodes:
+        if node.get("load_on_demand", False):
+            found.append((node, depth))
+        else:
+            found.extend(_on_demand_nodes(node["children"], depth))
+    return found
+
+
+def _gen_level(conn, nodes, cache=None, aggregates=False):
+    """Generate the children of nodes (of one tree level), see `expand_nodes()`."""
+    user = conn.getEventContext().userName if cache is not None else None
+    missing = {}
+    for node in nodes:
+        node.pop("load_on_demand")
+        omero_id = OmeroId(node["id"])
+        key = _cache_key(omero_id, aggregates=aggregates)
+        children = None
+        if cache is not None:
+            children = cache.get(user, omero_id.group, key)
+        if children is not None:
+            node["children"] = children
+        elif omero_id.obj_type not in CHILDREN_QUERIES:
+            log.warning(f"Objects of type '{omero_id.obj_type}' can't be expanded!")
+            node["children"] = []
+        else:
+            group_key = (omero_id.group, omero_id.obj_type)
+            missing.setdefault(group_key, {})[int(omero_id.obj_id)] = (node, key)
+
+    for (group, obj_type), by_id in missing.items():
+        ctx = conn.SERVICE_OPTS.copy()
+        ctx.setOmeroGroup(group)
+        rows = query_children_of(conn, obj_type, list(by_id), ctx)
+        pfx = f"G:{group}:"
+        on_demand = obj_type != "Dataset"
+        level = []
+        for obj_id, (node, key) in by_id.items():
+            children = [gen_node(*row, pfx, on_demand) for row in rows.get(obj_id, [])]
+            node["children"] = children
+            level.extend(children)
+        if aggregates:
+            add_aggregates(conn, level, ctx)
+        if cache is not None:
+            for node, key in by_id.values():
+                cache.put(user, group, key, node["children"])
+
+
+def query_children_of(conn, obj_type, obj_ids, ctx=None):
+    """Query the children of several nodes of the same class at once.
+
+    Parameters
+    ----------
+    conn : omero.gateway.BlitzGateway
+        The (connected) OMERO connection object.
+    obj_type : str
+        The class of the nodes, see `CHILDREN_QUERIES` for the supported ones.
+    obj_ids : list(int)
+        The IDs of the nodes.
+    ctx : omero.gateway.ServiceOptsDict, optional
+        The call context to use (e.g. having the group set), by default the one of the
+        connection.
+
+    Returns
+    -------
+    dict
+        A dict mapping the node IDs to their children as lists of tuples of the form
+        `(class, id, name, owner_ome_name)`, sorted like in `query_children()`. Nodes
+        without children are not contained.
+    """
+    # pylint: disable-msg=import-outside-toplevel
+    from omero.rtypes import unwrap
+    from omero.sys import ParametersI
+
+    queries = CHILDREN_QUERIES[obj_type]
+    params = ParametersI()
+    params.addIds(obj_ids)
+    query_service = conn.getQueryService()
+    children = {}
+    for obj_class, alias, parent, clause in queries:
+        query = (
+            f"select {parent}, {alias}.id, {alias}.name, o.omeName {clause} "
+            f"order by lower({alias}.name), {alias}.id"
+        )
+        result = query_service.projection(query, params, ctx or conn.SERVICE_OPTS)
+        for row in result:
+            parent_id, *values = unwrap(row)
+            children.setdefault(parent_id, []).append((obj_class, *values))
+
+    if len(queries) > 1:
+        for parent_id, rows in children.items():
+            children[parent_id] = merge_children([rows])
+    log.debug(f"Queried the children of {len(obj_ids)} {obj_type} node(s).")
     return children
 
 
-def gen_base_tree(conn):
+def query_children(conn, omero_id, offset=0, limit=None):
+    """Query the class, ID, name and owner name of the children of a node.
+
+    The children are sorted (case-insensitive) by their name on the server, so only the
+    requested page has to be transferred. In case the children are fetched using
+    several queries (see `CHILDREN_QUERIES`), all of their rows are fetched and merged
+    locally instead, see `merge_children()`.
+
+    Parameters
+    ----------
+    conn : omero.gateway.BlitzGateway
+        The OMERO connection object, its group context has to be set already.
+    omero_id : hrm_omero.misc.OmeroId
+        An object denoting an OMERO target, see `CHILDREN_QUERIES` for the supported
+        types (others don't have any children).
+    offset : int, optional
+        The number of (sorted) children to skip, by default 0.
+    limit : int, optional
+        The maximum number of children to return, by default `None` (no limit).
+
+    Returns
+    -------
+    list(tuple)
+        A list of tuples of the form `(class, id, name, owner_ome_name)`.
+    """
+    # pylint: disable-msg=import-outside-toplevel
+    from omero.rtypes import unwrap
+    from omero.sys import ParametersI
+
+    queries = CHILDREN_QUERIES.get(omero_id.obj_type, [])
+    query_service = conn.getQueryService()
+    results = []
+    for obj_class, alias, _, clause in queries:
+        params = ParametersI()
+        params.addIds([int(omero_id.obj_id)])
+        if len(queries) == 1 and (offset or limit is not None):
+            params.page(offset, limit)
+        query = (
+            f"select {alias}.id, {alias}.name, o.omeName {clause} "
+            f"order by lower({alias}.name), {alias}.id"
+        )
+        result = query_service.projection(query, params, conn.SERVICE_OPTS)
+        results.append([(obj_class, *unwrap(row)) for row in result])
+
+    if len(results) == 1:
+        rows = results[0]
+    else:
+        rows = merge_children(results, offset, limit)
+    log.debug(f"Queried {len(rows)} children of [{omero_id}].")
+    return rows
+
+
+def merge_children(results, offset=0, limit=None):
+    """Merge the rows of several children queries and slice the requested page.
+
+    The database sorts the rows of each query using its collation, which might order
+    names differently than Python does (e.g. for accents or punctuation). Merging them
+    would then result in an inconsistent order with pages overlapping or skipping rows,
+    so the complete results are sorted again locally, by `children_sort_key()`.
+
+    Parameters
+    ----------
+    results : list(list(tuple))
+        The complete rows returned by each query, see `query_children()`.
+    offset : int, optional
+        The number of (sorted) children to skip, by default 0.
+    limit : int, optional
+        The maximum number of children to return, by default `None` (no limit).
+
+    Returns
+    -------
+    list(tuple)
+        The requested (sorted) rows.
+    """
+    rows = sorted(itertools.chain.from_iterable(results), key=children_sort_key)
+    end = None if limit is None else offset + limit
+    return rows[offset:end]
+
+
+def children_sort_key(row):
+    """Key for sorting the rows of the children queries locally, see `merge_children()`.
+
+    Parameters
+    ----------
+    row : tuple
+        A tuple of the form `(class, id, name, owner_ome_name)`.
+
+    Returns
+    -------
+    tuple
+        The (lower-case) name, the class and the ID of the child.
+    """
+    return (row[2].lower(), row[0], row[1])
+
+
+def count_children(conn, omero_id):
+    """Count the children of a node on the server.
+
+    Parameters
+    ----------
+    conn : omero.gateway.BlitzGateway
+        The OMERO connection object, its group context has to be set already.
+    omero_id : hrm_omero.misc.OmeroId
+        An object denoting an OMERO target, see `query_children()` for details.
+
+    Returns
+    -------
+    int
+        The total number of children.
+    """
+    # pylint: disable-msg=import-outside-toplevel
+    from omero.rtypes import unwrap
+    from omero.sys import ParametersI
+
+    params = ParametersI()
+    params.addIds([int(omero_id.obj_id)])
+    query_service = conn.getQueryService()
+    total = 0
+    for _, alias, _, clause in CHILDREN_QUERIES.get(omero_id.obj_type, []):
+        query = f"select count({alias}.id) {clause}"
+        result = query_service.projection(query, params, conn.SERVICE_OPTS)
+        total += unwrap(result[0][0])
+    return total
+
+
+def add_aggregates(conn, nodes, ctx=None):
+    """Add the number of children and the size of their data to tree nodes.
+
+    Nodes of a class listed in `AGGREGATE_QUERIES` get a `child_count` and a
+    `total_bytes` item, using one query for all nodes of the same class (i.e. one or
+    two queries per tree level) instead of one per node. Other nodes are left as is.
+
+    Parameters
+    ----------
+    conn : omero.gateway.BlitzGateway
+        The OMERO connection object, its group context has to be set already.
+    nodes : list(dict)
+        The nodes to update (in place), as generated by `gen_node_dict()`.
+    ctx : omero.gateway.ServiceOptsDict, optional
+        The call context to use for the queries, by default the one of the connection.
+    """
+    by_class = {}
+    for node in nodes:
+        if node["class"] in AGGREGATE_QUERIES:
+            obj_id = int(node["id"].rsplit(":", 1)[1])
+            by_class.setdefault(node["class"], {})[obj_id] = node
+
+    for obj_class, class_nodes in by_class.items():
+        values = query_aggregates(conn, obj_class, list(class_nodes), ctx)
+        for obj_id, node in class_nodes.items():
+            node["child_count"], node["total_bytes"] = values.get(obj_id, (0, 0))
+
+
+def query_aggregates(conn, obj_class, obj_ids, ctx=None):
+    """Query the number of children and the size of the data of several objects.
+
+    Parameters
+    ----------
+    conn : omero.gateway.BlitzGateway
+        The OMERO connection object, its group context has to be set already.
+    obj_class : str
+        The class of the objects, one of the keys of `AGGREGATE_QUERIES`.
+    obj_ids : list(int)
+        The IDs of the objects.
+    ctx : omero.gateway.ServiceOptsDict, optional
+        The call context to use, by default the one of the connection.
+
+    Returns
+    -------
+    dict
+        A dict mapping the object IDs to tuples of the form `(child_count,
+        total_bytes)`.
+    """
+    # pylint: disable-msg=import-outside-toplevel
+    from omero.rtypes import unwrap
+    from omero.sys import ParametersI
+
+    params = ParametersI()
+    params.addIds(obj_ids)
+    query = AGGREGATE_QUERIES[obj_class]
+    result = conn.getQueryService().projection(query, params, ctx or conn.SERVICE_OPTS)
+    values = {}
+    for row in result:
+        obj_id, child_count, total_bytes = unwrap(row)
+        values[obj_id] = (child_count or 0, total_bytes or 0)
+    log.debug(f"Queried aggregates of {len(values)} objects of class {obj_class}.")
+    return values
+
+
+def parse_since(since):
+    """Parse the reference point of an incremental tree refresh.
+
+    Parameters
+    ----------
+    since : str
+        Either an etag as returned by `gen_children_changes()` (e.g. `E123456`), a Unix
+        timestamp in seconds or a date and time in ISO 8601 format (e.g.
+        `2021-11-24T16:30:00`, interpreted as local time).
+
+    Returns
+    -------
+    (str, int)
+        A tuple with the attribute of OMERO's `Event` objects to compare with (either
+        `id` or `time`) and the corresponding value (the time in milliseconds).
+
+    Raises
+    ------
+    ValueError
+        Raised in case `since` can't be parsed.
+    """
+    if since[:1] == "E" and since[1:].isdigit():
+        return "id", int(since[1:])
+
+    try:
+        timestamp = float(since)
+    except ValueError:
+        pass
+    else:
+        # reject "inf", "nan" and values like "1e400" (overflowing to infinity):
+        if not math.isfinite(timestamp):
+            raise ValueError(f"Invalid timestamp '{since}'!")
+        return "time", int(timestamp * 1000)
+
+    for fmt in ("%Y-%m-%dT%H:%M:%S", "%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M", "%Y-%m-%d"):
+        try:
+            parsed = datetime.strptime(since, fmt)
+        except ValueError:
+            continue
+        return "time", int(time.mktime(parsed.timetuple()) * 1000)
+
+    raise ValueError(f"Unable to parse '{since}' as an etag or a timestamp!")
+
+
+@connect_and_set_group
+def gen_children_changes(conn, omero_id, since):
+    """Get the children of a node that changed after a given point in time.
+
+    Instead of listing all children, only those created, renamed (or otherwise
+    updated) or linked to the node after the given point are queried, based on the
+    details of OMERO's update and creation events. Objects of the children's classes
+    that have been deleted since are looked up in OMERO's event log. Links being
+    removed can't be attributed to a node (the link object doesn't exist any more), so
+    in case links of the relevant class have been deleted (or, for the children of an
+    `Experimenter`, any datasets have been linked to or unlinked from a project) all
+    children are returned instead, having the `full` flag set.
+
+    Parameters
+    ----------
+    conn : omero.gateway.BlitzGateway
+        The OMERO connection object.
+    omero_id : hrm_omero.misc.OmeroId
+        An object denoting an OMERO target.
+    since : str
+        The point to compare to, see `parse_since()` for the supported formats.
+
+    Returns
+    -------
+    dict
+        A dict with the following items:
+        * `etag`: the value to use as `since` for the next refresh
+        * `full`: a bool indicating all children (instead of the changed ones only)
+          are contained in `changed`
+        * `changed`: the changed children (see `gen_children()`)
+        * `removed`: the IDs of deleted objects, possibly including ones that were not
+          children of the node
+
+    Raises
+    ------
+    ValueError
+        Raised in case `since` can't be parsed.
+    """
+    field, value = parse_since(since)
+    # determine the etag first, so changes made while querying will be repeated in the
+    # next refresh instead of being lost:
+    etag = f"E{query_last_event(conn)}"
+    result = {"etag": etag, "full": False, "changed": [], "removed": []}
+
+    obj_type = omero_id.obj_type
+    if obj_type == "BaseTree":
+        log.debug("Incremental refresh of the base tree not supported, listing all.")
+        result.update(full=True, changed=gen_base_tree(conn))
+        return result
+
+    if obj_type not in CHILDREN_QUERIES:
+        log.warning(f"Objects of type '{obj_type}' don't have any children!")
+        result["full"] = True
+        return result
+
+    if obj_type == "Experimenter":
+        actions = ["INSERT", "DELETE"]
+        link_class = "ProjectDatasetLink"
+    else:
+        actions = ["DELETE"]
+        link_class = LINK_CLASSES[obj_type]
+    if query_event_log(conn, [link_class], actions, field, value):
+        log.info(f"Links of [{omero_id}] have been modified, listing all children.")
+        result.update(full=True, changed=_gen_child_nodes(conn, omero_id))
+        return result
+
+    pfx = f"G:{omero_id.group}:"
+    rows = query_changed_children(conn, omero_id, field, value)
+    on_demand = obj_type != "Dataset"
+    result["changed"] = [gen_node(*row, pfx, on_demand) for row in rows]
+
+    classes = sorted({x[0] for x in CHILDREN_QUERIES[obj_type]})
+    deleted = query_event_log(conn, classes, ["DELETE"], field, value)
+    result["removed"] = [f"{pfx}{obj_class}:{obj_id}" for obj_class, obj_id in deleted]
+    log.debug(
+        f"Found {len(result['changed'])} changed and {len(result['removed'])} deleted "
+        f"children of [{omero_id}] since [{since}]."
+    )
+    return result
+
+
+def query_changed_children(conn, omero_id, field, value):
+    """Query the children of a node that were updated or linked after an event.
+
+    Parameters
+    ----------
+    conn : omero.gateway.BlitzGateway
+        The OMERO connection object, its group context has to be set already.
+    omero_id : hrm_omero.misc.OmeroId
+        An object denoting an OMERO target, see `CHILDREN_QUERIES` for the supported
+        types.
+    field : str
+        The attribute of the events to compare, either `id` or `time`.
+    value : int
+        The event ID or time (in milliseconds) to compare to.
+
+    Returns
+    -------
+    list(tuple)
+        A list of tuples of the form `(class, id, name, owner_ome_name)`, sorted by
+        `children_sort_key()`.
+    """
+    # pylint: disable-msg=import-outside-toplevel
+    from omero.rtypes import rlong, rtime, unwrap
+    from omero.sys import ParametersI
+
+    params = ParametersI()
+    params.addIds([int(omero_id.obj_id)])
+    params.add("since", rlong(value) if field == "id" else rtime(value))
+    query_service = conn.getQueryService()
+    rows = []
+    for obj_class, alias, _, clause in CHILDREN_QUERIES[omero_id.obj_type]:
+        condition = f"{alias}.details.updateEvent.{field} > :since"
+        if omero_id.obj_type in LINK_CLASSES:
+            condition += f" or l.details.creationEvent.{field} > :since"
+        query = (
+            f"select {alias}.id, {alias}.name, o.omeName {clause} and ({condition}) "
+            f"order by lower({alias}.name), {alias}.id"
+        )
+        result = query_service.projection(query, params, conn.SERVICE_OPTS)
+        rows.extend((obj_class, *unwrap(row)) for row in result)
+    return sorted(rows, key=children_sort_key)
+
+
+def query_event_log(conn, classes, actions, field, value):
+    """Query OMERO's event log for objects that were e.g. deleted after an event.
+
+    Parameters
+    ----------
+    conn : omero.gateway.BlitzGateway
+        The OMERO connection object, its group context has to be set already.
+    classes : list(str)
+        The (short) names of the classes to look for, see `MODEL_CLASSES`.
+    actions : list(str)
+        The logged actions to look for, e.g. `DELETE`.
+    field : str
+        The attribute of the events to compare, either `id` or `time`.
+    value : int
+        The event ID or time (in milliseconds) to compare to.
+
+    Returns
+    -------
+    list(tuple)
+        A list of tuples of the form `(class, id)`, one per (distinct) object.
+    """
+    # pylint: disable-msg=import-outside-toplevel
+    from omero.rtypes import rlist, rlong, rstring, rtime, unwrap
+    from omero.sys import ParametersI
+
+    short_names = {MODEL_CLASSES[name]: name for name in classes}
+    params = ParametersI()
+    params.add("since", rlong(value) if field == "id" else rtime(value))
+    params.add("types", rlist([rstring(name) for name in short_names]))
+    params.add("actions", rlist([rstring(action) for action in actions]))
+    query = (
+        "select distinct el.entityType, el.entityId from EventLog el "
+        f"where el.event.{field} > :since and el.entityType in (:types) "
+        "and el.action in (:actions)"
+    )
+    result = conn.getQueryService().projection(query, params, conn.SERVICE_OPTS)
+    return [
+        (short_names[entity_type], obj_id) for entity_type, obj_id in unwrap(result)
+    ]
+
+
+def query_last_event(conn):
+    """Get the ID of the most recent event on the OMERO server.
+
+    Parameters
+    ----------
+    conn : omero.gateway.BlitzGateway
+        The OMERO connection object.
+
+    Returns
+    -------
+    int
+        The event ID.
+    """
+    # pylint: disable-msg=import-outside-toplevel
+    from omero.rtypes import unwrap
+    from omero.sys import ParametersI
+
+    result = conn.getQueryService().projection(
+        "select max(e.id) from Event e", ParametersI(), conn.SERVICE_OPTS
+    )
+    return unwrap(result[0][0]) or 0
+
+
+def gen_base_tree(conn, cache=None):
     """Generate all group trees with their members as the basic tree.
 
+    The groups of the current user and their members are fetched using a single query
+    across all groups, see `query_group_members()`. Like `BlitzGateway.listColleagues()`
+    the other members of private groups are only included for group leaders and
+    administrators, see `query_hidden_groups()`.
+
     Parameters
     ----------
     conn : omero.gateway.BlitzGateway
         The OMERO connection object.
+    cache : hrm_omero.treecache.TreeCache, optional
+        The cache to use for the base tree, by default `None`.
 
     Returns
     -------
-    list
-        A list of grouptree dicts as generated by `gen_group_tree()`.
+    list(hrm_omero.treenode.TreeNode)
+        A list of group trees as generated by `gen_group_tree()`.
     """
-    log.debug("Generating base tree...")
-    tree = []
-    for group in conn.getGroupsMemberOf():
-        tree.append(gen_group_tree(conn, group))
-    tree_sorted = sorted(tree, key=lambda d: d["label"].lower())
-    return tree_sorted
+
+    def generate():
+        log.debug("Generating base tree...")
+        members = query_group_members(conn)
+        hidden = query_hidden_groups(conn, {x[0] for x in members})
+        tree = group_trees_from_members(members, conn.getUserId(), hidden)
+        return sorted(tree, key=lambda d: d["label"].lower())
+
+    return cached(cache, conn, -1, "ROOT", generate)
 
 
-def gen_group_tree(conn, group=None):
+def gen_group_tree(conn, group=None, cache=None):
     """Create the tree nodes for a group and its members.
 
     Parameters
@@ -138,47 +1000,173 @@ def gen_group_tree(conn, group=None):
         The group object (or the group ID as int or str) to generate the tree for, by
         default `None` which will result in the group being derived from the current
         connection's context.
+    cache : hrm_omero.treecache.TreeCache, optional
+        The cache to look up the group tree in (and to store it after generating it),
+        by default `None` meaning the tree will always be generated.
 
     Returns
     -------
-    dict
-        A nested dict of the given group (or the default group if not specified
-        explicitly) and its members as a list of dicts in the `children` item, starting
-        with the current user as the first entry.
+    hrm_omero.treenode.TreeNode
+        The node of the given group (or the default group if not specified explicitly)
+        having its members as nodes in the `children` item, starting with the current
+        user as the first entry.
+
+    Raises
+    ------
+    RuntimeError
+        Raised in case the current user is not a member of the requested group.
     """
     if group is None:
         log.debug("Getting group from current context...")
         group = conn.getGroupFromContext()
 
     if isinstance(group, (int, str)):
-        target_gid = int(group)
-        group = None
-        for candidate in conn.getGroupsMemberOf():
-            if int(candidate.getId()) == target_gid:
-                log.debug(f"Found group object for ID {target_gid}!")
-                group = candidate
-                break
-        if group is None:
-            msg = f"Unable to identify group with ID {target_gid}!"
-            log.error(msg)
-            raise RuntimeError(msg)
-
-    gid = str(group.getId())
+        gid = str(int(group))
+    else:
+        gid = str(group.getId())
+
+    return cached(
+        cache,
+        conn,
+        gid,
+        f"G:{gid}:ExperimenterGroup:{gid}",
+        lambda: _gen_group_tree(conn, gid),
+    )
+
+
+def _gen_group_tree(conn, gid):
+    """Generate the tree of a group, see `gen_group_tree()` for details."""
     log.debug(f"Generating tree for group {gid}...")
-    conn.setGroupForSession(gid)
-
-    group_dict = gen_obj_dict(group)
-    # add the user's own tree first:
-    user = conn.getUser()
-    user_dict = gen_obj_dict(user, "G:" + gid + ":")
-    user_dict["load_on_demand"] = True
-    group_dict["children"].append(user_dict)
-    all_user_dicts = []
-    # then add the trees for other group members
-    for user in conn.listColleagues():
-        user_dict = gen_obj_dict(user, "G:" + gid + ":")
-        user_dict["load_on_demand"] = True
-        all_user_dicts.append(user_dict)
-
-    group_dict["children"] += sorted(all_user_dicts, key=lambda d: d["label"].lower())
-    return group_dict
+    members = query_group_members(conn, gid)
+    hidden = query_hidden_groups(conn, {x[0] for x in members})
+    tree = group_trees_from_members(members, conn.getUserId(), hidden)
+    if not tree:
+        msg = f"Unable to identify group with ID {gid}!"
+        log.error(msg)
+        raise RuntimeError(msg)
+
+    return tree[0]
+
+
+def query_group_members(conn, gid=None):
+    """Query the groups of the current user together with all their members.
+
+    The query is run with the group context set to `-1`, so it covers all groups at
+    once without having to switch the group of the session.
+
+    Parameters
+    ----------
+    conn : omero.gateway.BlitzGateway
+        The (connected) OMERO connection object.
+    gid : int or str, optional
+        The ID of a group to restrict the query to, by default `None`.
+
+    Returns
+    -------
+    list(tuple)
+        A list of tuples of the form `(group_id, group_name, user_id, ome_name,
+        first_name, middle_name, last_name)`, one per group membership.
+    """
+    # pylint: disable-msg=import-outside-toplevel
+    from omero.rtypes import rlong, unwrap
+    from omero.sys import ParametersI
+
+    query = GROUP_MEMBERS_QUERY
+    params = ParametersI()
+    params.add("uid", rlong(conn.getUserId()))
+    if gid is not None:
+        query += " and g.id = :gid"
+        params.add("gid", rlong(int(gid)))
+
+    ctx = conn.SERVICE_OPTS.copy()
+    ctx.setOmeroGroup(-1)
+    result = conn.getQueryService().projection(query, params, ctx)
+    rows = [tuple(unwrap(row)) for row in result]
+    log.debug(f"Queried {len(rows)} group memberships.")
+    return rows
+
+
+def query_hidden_groups(conn, gids):
+    """Determine the groups whose other members must not be shown to the current user.
+
+    This mimics `BlitzGateway.listColleagues()`: the members of a private group can
+    only see each other if they are the group's leader, administrators can see all of
+    them.
+
+    Parameters
+    ----------
+    conn : omero.gateway.BlitzGateway
+        The (connected) OMERO connection object.
+    gids : iterable(int)
+        The IDs of the groups to check.
+
+    Returns
+    -------
+    set(int)
+        The IDs of the private groups not led by the current user (empty for
+        administrators).
+    """
+    context = conn.getEventContext()
+    if context.isAdmin:
+        return set()
+
+    candidates = [int(x) for x in gids if int(x) not in context.leaderOfGroups]
+    if not candidates:
+        return set()
+    groups = conn.getObjects("ExperimenterGroup", candidates)
+    hidden = {group.getId() for group in groups if group.isPrivate()}
+    log.debug(f"Hiding the members of {len(hidden)} private group(s).")
+    return hidden
+
+
+def group_trees_from_members(members, user_id, hidden=()):
+    """Assemble group trees from the rows returned by `query_group_members()`.
+
+    Parameters
+    ----------
+    members : list(tuple)
+        The group memberships as returned by `query_group_members()`.
+    user_id : int
+        The ID of the current user, whose node will be put first in every group.
+    hidden : iterable(int), optional
+        The IDs of groups where only the current user will be included, see
+        `query_hidden_groups()`, by default none.
+
+    Returns
+    -------
+    list(hrm_omero.treenode.TreeNode)
+        The (unsorted) group trees as described in `gen_group_tree()`.
+    """
+    groups = {}
+    for group_id, group_name, member_id, ome_name, first, middle, last in members:
+        if group_id not in groups:
+            group_dict = gen_node("ExperimenterGroup", group_id, group_name, None)
+            groups[group_id] = (group_dict, [], [])
+        group_dict, own, others = groups[group_id]
+        if member_id != user_id and group_id in hidden:
+            continue
+
+        label = _full_name(first, middle, last, ome_name)
+        user_dict = gen_node(
+            "Experimenter", member_id, label, member_id, f"G:{group_id}:", True
+        )
+        if member_id == user_id:
+            own.append(user_dict)
+        else:
+            others.append(user_dict)
+
+    tree = []
+    for group_dict, own, others in groups.values():
+        # add the user's own tree first, then the trees for other group members:
+        group_dict["children"] = own + sorted(others, key=lambda d: d["label"].lower())
+        tree.append(group_dict)
+    return tree
+
+
+def _full_name(first, middle, last, ome_name):
+    """Format a user name the same way as `ExperimenterWrapper.getFullName()`."""
+    if middle is not None and middle != "":
+        return f"{first} {middle} {last}"
+    if first == "" and last == "":
+        return ome_name
+    return f"{first} {last}"
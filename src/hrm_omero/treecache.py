@@ -0,0 +1,214 @@
+"""Persistent cache for OMERO tree nodes, backed by an SQLite database.
+
+Users of the HRM file browser tend to expand the same projects and datasets over and
+over again, each time requiring the connector to query OMERO. If a database file is
+configured via `OMERO_CONNECTOR_TREE_CACHE` in the HRM configuration file, the nodes
+generated by the functions in `hrm_omero.tree` are stored there and re-used for
+`OMERO_CONNECTOR_TREE_CACHE_TTL` seconds (default 60), keyed by user, group and the ID
+of the requested node (having the requested page appended as `#offset:limit` for
+paginated results).
+
+The database uses SQLite's write-ahead log and a busy timeout, so it can be used by
+several connector processes (and threads) at the same time. Every operation opens its
+own short-lived database connection. Any error accessing the cache (including the
+database file or its directory not being accessible) is logged and treated like a cache
+miss, so the cache never prevents the tree from being generated.
+
+Entries are invalidated explicitly after an upload to a dataset (for all users), so
+new images show up immediately. Other changes made in OMERO will become visible once
+the corresponding entries have expired.
+"""
+
+import json
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+
+from loguru import logger as log
+
+from .treenode import from_json, json_default
+
+TREE_CACHE_TTL = 60
+"""Default time in seconds a tree node is cached."""
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS nodes (
+    user TEXT NOT NULL,
+    grp TEXT NOT NULL,
+    node TEXT NOT NULL,
+    created REAL NOT NULL,
+    tree TEXT NOT NULL,
+    PRIMARY KEY (user, grp, node)
+)
+"""
+
+
+class TreeCache:
+
+    """Cache for the results of the tree generating functions.
+
+    Parameters
+    ----------
+    path : str
+        The SQLite database file, will be created (only accessible by the owner) if it
+        doesn't exist yet.
+    ttl : int or float, optional
+        The time in seconds a cached node is valid, by default `TREE_CACHE_TTL`.
+    """
+
+    def __init__(self, path, ttl=TREE_CACHE_TTL):
+        self.path = path
+        self.ttl = ttl
+
+    def __str__(self):
+        return f"{self.path} (ttl={self.ttl}s)"
+
+    @contextmanager
+    def _database(self):
+        """Context manager providing a database connection within a transaction."""
+        if not os.path.exists(self.path):
+            parent = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(parent, mode=0o700, exist_ok=True)
+            os.close(os.open(self.path, os.O_CREAT | os.O_WRONLY, 0o600))
+        database = sqlite3.connect(self.path, timeout=30)
+        try:
+            database.execute("PRAGMA journal_mode=WAL")
+            with database:
+                database.execute(_SCHEMA)
+                yield database
+        finally:
+            database.close()
+
+    def get(self, user, group, node):
+        """Look up a cached tree node.
+
+        Parameters
+        ----------
+        user : str
+            The OMERO user name.
+        group : str or int
+            The OMERO group ID the node was requested in.
+        node : str
+            The ID of the node, e.g. `G:4:Dataset:23`.
+
+        Returns
+        -------
+        list or dict or None
+            The cached node(s) (as `hrm_omero.treenode.TreeNode` objects) or None in
+            case there is no valid cache entry.
+        """
+        try:
+            with self._database() as database:
+                row = database.execute(
+                    "SELECT created, tree FROM nodes "
+                    "WHERE user = ? AND grp = ? AND node = ?",
+                    (user, str(group), node),
+                ).fetchone()
+        except (sqlite3.Error, OSError) as err:
+            log.warning(f"Unable to read from tree cache [{self.path}]: {err}")
+            return None
+
+        if row is None or row[0] + self.ttl < time.time():
+            return None
+        log.debug(f"Using cached tree for [{node}] of [{user}].")
+        return json.loads(row[1], object_hook=from_json)
+
+    def put(self, user, group, node, tree):
+        """Store a tree node in the cache, dropping all expired entries.
+
+        Parameters
+        ----------
+        user : str
+            The OMERO user name.
+        group : str or int
+            The OMERO group ID the node was requested in.
+        node : str
+            The ID of the node, e.g. `G:4:Dataset:23`.
+        tree : list or dict
+            The node(s) to be cached, either JSON serializable or (containing)
+            `hrm_omero.treenode.TreeNode` objects.
+        """
+        now = time.time()
+        try:
+            with self._database() as database:
+                expired = now - self.ttl
+                database.execute("DELETE FROM nodes WHERE created < ?", (expired,))
+                serialized = json.dumps(tree, default=json_default)
+                database.execute(
+                    "INSERT OR REPLACE INTO nodes VALUES (?, ?, ?, ?, ?)",
+                    (user, str(group), node, now, serialized),
+                )
+        except (sqlite3.Error, OSError) as err:
+            log.warning(f"Unable to write to tree cache [{self.path}]: {err}")
+
+    def invalidate(self, node):
+        """Remove the cache entries of a node (including all pages) for all users.
+
+        Parameters
+        ----------
+        node : str
+            The ID of the node, e.g. `G:4:Dataset:23`.
+        """
+        try:
+            with self._database() as database:
+                database.execute(
+                    "DELETE FROM nodes WHERE node = ? OR node LIKE ?",
+                    (node, f"{node}#%"),
+                )
+            log.debug(f"Invalidated cached tree for [{node}].")
+        except (sqlite3.Error, OSError) as err:
+            log.warning(f"Unable to invalidate tree cache [{self.path}]: {err}")
+
+
+def cached(cache, conn, group, node, generate):
+    """Get a tree node from the cache, generating (and caching) it if necessary.
+
+    Parameters
+    ----------
+    cache : TreeCache or None
+        The cache to use, `None` meaning the node will simply be generated.
+    conn : omero.gateway.BlitzGateway
+        The (connected) OMERO connection object, used to determine the user name.
+    group : str or int
+        The OMERO group ID the node is requested in.
+    node : str
+        The ID of the node, e.g. `G:4:Dataset:23`.
+    generate : callable
+        The function generating the node(s), called without arguments.
+
+    Returns
+    -------
+    list or dict
+        The generated or cached node(s).
+    """
+    if cache is None:
+        return generate()
+
+    user = conn.getEventContext().userName
+    tree = cache.get(user, group, node)
+    if tree is None:
+        tree = generate()
+        cache.put(user, group, node, tree)
+    return tree
+
+
+def from_config(hrm_config):
+    """Create the tree cache configured in the HRM configuration file (if any).
+
+    Parameters
+    ----------
+    hrm_config : dict
+        A parsed HRM configuration file as returned by `hrm_omero.hrm.parse_config()`.
+
+    Returns
+    -------
+    TreeCache or None
+        The cache object or None in case `OMERO_CONNECTOR_TREE_CACHE` is not set.
+    """
+    path = hrm_config.get("OMERO_CONNECTOR_TREE_CACHE", "")
+    if not path:
+        return None
+
+    ttl = hrm_config.get("OMERO_CONNECTOR_TREE_CACHE_TTL", "")
+    return TreeCache(path, float(ttl) if ttl else TREE_CACHE_TTL)
@@ -0,0 +1,233 @@
+"""Compact representation of OMERO tree nodes.
+
+Listings of large datasets result in tens of thousands of nodes, which are kept in
+memory while being cached, expanded or passed through the connector daemon. Using a
+`dict` per node (plus an empty `children` list) makes them several times larger than
+required, so the functions in `hrm_omero.tree` generate `TreeNode` objects instead.
+
+These use `__slots__`, share a single empty tuple for nodes without children and
+support the subset of the `dict` interface used on tree nodes (item access for the
+JSON keys, `get()`, `pop()` and the `in` operator), so code written for the dicts of
+`hrm_omero.tree.gen_node_dict()` works with both. Only `children` and the optional
+items (`load_on_demand`, `child_count` and `total_bytes`) can be modified.
+
+Nodes are serialized to the very same JSON structure as the dicts by passing
+`json_default()` as the `default` function to `json.dump()` / `json.dumps()`, or by
+passing `from_json()` as the `object_hook` to `json.load()` / `json.loads()` when
+reading them back.
+
+The functions of `hrm_omero.tree` return the nodes as-is, they are only converted
+while being serialized (by `hrm_omero.formatting` and `hrm_omero.treecache`), so no
+copy of a whole tree is created at any point. Use `to_dicts()` in case plain dicts are
+required, e.g. for passing a tree to `json.dumps()` without the `default` function.
+"""
+
+_EMPTY = ()
+
+_OPTIONAL = ("load_on_demand", "child_count", "total_bytes")
+
+_NODE_KEYS = {"class", "id", "label", "owner", "children"}
+
+
+class TreeNode:
+
+    """A node of the OMERO tree, see `hrm_omero.tree.gen_obj_dict()` for its items.
+
+    Parameters
+    ----------
+    obj_class : str
+        The OMERO class of the object, e.g. `Project`.
+    node_id : str
+        The ID of the node, e.g. `G:4:Project:1154`.
+    label : str
+        The label (name) of the node.
+    owner : str or int or None
+        The owner of the object.
+    children : list(TreeNode), optional
+        The child nodes, by default an (immutable) empty tuple. Assign a new list
+        instead of appending to it.
+    load_on_demand : bool, optional
+        The flag telling the jqTree library to request the children when expanding the
+        node, by default False (meaning the item is not present).
+    """
+
+    __slots__ = (
+        "obj_class",
+        "node_id",
+        "label",
+        "owner",
+        "children",
+        "load_on_demand",
+        "child_count",
+        "total_bytes",
+    )
+
+    _KEYS = {"class": "obj_class", "id": "node_id", "label": "label", "owner": "owner"}
+
+    def __init__(  # pylint: disable-msg=too-many-arguments
+        self, obj_class, node_id, label, owner, children=_EMPTY, load_on_demand=False
+    ):
+        self.obj_class = obj_class
+        self.node_id = node_id
+        self.label = label
+        self.owner = owner
+        self.children = children
+        self.load_on_demand = load_on_demand
+        self.child_count = None
+        self.total_bytes = None
+
+    def __repr__(self):
+        return f"TreeNode({self.to_dict()!r})"
+
+    def __contains__(self, key):
+        if key == "load_on_demand":
+            return self.load_on_demand is True
+        if key in _OPTIONAL:
+            return getattr(self, key) is not None
+        return key in self._KEYS or key == "children"
+
+    def __getitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        return getattr(self, self._KEYS.get(key, key))
+
+    def __setitem__(self, key, value):
+        if key != "children" and key not in _OPTIONAL:
+            raise KeyError(f"'{key}' of a tree node can't be modified")
+        setattr(self, key, value)
+
+    def __eq__(self, other):
+        if isinstance(other, (TreeNode, dict)):
+            return self.to_dict() == dict(other.items())
+        return NotImplemented
+
+    __hash__ = None
+
+    def get(self, key, default=None):
+        """Return the value of an item if present, `default` otherwise."""
+        return self[key] if key in self else default
+
+    def pop(self, key, default=None):
+        """Remove an optional item (e.g. `load_on_demand`) and return its value."""
+        if key not in _OPTIONAL:
+            raise KeyError(f"'{key}' of a tree node can't be removed")
+        value = self.get(key, default)
+        setattr(self, key, False if key == "load_on_demand" else None)
+        return value
+
+    def items(self):
+        """Return the (present) items of the node, like `dict.items()`."""
+        return self.to_dict().items()
+
+    def to_dict(self):
+        """Get the items of the node as a (shallow) dict.
+
+        Returns
+        -------
+        dict
+            The items of the node, having the children list still contain the child
+            nodes (i.e. not converted recursively).
+        """
+        node = {
+            "class": self.obj_class,
+            "id": self.node_id,
+            "label": self.label,
+            "owner": self.owner,
+            "children": list(self.children),
+        }
+        for key in _OPTIONAL:
+            if key in self:
+                node[key] = getattr(self, key)
+        return node
+
+
+def to_dicts(tree):
+    """Recursively convert the tree nodes contained in a structure to plain dicts.
+
+    Parameters
+    ----------
+    tree : TreeNode or list or dict
+        The node(s), e.g. a list of nodes or a page as returned by
+        `hrm_omero.tree.gen_children_page()`. Other values are returned as-is.
+
+    Returns
+    -------
+    dict or list
+        The structure having all nodes (including their children) replaced by dicts.
+    """
+    if isinstance(tree, TreeNode):
+        tree = tree.to_dict()
+    if isinstance(tree, dict):
+        return {key: to_dicts(value) for key, value in tree.items()}
+    if isinstance(tree, (list, tuple)):
+        return [to_dicts(item) for item in tree]
+    return tree
+
+
+def json_default(obj):
+    """Serialize tree nodes, to be used as `default` for `json.dumps()`.
+
+    The JSON encoder calls this for every node it encounters, so only a shallow dict of
+    the node currently being encoded is created (instead of a copy of the whole tree).
+
+    Parameters
+    ----------
+    obj : object
+        The object the JSON encoder can't serialize by itself.
+
+    Returns
+    -------
+    dict
+        The items of the node.
+
+    Raises
+    ------
+    TypeError
+        Raised in case `obj` is not a `TreeNode`.
+    """
+    if isinstance(obj, TreeNode):
+        # unlike `TreeNode.to_dict()` the children don't need to be copied here:
+        node = {
+            "class": obj.obj_class,
+            "id": obj.node_id,
+            "label": obj.label,
+            "owner": obj.owner,
+            "children": obj.children,
+        }
+        if obj.load_on_demand is True:
+            node["load_on_demand"] = True
+        if obj.child_count is not None:
+            node["child_count"] = obj.child_count
+        if obj.total_bytes is not None:
+            node["total_bytes"] = obj.total_bytes
+        return node
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def from_json(obj):
+    """Convert decoded tree nodes, to be used as `object_hook` for `json.loads()`.
+
+    Parameters
+    ----------
+    obj : dict
+        A JSON object as decoded by the parser.
+
+    Returns
+    -------
+    TreeNode or dict
+        The tree node or the dict as-is in case it doesn't have all items of a node
+        (e.g. a page of children).
+    """
+    if not _NODE_KEYS.issubset(obj):
+        return obj
+    node = TreeNode(
+        obj["class"],
+        obj["id"],
+        obj["label"],
+        obj["owner"],
+        obj["children"] or _EMPTY,
+        obj.get("load_on_demand", False),
+    )
+    node.child_count = obj.get("child_count")
+    node.total_bytes = obj.get("total_bytes")
+    return node
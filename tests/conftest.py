@@ -9,6 +9,8 @@ import pytest
 from _pytest.logging import caplog as _caplog  # pylint: disable-msg=unused-import
 from loguru import logger
 
+from hrm_omero.treenode import json_default
+
 ### common "private" functions
 
 
@@ -107,7 +109,7 @@ def json_is_equal():
     Provides a function that takes two arguments of any (serializable) type. In case
     any of the arguments is of type `str` it will first be deserialized (assuming the
     content is JSON). Eventually the serialized version of both arguments will be tested
-    for equality.
+    for equality, tree nodes are serialized using `hrm_omero.treenode.json_default()`.
     """
 
     def json_is_equal_inner(expected, received):
@@ -129,12 +131,16 @@ def json_is_equal():
         if isinstance(expected, str):
             _stderr(f"EXPECTED RAW\n---\n{expected}\n---")
             expected = json.loads(expected)
-        serialized_exp = json.dumps(expected, indent=4, sort_keys=True)
+        serialized_exp = json.dumps(
+            expected, indent=4, sort_keys=True, default=json_default
+        )
 
         if isinstance(received, str):
             _stderr(f"RECEIVED RAW\n---\n{received}\n---")
             received = json.loads(received)
-        serialized_rec = json.dumps(received, indent=4, sort_keys=True)
+        serialized_rec = json.dumps(
+            received, indent=4, sort_keys=True, default=json_default
+        )
 
         _stderr(f"EXPECTED\n---\n{serialized_exp}\n---")
         _stderr(f"RECEIVED\n---\n{serialized_rec}\n---")
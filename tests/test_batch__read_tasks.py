@@ -0,0 +1,78 @@
+"""Tests for the task parsing functions of the 'batch' submodule."""
+
+import pytest
+
+from hrm_omero import batch
+
+
+def test_read_tasks():
+    """Test parsing a stream with valid, empty and malformed lines.
+
+    Expected behavior is to skip empty lines and yield a ValueError for malformed ones.
+    """
+    lines = [
+        '{"action": "retrieveChildren", "id": "ROOT"}\n',
+        "\n",
+        "not json\n",
+        '{"id": "ROOT"}\n',
+        '["checkCredentials"]\n',
+    ]
+    tasks = list(batch.read_tasks(lines))
+    assert len(tasks) == 4
+    assert tasks[0] == {"action": "retrieveChildren", "id": "ROOT"}
+    for task in tasks[1:]:
+        assert isinstance(task, ValueError)
+        assert "Malformed task" in str(task)
+
+
+def test_task_to_argv():
+    """Test converting a task dict into command line arguments."""
+    task = {"action": "OMEROtoHRM", "imageid": "G:7:Image:42", "dest": "/tmp/foo"}
+    argv = batch.task_to_argv(task, "pytest")
+    assert argv == [
+        "--user",
+        "pytest",
+        "OMEROtoHRM",
+        "--imageid",
+        "G:7:Image:42",
+        "--dest",
+        "/tmp/foo",
+    ]
+
+
+def test_task_to_argv_list():
+    """Test converting a task having a list of values into command line arguments."""
+    task = {"action": "OMEROtoHRM", "imageid": ["G:7:Image:42", "G:7:Image:43"]}
+    argv = batch.task_to_argv(task, "pytest")
+    assert argv[3:] == ["--imageid", "G:7:Image:42", "G:7:Image:43"]
+
+
+def test_task_to_argv_flags():
+    """Test converting a task having boolean options into command line arguments."""
+    task = {
+        "action": "retrieveChildren",
+        "id": "ROOT",
+        "compact": True,
+        "prefix": False,
+    }
+    argv = batch.task_to_argv(task, "pytest")
+    assert argv[3:] == ["--id", "ROOT", "--compact"]
+
+    perform_action, kwargs = batch.prepare_task(task, "pytest", {})
+    assert perform_action.__qualname__ == "print_children_json"
+    assert kwargs["compact"] is True
+
+
+def test_prepare_task():
+    """Test mapping valid and invalid tasks to the corresponding functions."""
+    task = {"action": "retrieveChildren", "id": "G:4:Project:12"}
+    perform_action, kwargs = batch.prepare_task(task, "pytest", {})
+    assert perform_action.__qualname__ == "print_children_json"
+    assert kwargs["omero_id"] == "G:4:Project:12"
+    assert kwargs["depth"] == 1
+
+    with pytest.raises(ValueError, match="Invalid arguments"):
+        batch.prepare_task({"action": "retrieveChildren"}, "pytest", {})
+
+    with pytest.raises(ValueError, match="can't be run in batch mode"):
+        batch.prepare_task({"action": "batch"}, "pytest", {})
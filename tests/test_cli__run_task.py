@@ -1,8 +1,11 @@
 """Tests for the 'cli.run_task() function."""
 
+from types import SimpleNamespace
+
 import pytest
 
-from hrm_omero import cli
+from hrm_omero import cli, sessions
+from hrm_omero import omero as _omero
 
 
 def test_no_password(capsys, monkeypatch, cli_args):
@@ -92,6 +95,10 @@ def test_dry_run_from_omero(capsys, monkeypatch, cli_args):
     assert "function: from_omero" in captured.out
     assert "omero_id: [G:7:Image:42]" in captured.out
     assert "dest: [/tmp/foo]" in captured.out
+    assert "jobs: [4]" in captured.out
+    assert "chunk_size: [8388608]" in captured.out
+    assert "download_cache: [None]" in captured.out
+    assert "repository_root: []" in captured.out
     assert ret is True
 
 
@@ -119,10 +126,30 @@ def test_dry_run_to_omero(capsys, monkeypatch, cli_args):
     assert "dry-run, only showing action and parameters" in captured.out
     assert "function: to_omero" in captured.out
     assert "omero_id: [G:7:Dataset:23]" in captured.out
+    assert "inplace: [None]" in captured.out
     assert "image_file: [/tmp/foo]" in captured.out
     assert ret is True
 
 
+def test_dry_run_batch(capsys, monkeypatch, cli_args):
+    """Test run_task() with action "batch" in "dry-run" mode.
+
+    Expected behavior is to print the function name and args to stdout and return True.
+    """
+    monkeypatch.setenv("OMERO_PASSWORD", "non_empty_dummy_password_string")
+
+    action_args = ["--file", "/tmp/tasks.jsonl", "--jobs", "4"]
+    args = cli_args("batch", action_args, dry_run=True)
+    ret = cli.run_task(args)
+    captured = capsys.readouterr()
+    print(captured.out)
+    assert "dry-run, only showing action and parameters" in captured.out
+    assert "function: run_batch" in captured.out
+    assert "task_file: [/tmp/tasks.jsonl]" in captured.out
+    assert "jobs: [4]" in captured.out
+    assert ret is True
+
+
 def test_wrong_parameter_order(capsys, monkeypatch, cli_args):
     """Test run_task() with a wrong order of the otherwise correct parameters.
 
@@ -141,3 +168,123 @@ def test_wrong_parameter_order(capsys, monkeypatch, cli_args):
     captured = capsys.readouterr()
     print(captured.err)
     assert "error: argument action: invalid choice" in captured.err
+
+
+def test_dry_run_retrieve_children_many(capsys, monkeypatch, cli_args):
+    """Test run_task() with action "retrieveChildren" for several IDs and levels.
+
+    Expected behavior is to print the function name and args to stdout and return True.
+    """
+    monkeypatch.setenv("OMERO_PASSWORD", "non_empty_dummy_password_string")
+
+    args = cli_args(
+        "retrieveChildren",
+        ["--id", "G:4:Experimenter:7", "G:4:Project:23", "--depth", "2"]
+        + ["--limit", "5"],
+        dry_run=True,
+    )
+    ret = cli.run_task(args)
+    captured = capsys.readouterr()
+    print(captured.out)
+    assert "function: print_children_json" in captured.out
+    assert "omero_id: [['G:4:Experimenter:7', 'G:4:Project:23']]" in captured.out
+    assert "depth: [2]" in captured.out
+    assert "offset: [0]" in captured.out
+    assert "limit: [5]" in captured.out
+    assert ret is True
+
+
+def test_dry_run_search(capsys, monkeypatch, cli_args):
+    """Test run_task() with action "search" in "dry-run" mode.
+
+    Expected behavior is to print the function name and args to stdout and return True.
+    """
+    monkeypatch.setenv("OMERO_PASSWORD", "non_empty_dummy_password_string")
+
+    args = cli_args(
+        "search", ["--name", "cells", "--prefix", "--type", "Dataset"], dry_run=True
+    )
+    ret = cli.run_task(args)
+    captured = capsys.readouterr()
+    print(captured.out)
+    assert "function: print_search_json" in captured.out
+    assert "text: [cells]" in captured.out
+    assert "prefix: [True]" in captured.out
+    assert "classes: [['Dataset']]" in captured.out
+    assert ret is True
+
+
+def test_failed_session_login(capsys, monkeypatch, tmp_path, cli_args):
+    """Test run_task() with a session cache when logging into OMERO fails.
+
+    Expected behavior is to print an error message and return False without running
+    the action (which would try to log in once more).
+    """
+    monkeypatch.setenv("OMERO_PASSWORD", "non_empty_dummy_password_string")
+    hrm_conf = tmp_path / "hrm.conf"
+    hrm_conf.write_text(f'OMERO_CONNECTOR_SESSION_CACHE="{tmp_path / "sessions"}"\n')
+    calls = []
+    conn = SimpleNamespace(close=lambda hard: calls.append("close"))
+    monkeypatch.setattr(_omero, "new_gateway", lambda *args: conn)
+    monkeypatch.setattr(sessions, "connect", lambda *args: False)
+    monkeypatch.setattr(_omero, "check_credentials", lambda conn: calls.append("run"))
+
+    ret = cli.run_task(cli_args("checkCredentials", hrm_conf=str(hrm_conf)))
+    captured = capsys.readouterr()
+    assert "logging into OMERO failed" in captured.err
+    assert ret is False
+    assert calls == ["close"]
+
+
+def test_invalid_inplace_config(capsys, monkeypatch, tmp_path, cli_args):
+    """Test run_task() with action "HRMtoOMERO" and an invalid in-place import config.
+
+    Expected behavior is to print an error message and return False.
+    """
+    monkeypatch.setenv("OMERO_PASSWORD", "non_empty_dummy_password_string")
+    hrm_conf = tmp_path / "hrm.conf"
+    hrm_conf.write_text('OMERO_CONNECTOR_INPLACE_IMPORT="ln_s"\n')
+
+    action_args = ["--dset", "G:7:Dataset:23", "--file", "/tmp/foo"]
+    ret = cli.run_task(cli_args("HRMtoOMERO", action_args, hrm_conf=str(hrm_conf)))
+    captured = capsys.readouterr()
+    assert "requires OMERO_CONNECTOR_REPOSITORY_ROOT" in captured.err
+    assert ret is False
+
+
+@pytest.mark.parametrize("jobs", ["", "four", "0", "-2"])
+def test_invalid_download_jobs(capsys, monkeypatch, tmp_path, cli_args, jobs):
+    """Test run_task() with action "OMEROtoHRM" and invalid numbers of download jobs.
+
+    Expected behavior is to print an error message and return False, except for an
+    empty config value (resulting in the default being used).
+    """
+    monkeypatch.setenv("OMERO_PASSWORD", "non_empty_dummy_password_string")
+    hrm_conf = tmp_path / "hrm.conf"
+    hrm_conf.write_text(f'OMERO_CONNECTOR_DOWNLOAD_JOBS="{jobs}"\n')
+
+    action_args = ["--imageid", "G:7:Image:42", "--dest", "/tmp/foo"]
+    args = cli_args("OMEROtoHRM", action_args, hrm_conf=str(hrm_conf), dry_run=True)
+    ret = cli.run_task(args)
+    captured = capsys.readouterr()
+    if not jobs:
+        assert "jobs: [4]" in captured.out
+        assert ret is True
+        return
+
+    assert f"Invalid value for OMERO_CONNECTOR_DOWNLOAD_JOBS: '{jobs}'" in captured.err
+    assert ret is False
+
+
+def test_invalid_jobs_option(capsys, monkeypatch, cli_args):
+    """Test run_task() with action "OMEROtoHRM" and `--jobs 0`.
+
+    Expected behavior is to print an error message and return False.
+    """
+    monkeypatch.setenv("OMERO_PASSWORD", "non_empty_dummy_password_string")
+
+    action_args = ["--imageid", "G:7:Image:42", "--dest", "/tmp/foo", "--jobs", "0"]
+    ret = cli.run_task(cli_args("OMEROtoHRM", action_args, dry_run=True))
+    captured = capsys.readouterr()
+    assert "Invalid value for --jobs: '0'" in captured.err
+    assert ret is False
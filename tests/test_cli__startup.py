@@ -0,0 +1,79 @@
+"""Start-up tests for the 'cli' module.
+
+Every click in the HRM's OMERO file browser spawns a new connector process, so the time
+spent importing modules is on the critical path of the web interface. These tests run
+the connector in "dry-run" mode in a fresh interpreter and check that none of the heavy
+dependencies is loaded, neither by importing `hrm_omero.cli` nor by selecting any of
+the actions.
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+# dependencies that are only required for some of the actions:
+HEAVY_MODULES = ["omero", "Ice", "PIL", "bs4", "yaml"]
+
+BASE_ARGS = ["--dry-run", "--conf", "resources/hrm.conf", "--user", "pytest"]
+
+ACTIONS = {
+    "checkCredentials": [],
+    "retrieveChildren": ["--id", "ROOT"],
+    "search": ["--name", "foo"],
+    "OMEROtoHRM": ["--imageid", "G:7:Image:42", "--dest", "/tmp/foo"],
+    "HRMtoOMERO": ["--dset", "G:7:Dataset:23", "--file", "/tmp/foo"],
+    "batch": ["--file", "/tmp/tasks.jsonl"],
+    "serve": ["--socket", "/tmp/foo.sock"],
+}
+
+# reports the heavy modules loaded after the import and after running the action:
+CODE = """
+import json, sys
+import hrm_omero.cli
+heavy = sys.argv[1].split(",")
+imported = [x for x in heavy if x in sys.modules]
+status = hrm_omero.cli.run_task(sys.argv[2:])
+print(json.dumps([imported, [x for x in heavy if x in sys.modules], status]))
+"""
+
+
+def run_fresh(args):
+    """Run the connector with the given arguments in a new Python process.
+
+    Parameters
+    ----------
+    args : list(str)
+        The arguments to pass on to `cli.run_task()`.
+
+    Returns
+    -------
+    (list(str), list(str), bool)
+        The heavy modules loaded after importing `hrm_omero.cli` and after running the
+        task, and the return value of the task.
+    """
+    env = dict(os.environ, OMERO_PASSWORD="non_empty_dummy_password_string")
+    proc = subprocess.run(
+        [sys.executable, "-c", CODE, ",".join(HEAVY_MODULES)] + args,
+        env=env,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        check=False,
+    )
+    assert proc.returncode == 0, proc.stderr
+    return json.loads(proc.stdout.splitlines()[-1])
+
+
+@pytest.mark.parametrize("action", ACTIONS.keys())
+def test_dry_run_startup(action):
+    """Test the modules loaded by importing the CLI and running an action (dry-run).
+
+    Expected behavior is that none of the heavy dependencies is in `sys.modules`.
+    """
+    imported, loaded, status = run_fresh(BASE_ARGS + [action] + ACTIONS[action])
+    assert status is True
+    assert not imported
+    assert not loaded
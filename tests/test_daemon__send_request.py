@@ -0,0 +1,91 @@
+"""Tests for the 'daemon.send_request()' function and the connector daemon."""
+
+import os
+import stat
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from hrm_omero import daemon
+from hrm_omero import omero as _omero
+
+
+@pytest.fixture
+def server(tmp_path):
+    """Run a connector daemon on a temporary socket in a background thread."""
+    socket_path = (tmp_path / "connector.sock").as_posix()
+    srv = daemon.ConnectorServer(socket_path, {"OMERO_HOSTNAME": "omero.example.xy"})
+    thread = threading.Thread(target=srv.serve_forever, kwargs={"poll_interval": 0.1})
+    thread.start()
+
+    yield srv
+
+    srv.shutdown()
+    thread.join()
+    srv.server_close()
+
+
+def test_socket_permissions(server):
+    """Test the socket is only accessible by the owner and removed on shutdown."""
+    mode = os.stat(server.server_address).st_mode
+    assert stat.S_ISSOCK(mode)
+    assert stat.S_IMODE(mode) == 0o600
+
+
+def test_dry_run(server):
+    """Test a "checkCredentials" request in "dry-run" mode.
+
+    Expected behavior is to receive the output of the dry-run and a `True` status.
+    """
+    reply = daemon.send_request(
+        server.server_address, "pytest", "dummy_pw", ["--dry-run", "checkCredentials"]
+    )
+    assert reply["status"] is True
+    assert "function: check_credentials" in reply["output"]
+
+
+def test_invalid_actions(server):
+    """Test requests with an invalid action or one not supported by the daemon.
+
+    Expected behavior is to receive an error message and a `False` status.
+    """
+    reply = daemon.send_request(server.server_address, "pytest", "pw", ["NoAction"])
+    assert reply["status"] is False
+    assert "invalid arguments" in reply["output"]
+
+    reply = daemon.send_request(server.server_address, "pytest", "pw", ["serve"])
+    assert reply["status"] is False
+    assert "can't be run by the daemon" in reply["output"]
+
+
+def test_failed_login(monkeypatch, server):
+    """Test a request with credentials that are rejected by OMERO.
+
+    Expected behavior is to receive an error message and a `False` status without the
+    action being run, the failed connection being dropped from the session store.
+    """
+    calls = []
+    conn = SimpleNamespace(
+        connect=lambda: calls.append("connect") and False,
+        close=lambda: calls.append("close"),
+    )
+    monkeypatch.setattr(_omero, "new_gateway", lambda *args: conn)
+    monkeypatch.setattr(_omero, "check_credentials", lambda conn: conn.connect())
+
+    reply = daemon.send_request(
+        server.server_address, "pytest", "wrong_pw", ["checkCredentials"]
+    )
+    assert reply["status"] is False
+    assert "ERROR logging into OMERO" in reply["output"]
+    assert calls == ["connect", "close"]
+    assert not server.sessions._sessions  # pylint: disable-msg=protected-access
+
+
+def test_stale_socket(tmp_path, server):
+    """Test starting a second daemon on a socket that is in use.
+
+    Expected behavior is to raise a RuntimeError.
+    """
+    with pytest.raises(RuntimeError, match="already listening"):
+        daemon.ConnectorServer(server.server_address, {})
@@ -0,0 +1,130 @@
+"""Tests for the 'downloadcache.DownloadCache' class."""
+
+import hashlib
+import os
+import stat
+
+from hrm_omero import downloadcache
+
+
+def downloaded(tmp_path, name, size):
+    """Create a (downloaded) file of the given size."""
+    path = tmp_path / "downloads" / name
+    path.parent.mkdir(exist_ok=True)
+    path.write_bytes(name.encode()[:1] * size)
+    return str(path)
+
+
+def test_store_and_fetch(tmp_path):
+    """Test adding a file to the cache and materialising it elsewhere.
+
+    Expected behavior is a miss before storing the file and a hit afterwards, creating
+    the missing parent directories of the target.
+    """
+    cache = downloadcache.DownloadCache(str(tmp_path / "cache"))
+    target = tmp_path / "user" / "sub" / "image.tif"
+    sha1 = hashlib.sha1(b"i" * 100).hexdigest()
+    assert not cache.fetch(23, str(target), 100, sha1.upper())
+
+    cache.store(23, downloaded(tmp_path, "image.tif", 100), sha1.upper())
+    assert os.path.exists(cache.entry_path(sha1))
+    assert cache.fetch(42, str(target), 100, sha1)
+    assert target.read_bytes() == b"i" * 100
+
+    # files without a hash are keyed by their ID:
+    cache.store(7, downloaded(tmp_path, "other.tif", 10))
+    assert cache.fetch(7, str(tmp_path / "other.tif"), 10)
+    assert not cache.fetch(8, str(tmp_path / "wrong.tif"), 10)
+
+
+def test_independent_copies(tmp_path):
+    """Test changing the mode and contents of a materialised file.
+
+    Expected behavior is the cache entry not being affected, i.e. no hardlinks.
+    """
+    cache = downloadcache.DownloadCache(str(tmp_path / "cache"))
+    source = downloaded(tmp_path, "image.tif", 100)
+    cache.store(23, source)
+    assert not os.path.samefile(source, cache.entry_path("id-23"))
+
+    target = tmp_path / "user" / "image.tif"
+    assert cache.fetch(23, str(target), 100)
+    assert not os.path.samefile(target, cache.entry_path("id-23"))
+    mode = stat.S_IMODE(os.stat(cache.entry_path("id-23")).st_mode)
+    os.chmod(target, 0o666 if mode != 0o666 else 0o600)
+    target.write_bytes(b"x" * 100)
+    assert stat.S_IMODE(os.stat(cache.entry_path("id-23")).st_mode) == mode
+    assert cache.fetch(23, str(tmp_path / "other" / "image.tif"), 100)
+    assert (tmp_path / "other" / "image.tif").read_bytes() == b"i" * 100
+
+
+def test_wrong_hash(tmp_path):
+    """Test fetching a cached file whose contents have been modified.
+
+    Expected behavior is a miss, removing the cache entry.
+    """
+    cache = downloadcache.DownloadCache(str(tmp_path / "cache"))
+    sha1 = hashlib.sha1(b"i" * 100).hexdigest()
+    cache.store(23, downloaded(tmp_path, "image.tif", 100), sha1)
+    with open(cache.entry_path(sha1), "r+b") as entry:
+        entry.write(b"x")
+
+    assert not cache.fetch(23, str(tmp_path / "user" / "image.tif"), 100, sha1)
+    assert not os.path.exists(cache.entry_path(sha1))
+    assert not os.path.exists(tmp_path / "user" / "image.tif")
+
+
+def test_wrong_size(tmp_path):
+    """Test fetching a cached file having a different size than expected.
+
+    Expected behavior is a miss, removing the cache entry.
+    """
+    cache = downloadcache.DownloadCache(str(tmp_path / "cache"))
+    cache.store(23, downloaded(tmp_path, "image.tif", 100))
+    assert not cache.fetch(23, str(tmp_path / "image.tif"), 99)
+    assert not os.path.exists(cache.entry_path("id-23"))
+
+
+def test_eviction(tmp_path, monkeypatch):
+    """Test exceeding the size limit of the cache.
+
+    Expected behavior is the least recently used entries being evicted, files larger
+    than the limit are not cached at all.
+    """
+    clock = iter(range(100))
+    monkeypatch.setattr(downloadcache.time, "time", lambda: next(clock))
+    cache = downloadcache.DownloadCache(str(tmp_path / "cache"), max_size=250)
+
+    for file_id, name in enumerate(["a.tif", "b.tif", "c.tif"]):
+        cache.store(file_id, downloaded(tmp_path, name, 100))
+    assert not os.path.exists(cache.entry_path("id-0"))
+
+    # using "b" makes "c" the least recently used entry:
+    assert cache.fetch(1, str(tmp_path / "b.tif"), 100)
+    cache.store(3, downloaded(tmp_path, "d.tif", 100))
+    assert [os.path.exists(cache.entry_path(f"id-{i}")) for i in range(4)] == [
+        False,
+        True,
+        False,
+        True,
+    ]
+
+    cache.store(4, downloaded(tmp_path, "e.tif", 300))
+    assert not os.path.exists(cache.entry_path("id-4"))
+
+
+def test_from_config(tmp_path):
+    """Test creating the cache from an HRM configuration.
+
+    Expected behavior is no cache without a configured directory, the default size
+    limit unless a different one is configured.
+    """
+    assert downloadcache.from_config({}) is None
+    path = str(tmp_path / "cache")
+    cache = downloadcache.from_config({"OMERO_CONNECTOR_DOWNLOAD_CACHE": path})
+    assert cache.max_size == downloadcache.DOWNLOAD_CACHE_SIZE
+    config = {
+        "OMERO_CONNECTOR_DOWNLOAD_CACHE": path,
+        "OMERO_CONNECTOR_DOWNLOAD_CACHE_SIZE": "1000",
+    }
+    assert downloadcache.from_config(config).max_size == 1000
@@ -0,0 +1,113 @@
+"""Benchmark of the JSON output modes for large tree listings.
+
+A synthetic listing of 50'000 image nodes (similar to a very large dataset) is written
+by a separate process for each output mode, measuring the number of bytes produced, the
+peak resident memory of the process and the time spent. The "indented" mode is the
+default one (assembling all nodes in a list and serializing them with indentation), the
+"compact" mode is the one used with `--compact`, writing the nodes one by one as they
+are produced by a generator.
+
+Use `pytest -s` to see the measured values.
+"""
+
+import json
+import subprocess
+import sys
+
+import pytest
+
+NODE_COUNT = 50000
+
+CODE = """
+import json, resource, sys, time
+from hrm_omero import formatting, tree
+
+class Sink:
+    def __init__(self):
+        self.bytes = 0
+    def write(self, text):
+        self.bytes += len(text.encode("utf-8"))
+
+def nodes(count):
+    for i in range(count):
+        yield tree.gen_node_dict("Image", i, f"image_{i:06}.tif", "somebody", "G:4:")
+
+mode, count = sys.argv[1], int(sys.argv[2])
+sink = Sink()
+start = time.perf_counter()
+if mode == "indented":
+    sink.write(formatting.tree_to_json(list(nodes(count))) + "\\n")
+else:
+    formatting.write_json_array(nodes(count), sink)
+    sink.write("\\n")
+seconds = time.perf_counter() - start
+maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({"bytes": sink.bytes, "seconds": seconds, "maxrss_kb": maxrss}))
+"""
+
+
+def run_mode(mode, count=NODE_COUNT):
+    """Run the benchmark code for an output mode in a separate process.
+
+    Parameters
+    ----------
+    mode : str
+        Either `indented` or `compact`.
+    count : int, optional
+        The number of nodes to generate, by default `NODE_COUNT`.
+
+    Returns
+    -------
+    dict
+        The measured values (`bytes`, `seconds` and `maxrss_kb`).
+    """
+    proc = subprocess.run(
+        [sys.executable, "-c", CODE, mode, str(count)],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        check=False,
+    )
+    assert proc.returncode == 0, proc.stderr
+    return json.loads(proc.stdout)
+
+
+def test_same_content():
+    """Test both modes produce the same JSON content.
+
+    Expected behavior is that the parsed output is identical.
+    """
+    # pylint: disable-msg=import-outside-toplevel
+    from hrm_omero import formatting, tree
+
+    class Buffer:
+        def __init__(self):
+            self.text = ""
+
+        def write(self, text):
+            self.text += text
+
+    nodes = [tree.gen_node_dict("Image", i, f"img_{i}", "me", "G:4:") for i in range(5)]
+    buffer = Buffer()
+    formatting.write_json_array(iter(nodes), buffer)
+    assert json.loads(buffer.text) == json.loads(formatting.tree_to_json(nodes))
+
+    buffer = Buffer()
+    formatting.write_json_array(iter([]), buffer)
+    assert buffer.text == "[]"
+
+
+@pytest.mark.skipif(sys.platform == "darwin", reason="ru_maxrss is in bytes on macOS")
+def test_benchmark():
+    """Compare bytes, peak memory and time of the indented and compact output.
+
+    Expected behavior is that the compact output is considerably smaller and requires
+    less memory.
+    """
+    indented = run_mode("indented")
+    compact = run_mode("compact")
+    print(f"indented: {indented}")
+    print(f"compact:  {compact}")
+
+    assert compact["bytes"] < indented["bytes"] * 0.7
+    assert compact["maxrss_kb"] < indented["maxrss_kb"]
@@ -0,0 +1,37 @@
+"""Tests for the 'formatting.print_children_json()' function."""
+
+import json
+
+from hrm_omero import formatting, tree
+
+IDS = ["G:4:Dataset:9", "G:4:Dataset:10", "G:4:Project:3", "G:4:Dataset:9"]
+
+
+def children(node_id):
+    """Generate two child nodes for a given ID."""
+    obj_id = int(node_id.split(":")[-1])
+    return [
+        tree.gen_node_dict("Image", obj_id * 10 + i, f"img_{i}", "somebody", "G:4:")
+        for i in range(2)
+    ]
+
+
+def test_stream_matches(monkeypatch, capsys):
+    """Test the streamed (compact) output for several IDs.
+
+    Expected behavior is the same output as the one assembled in memory, i.e. with the
+    IDs in sorted order and without duplicates.
+    """
+    # pylint: disable-msg=unused-argument
+    monkeypatch.setattr(tree, "gen_children", lambda conn, x, *args: children(x))
+    monkeypatch.setattr(tree, "iter_children", lambda conn, x, *a, **k: children(x))
+    monkeypatch.setattr(tree, "expand_nodes", lambda *args: None)
+
+    assert formatting.print_children_json(None, IDS, compact=True)
+    streamed = capsys.readouterr().out
+
+    assert formatting.print_children_json(None, IDS)
+    indented = json.loads(capsys.readouterr().out)
+
+    assert streamed == formatting.tree_to_json(indented, compact=True) + "\n"
+    assert list(json.loads(streamed)) == sorted(set(IDS))
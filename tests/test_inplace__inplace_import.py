@@ -0,0 +1,104 @@
+"""Tests for the 'inplace.InplaceImport' class and its configuration."""
+
+import os
+
+import pytest
+
+from hrm_omero import inplace
+
+
+@pytest.fixture(name="layout")
+def fixture_layout(tmp_path):
+    """Create an HRM result file, a server-side view of it and a managed repository.
+
+    The server-side view is a symlink to the HRM data directory, so both paths refer
+    to the same file (like two mounts of the same storage).
+    """
+    hrm_data = tmp_path / "hrm_data" / "user" / "dst"
+    hrm_data.mkdir(parents=True)
+    result = hrm_data / "result.ics"
+    result.write_bytes(b"deconvolved")
+    (tmp_path / "server").mkdir()
+    os.symlink(tmp_path / "hrm_data", tmp_path / "server" / "hrm")
+    repository = tmp_path / "ManagedRepository"
+    repository.mkdir()
+    paths = [(str(tmp_path / "hrm_data"), str(tmp_path / "server" / "hrm"))]
+    return {"result": str(result), "repository": str(repository), "paths": paths}
+
+
+def test_server_path(layout):
+    """Test mapping HRM paths to the ones used by the OMERO server.
+
+    Expected behavior is the longest matching prefix being replaced, `None` for paths
+    not matching any prefix and the path as-is without a mapping.
+    """
+    settings = inplace.InplaceImport("auto", layout["repository"], layout["paths"])
+    server_prefix = layout["paths"][0][1]
+    expected = f"{server_prefix}/user/dst/result.ics"
+    assert settings.server_path(layout["result"]) == expected
+
+    settings.paths.append((layout["paths"][0][0] + "/user/", "/elsewhere"))
+    assert settings.server_path(layout["result"]) == "/elsewhere/dst/result.ics"
+    assert settings.server_path("/other/result.ics") is None
+
+    settings = inplace.InplaceImport("auto", layout["repository"])
+    assert settings.server_path(layout["result"]) == layout["result"]
+
+
+def test_prepare(layout):
+    """Test the pre-flight check for different transfer modes.
+
+    Expected behavior is `auto` picking a hardlink (everything being on the same file
+    system here), explicit modes being used as-is.
+    """
+    server_path = f"{layout['paths'][0][1]}/user/dst/result.ics"
+    repository, paths = layout["repository"], layout["paths"]
+    for transfer, expected in [("auto", "ln"), ("ln", "ln"), ("cp", "cp")]:
+        settings = inplace.InplaceImport(transfer, repository, paths)
+        assert settings.prepare(layout["result"]) == (expected, server_path)
+
+
+def test_prepare_fails(layout, tmp_path):
+    """Test the pre-flight check for unusable paths or repositories.
+
+    Expected behavior is `None` (meaning the file has to be uploaded) for a server path
+    pointing to a different file, a missing file and a missing repository.
+    """
+    other = tmp_path / "other" / "user" / "dst"
+    other.mkdir(parents=True)
+    (other / "result.ics").write_bytes(b"deconvolved")
+    paths = [(layout["paths"][0][0], str(tmp_path / "other"))]
+    settings = inplace.InplaceImport("auto", layout["repository"], paths)
+    assert settings.prepare(layout["result"]) is None
+
+    settings = inplace.InplaceImport("auto", layout["repository"], layout["paths"])
+    assert settings.prepare(layout["result"] + ".missing") is None
+
+    missing = str(tmp_path / "missing")
+    settings = inplace.InplaceImport("auto", missing, layout["paths"])
+    assert settings.prepare(layout["result"]) is None
+
+
+def test_from_config():
+    """Test creating the settings from an HRM configuration.
+
+    Expected behavior is no settings if in-place import is not configured and a
+    ValueError for invalid settings.
+    """
+    assert inplace.from_config({}) is None
+    config = {
+        "OMERO_CONNECTOR_INPLACE_IMPORT": "ln_s",
+        "OMERO_CONNECTOR_REPOSITORY_ROOT": "/OMERO/ManagedRepository",
+        "OMERO_CONNECTOR_INPLACE_PATHS": "/data/hrm=/mnt/hrm; /scratch = /mnt/scratch",
+    }
+    settings = inplace.from_config(config)
+    assert settings.transfer == "ln_s"
+    assert settings.paths == [("/data/hrm", "/mnt/hrm"), ("/scratch", "/mnt/scratch")]
+
+    for key, value in [
+        ("OMERO_CONNECTOR_INPLACE_IMPORT", "mv"),
+        ("OMERO_CONNECTOR_REPOSITORY_ROOT", ""),
+        ("OMERO_CONNECTOR_INPLACE_PATHS", "/data/hrm"),
+    ]:
+        with pytest.raises(ValueError):
+            inplace.from_config(dict(config, **{key: value}))
@@ -0,0 +1,106 @@
+"""Tests for the 'metrics.update()' function and the metrics recording."""
+
+import os
+import threading
+
+import pytest
+
+from hrm_omero import metrics
+
+
+def make_run(action, status, duration, error=None, transferred=None):
+    """Create a finished `metrics.Run` object with the given values."""
+    run = metrics.Run(action)
+    run.status = status
+    run.error = error
+    run.duration = duration
+    for direction, count in (transferred or {}).items():
+        run.add_bytes(direction, count)
+    return run
+
+
+def test_update(tmp_path):
+    """Test adding several runs to a new metrics file.
+
+    Expected behavior is a world-readable file with the accumulated counters,
+    histogram buckets, transferred bytes and failures.
+    """
+    target = (tmp_path / "hrm_omero.prom").as_posix()
+    metrics.update(target, make_run("OMEROtoHRM", True, 0.3, None, {"download": 100}))
+    metrics.update(target, make_run("OMEROtoHRM", True, 7.0, None, {"download": 50}))
+    metrics.update(target, make_run("OMEROtoHRM", False, 0.05, "RuntimeError"))
+    metrics.update(target, make_run("HRMtoOMERO", False, 1.0))
+
+    with open(target, "r", encoding="utf-8") as infile:
+        lines = infile.read().splitlines()
+
+    assert oct(os.stat(target).st_mode & 0o777) == oct(0o644)
+    assert 'hrm_omero_actions_total{action="OMEROtoHRM",status="success"} 2' in lines
+    assert 'hrm_omero_actions_total{action="OMEROtoHRM",status="failure"} 1' in lines
+    assert (
+        'hrm_omero_action_duration_seconds_bucket{action="OMEROtoHRM",le="0.5"} 2'
+        in lines
+    )
+    assert (
+        'hrm_omero_action_duration_seconds_bucket{action="OMEROtoHRM",le="+Inf"} 3'
+        in lines
+    )
+    assert 'hrm_omero_transferred_bytes_total{direction="download"} 150' in lines
+    assert (
+        'hrm_omero_failures_total{action="OMEROtoHRM",error="RuntimeError"} 1' in lines
+    )
+    assert (
+        'hrm_omero_failures_total{action="HRMtoOMERO",error="ActionFailed"} 1' in lines
+    )
+
+
+def test_concurrent_updates(tmp_path):
+    """Test updating the metrics file from several threads at the same time.
+
+    Expected behavior is that no update is lost.
+    """
+    target = (tmp_path / "hrm_omero.prom").as_posix()
+    threads = [
+        threading.Thread(
+            target=metrics.update, args=(target, make_run("batch", True, 0.1))
+        )
+        for _ in range(20)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    with open(target, "r", encoding="utf-8") as infile:
+        content = infile.read()
+    assert 'hrm_omero_actions_total{action="batch",status="success"} 20' in content
+
+
+def test_recording(tmp_path):
+    """Test recording a run that raises an exception.
+
+    Expected behavior is the exception being passed on and the failure being recorded
+    with the exception's class name.
+    """
+    target = (tmp_path / "hrm_omero.prom").as_posix()
+    with pytest.raises(KeyError):
+        with metrics.recording("retrieveChildren"):
+            metrics.configure(target)
+            metrics.add_bytes("download", 23)
+            raise KeyError("boom")
+
+    with open(target, "r", encoding="utf-8") as infile:
+        content = infile.read()
+    assert 'action="retrieveChildren",error="KeyError"} 1' in content
+    assert 'hrm_omero_transferred_bytes_total{direction="download"} 23' in content
+
+
+def test_not_configured(tmp_path):
+    """Test recording a run without configuring a metrics file.
+
+    Expected behavior is that no files are created.
+    """
+    with metrics.recording("checkCredentials") as run:
+        run.status = True
+
+    assert not os.listdir(tmp_path)
@@ -0,0 +1,75 @@
+"""Tests for the 'misc.materialise()' function."""
+
+import os
+
+import pytest
+
+from hrm_omero import misc
+
+
+def test_link(tmp_path):
+    """Test materialising a file on the same file system as a hardlink.
+
+    Expected behavior is a hardlink sharing the inode with the source.
+    """
+    source = tmp_path / "source.txt"
+    source.write_text("content", encoding="utf-8")
+    target = tmp_path / "target.txt"
+
+    assert misc.materialise(str(source), str(target), ["link"]) == "link"
+    assert os.path.samefile(source, target)
+
+
+def test_fallback(tmp_path, monkeypatch):
+    """Test materialising a file when only copying it is possible.
+
+    Expected behavior is an independent copy of the file.
+    """
+
+    def fail(*args):
+        raise OSError(18, "Invalid cross-device link")
+
+    monkeypatch.setattr(os, "link", fail)
+    monkeypatch.setattr(misc, "_reflink", fail)
+    monkeypatch.setattr(misc, "_copy_file_range", fail)
+    source = tmp_path / "source.txt"
+    source.write_text("content", encoding="utf-8")
+    target = tmp_path / "target.txt"
+
+    assert misc.materialise(str(source), str(target)) == "copy"
+    assert target.read_text(encoding="utf-8") == "content"
+    assert not os.path.samefile(source, target)
+
+
+@pytest.mark.skipif(not hasattr(os, "copy_file_range"), reason="requires Python 3.8")
+def test_copy_file_range(tmp_path):
+    """Test materialising a file using `os.copy_file_range()`.
+
+    Expected behavior is an independent copy of the file.
+    """
+    source = tmp_path / "source.txt"
+    source.write_bytes(b"content" * 1000)
+    target = tmp_path / "target.txt"
+
+    method = misc.materialise(str(source), str(target), ["copy_file_range"])
+    assert method == "copy_file_range"
+    assert target.read_bytes() == b"content" * 1000
+    assert not os.path.samefile(source, target)
+
+
+def test_failure(tmp_path):
+    """Test materialising a missing file or to an existing target.
+
+    Expected behavior is an OSError (resp. a FileExistsError), leaving no target.
+    """
+    source = tmp_path / "source.txt"
+    target = tmp_path / "target.txt"
+    with pytest.raises(OSError):
+        misc.materialise(str(source), str(target))
+    assert not target.exists()
+
+    source.write_text("content", encoding="utf-8")
+    target.write_text("existing", encoding="utf-8")
+    with pytest.raises(FileExistsError):
+        misc.materialise(str(source), str(target), ["copy"])
+    assert target.read_text(encoding="utf-8") == "existing"
@@ -0,0 +1,113 @@
+"""Tests for the 'omero.ConnectionPool' class."""
+
+import threading
+import time
+
+import pytest
+
+from hrm_omero import omero as _omero
+
+
+class FakeServiceOpts:
+    """Minimal stand-in for the `SERVICE_OPTS` of a `BlitzGateway`."""
+
+    def __init__(self):
+        self.group = None
+        self.calls = 0
+
+    def getOmeroGroup(self):  # pylint: disable-msg=invalid-name
+        return self.group
+
+    def setOmeroGroup(self, group):  # pylint: disable-msg=invalid-name
+        self.calls += 1
+        self.group = str(group)
+
+
+class FakeWorker:
+    """Minimal stand-in for a `BlitzGateway` that joined an existing session."""
+
+    def __init__(self):
+        self.SERVICE_OPTS = FakeServiceOpts()  # pylint: disable-msg=invalid-name
+        self.alive = True
+        self.closed_hard = None
+
+    def keepAlive(self):  # pylint: disable-msg=invalid-name
+        return self.alive
+
+    def close(self, hard=True):
+        self.closed_hard = hard
+
+
+@pytest.fixture
+def joined(monkeypatch):
+    """Replace `omero.join_session()` by a function creating fake workers."""
+    workers = []
+
+    def _join_session(conn):
+        assert conn == "main-connection"
+        worker = FakeWorker()
+        workers.append(worker)
+        return worker
+
+    monkeypatch.setattr(_omero, "join_session", _join_session)
+    return workers
+
+
+def test_reuse_and_close(joined):
+    """Test that idle workers are re-used and closed without killing the session."""
+    with _omero.ConnectionPool("main-connection", 2) as pool:
+        with pool.connection() as first:
+            assert first.hrm_omero_pool is pool
+        with pool.connection() as second:
+            assert second is first
+
+    assert len(joined) == 1
+    assert joined[0].closed_hard is False
+
+
+def test_size_limit(joined):
+    """Test that no more workers than the pool size are created under contention."""
+    pool = _omero.ConnectionPool("main-connection", 3)
+
+    def _use():
+        with pool.connection():
+            time.sleep(0.05)
+
+    threads = [threading.Thread(target=_use) for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    pool.close()
+
+    assert 1 <= len(joined) <= 3
+
+
+def test_group_per_worker(joined):
+    """Test that the group is set on the call context only when it changes."""
+    with _omero.ConnectionPool("main-connection", 1) as pool:
+        with pool.connection(group=7) as worker:
+            assert worker.SERVICE_OPTS.getOmeroGroup() == "7"
+        with pool.connection(group="7") as worker:
+            pass
+        assert worker.SERVICE_OPTS.calls == 1
+        with pool.connection(group=-1) as worker:
+            assert worker.SERVICE_OPTS.getOmeroGroup() == "-1"
+
+
+def test_dead_worker_replaced(joined):
+    """Test that a worker that is not alive any more gets replaced."""
+    with _omero.ConnectionPool("main-connection", 1) as pool:
+        with pool.connection() as first:
+            first.alive = False
+        with pool.connection() as second:
+            assert second is not first
+
+    assert first.closed_hard is False
+    assert len(joined) == 2
+
+
+def test_invalid_size():
+    """Test creating a pool with an invalid size."""
+    with pytest.raises(ValueError):
+        _omero.ConnectionPool("main-connection", 0)
@@ -0,0 +1,85 @@
+"""Tests for the 'profiling.recording()' function and the `--profile` option."""
+
+import json
+import pstats
+
+import pytest
+
+from hrm_omero import cli
+from hrm_omero import profiling
+
+
+def test_inactive():
+    """Test using phases without an active profiler.
+
+    Expected behavior is that nothing is recorded and no error is raised.
+    """
+    with profiling.recording() as profiler:
+        assert profiler is None
+        with profiling.phase("something"):
+            pass
+
+
+def test_nested_phases(tmp_path):
+    """Test recording nested phases into a report file.
+
+    Expected behavior is to find both phases in the report (the inner one having the
+    outer one as its parent) and the totals.
+    """
+    target = tmp_path / "report.json"
+    with profiling.recording(target.as_posix()):
+        with profiling.phase("outer"):
+            with profiling.phase("inner"):
+                sum(range(1000))
+
+    report = json.loads(target.read_text())
+    phases = {x["phase"]: x for x in report["phases"]}
+    assert phases["inner"]["parent"] == "outer"
+    assert "parent" not in phases["outer"]
+    assert phases["outer"]["wall"] >= phases["inner"]["wall"]
+    assert report["total"]["wall"] >= phases["outer"]["wall"]
+
+
+def test_report_to_stderr(capsys):
+    """Test writing the report to stderr.
+
+    Expected behavior is a single JSON line on stderr and no output on stdout.
+    """
+    with profiling.recording("-"):
+        with profiling.phase("something"):
+            pass
+
+    captured = capsys.readouterr()
+    assert captured.out == ""
+    report = json.loads(captured.err.strip().splitlines()[-1])
+    assert report["phases"][0]["phase"] == "something"
+
+
+def test_run_task_profile(monkeypatch, cli_args, tmp_path):
+    """Test run_task() with the `--profile` and `--profile-dump` options.
+
+    Expected behavior is a report containing the config parsing phase and a cProfile
+    dump that can be loaded by `pstats`.
+    """
+    monkeypatch.setenv("OMERO_PASSWORD", "non_empty_dummy_password_string")
+    target = tmp_path / "report.json"
+    dump = tmp_path / "cprofile.out"
+
+    args = cli_args("checkCredentials", dry_run=True)
+    args = ["--profile", target.as_posix(), "--profile-dump", dump.as_posix()] + args
+    assert cli.run_task(args) is True
+
+    report = json.loads(target.read_text())
+    assert report["phases"][0]["phase"] == "parse_config"
+    assert pstats.Stats(dump.as_posix()).total_calls > 0
+
+
+def test_profile_without_file(capsys):
+    """Test run_task() with the `--profile` option being followed by the action.
+
+    Expected behavior is to print an error message and raise a SystemExit.
+    """
+    with pytest.raises(SystemExit):
+        cli.run_task(["--profile", "checkCredentials", "--user", "pytest"])
+    captured = capsys.readouterr()
+    assert "got action 'checkCredentials'" in captured.err
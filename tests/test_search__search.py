@@ -0,0 +1,48 @@
+"""Tests for the helper functions of the 'search' module."""
+
+from hrm_omero import search
+
+
+def test_like_pattern():
+    """Test creating the patterns for prefix and substring searches.
+
+    Expected behavior is a lower-case pattern having the wildcards escaped.
+    """
+    assert search.like_pattern("Cells") == "%cells%"
+    assert search.like_pattern("Cells", prefix=True) == "cells%"
+    assert search.like_pattern("100%_done!") == "%100!%!_done!!%"
+
+
+def test_gen_hit():
+    """Test creating hits from query results.
+
+    Expected behavior is the path leading to the object in the tree, being empty for
+    images that are not contained in a dataset.
+    """
+    hit = search.gen_hit("Image", [42, "cells.tif", 4, "someone", 9, 12, 23])
+    assert hit == {
+        "class": "Image",
+        "id": "G:4:Image:42",
+        "label": "cells.tif",
+        "owner": "someone",
+        "path": [
+            "G:4:ExperimenterGroup:4",
+            "G:4:Experimenter:9",
+            "G:4:Project:12",
+            "G:4:Dataset:23",
+        ],
+    }
+
+    hit = search.gen_hit("Image", [42, "cells.tif", 4, "someone", 9, None, 23])
+    assert hit["path"] == [
+        "G:4:ExperimenterGroup:4",
+        "G:4:Experimenter:9",
+        "G:4:Dataset:23",
+    ]
+
+    hit = search.gen_hit("Image", [42, "cells.tif", 4, "someone", None, None, None])
+    assert hit["path"] == []
+
+    hit = search.gen_hit("Project", [12, "cells", 4, "someone", 9])
+    assert hit["id"] == "G:4:Project:12"
+    assert hit["path"] == ["G:4:ExperimenterGroup:4", "G:4:Experimenter:9"]
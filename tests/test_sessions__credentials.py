@@ -0,0 +1,78 @@
+"""Tests for the credentials cache functions of the 'sessions' submodule."""
+
+import time
+
+from hrm_omero import sessions
+
+HOST = "omero.example.xy"
+PORT = 4064
+
+
+def test_unknown_user(tmp_path):
+    """Test a lookup for a user without any cache entry.
+
+    Expected behavior is to return None (meaning the server needs to be asked).
+    """
+    assert sessions.lookup_credentials(tmp_path, HOST, PORT, "pytest", "pw") is None
+
+
+def test_valid_credentials(tmp_path, capsys):
+    """Test a lookup after a successful check, with the right and a wrong password."""
+    sessions.record_credentials(tmp_path, HOST, PORT, "pytest", "secret", True)
+    assert sessions.lookup_credentials(tmp_path, HOST, PORT, "pytest", "secret") is True
+    assert "verified (cached)" in capsys.readouterr().out
+    assert sessions.lookup_credentials(tmp_path, HOST, PORT, "pytest", "wrong") is None
+
+
+def test_expired_credentials(tmp_path):
+    """Test a lookup after the cached check has expired.
+
+    Expected behavior is to return None (meaning the server needs to be asked).
+    """
+    sessions.record_credentials(tmp_path, HOST, PORT, "pytest", "secret", True, ttl=-1)
+    assert sessions.lookup_credentials(tmp_path, HOST, PORT, "pytest", "secret") is None
+
+
+def test_failure_backoff(tmp_path, capsys):
+    """Test the back-off after repeated failures and the reset after a success."""
+    # a single failure doesn't throttle yet:
+    sessions.record_credentials(tmp_path, HOST, PORT, "pytest", "wrong", False)
+    assert sessions.lookup_credentials(tmp_path, HOST, PORT, "pytest", "pw") is None
+
+    # the second one does, but only for the same password:
+    sessions.record_credentials(tmp_path, HOST, PORT, "pytest", "wrong", False)
+    assert sessions.lookup_credentials(tmp_path, HOST, PORT, "pytest", "wrong") is False
+    assert "too many failed attempts" in capsys.readouterr().out
+    assert sessions.lookup_credentials(tmp_path, HOST, PORT, "pytest", "pw") is None
+
+    path = sessions.cache_file(tmp_path, HOST, PORT, "pytest")
+    entry = sessions.read_private(path)
+    assert entry["failures"] == 2
+    assert entry["retry_after"] - time.time() <= sessions.BACKOFF_BASE
+
+    # a successful check resets the failure count:
+    sessions.record_credentials(tmp_path, HOST, PORT, "pytest", "pw", True)
+    assert sessions.read_private(path)["failures"] == 0
+    assert sessions.lookup_credentials(tmp_path, HOST, PORT, "pytest", "pw") is True
+
+
+def test_backoff_is_capped(tmp_path):
+    """Test the back-off delay doesn't grow beyond `BACKOFF_MAX`."""
+    for _ in range(20):
+        sessions.record_credentials(tmp_path, HOST, PORT, "pytest", "wrong", False)
+    entry = sessions.read_private(sessions.cache_file(tmp_path, HOST, PORT, "pytest"))
+    assert entry["retry_after"] - time.time() <= sessions.BACKOFF_MAX
+
+
+def test_backoff_per_password(tmp_path):
+    """Test a failure with a different password than the previous failures.
+
+    Expected behavior is the failure count starting over for the new password.
+    """
+    for _ in range(5):
+        sessions.record_credentials(tmp_path, HOST, PORT, "pytest", "wrong", False)
+    sessions.record_credentials(tmp_path, HOST, PORT, "pytest", "other", False)
+    entry = sessions.read_private(sessions.cache_file(tmp_path, HOST, PORT, "pytest"))
+    assert entry["failures"] == 1
+    assert sessions.lookup_credentials(tmp_path, HOST, PORT, "pytest", "wrong") is None
+    assert sessions.lookup_credentials(tmp_path, HOST, PORT, "pytest", "other") is None
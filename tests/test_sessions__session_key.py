@@ -0,0 +1,60 @@
+"""Tests for the session key cache functions of the 'sessions' submodule."""
+
+import stat
+
+from hrm_omero import sessions
+
+HOST = "omero.example.xy"
+PORT = 4064
+
+
+def test_store_and_load(tmp_path):
+    """Test storing a session key and loading it again with the same password."""
+    cache_dir = tmp_path / "sessions"
+    sessions.store_session_key(cache_dir, HOST, PORT, "pytest", "secret", "abc-123")
+
+    cache_file = sessions.cache_file(cache_dir, HOST, PORT, "pytest")
+    assert stat.S_IMODE(cache_file.stat().st_mode) == 0o600
+    assert stat.S_IMODE(cache_dir.stat().st_mode) == 0o700
+    assert "secret" not in cache_file.read_text()
+
+    key = sessions.load_session_key(cache_dir, HOST, PORT, "pytest", "secret")
+    assert key == "abc-123"
+
+
+def test_load_wrong_password(tmp_path):
+    """Test loading a cached session key using a different password.
+
+    Expected behavior is to return None.
+    """
+    sessions.store_session_key(tmp_path, HOST, PORT, "pytest", "secret", "abc-123")
+    assert sessions.load_session_key(tmp_path, HOST, PORT, "pytest", "wrong") is None
+
+
+def test_load_other_user_or_server(tmp_path):
+    """Test that cache entries are separated by user, host and port."""
+    sessions.store_session_key(tmp_path, HOST, PORT, "pytest", "secret", "abc-123")
+    other_user = sessions.load_session_key(tmp_path, HOST, PORT, "other", "secret")
+    assert other_user is None
+    other_host = sessions.load_session_key(tmp_path, "other", PORT, "pytest", "secret")
+    assert other_host is None
+    assert sessions.load_session_key(tmp_path, HOST, 4063, "pytest", "secret") is None
+
+
+def test_load_insecure_permissions(tmp_path, caplog):
+    """Test loading a cache file that is readable by other users.
+
+    Expected behavior is to ignore the file and log a warning.
+    """
+    sessions.store_session_key(tmp_path, HOST, PORT, "pytest", "secret", "abc-123")
+    sessions.cache_file(tmp_path, HOST, PORT, "pytest").chmod(0o644)
+    assert sessions.load_session_key(tmp_path, HOST, PORT, "pytest", "secret") is None
+    assert "accessible by other users" in caplog.text
+
+
+def test_drop(tmp_path):
+    """Test removing a cached session key, including a non-existing one."""
+    sessions.store_session_key(tmp_path, HOST, PORT, "pytest", "secret", "abc-123")
+    sessions.drop_session_key(tmp_path, HOST, PORT, "pytest")
+    assert sessions.load_session_key(tmp_path, HOST, PORT, "pytest", "secret") is None
+    sessions.drop_session_key(tmp_path, HOST, PORT, "pytest")
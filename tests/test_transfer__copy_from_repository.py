@@ -0,0 +1,47 @@
+"""Tests for the 'transfer.copy_from_repository()' function."""
+
+import hashlib
+import os
+
+from hrm_omero import transfer
+
+DATA = b"original file contents"
+
+SHA1 = hashlib.sha1(DATA).hexdigest()
+
+
+def repository_file(tmp_path):
+    """Create a file in a fake managed repository, returning its path."""
+    source = tmp_path / "ManagedRepository" / "user_2" / "2022-02" / "image.tif"
+    source.parent.mkdir(parents=True)
+    source.write_bytes(DATA)
+    return str(source)
+
+
+def test_identical(tmp_path):
+    """Test materialising a file matching the original file in OMERO.
+
+    Expected behavior is an independent file (no hardlink) with the same contents.
+    """
+    source = repository_file(tmp_path)
+    target = tmp_path / "dest" / "sub" / "image.tif"
+
+    assert transfer.copy_from_repository(source, str(target), len(DATA), SHA1)
+    assert target.read_bytes() == DATA
+    assert not os.path.samefile(source, target)
+
+
+def test_not_usable(tmp_path):
+    """Test files that must not be taken from the repository.
+
+    Expected behavior is False for a mismatching hash, an unknown hash and a missing
+    file, without creating the target.
+    """
+    source = repository_file(tmp_path)
+    target = tmp_path / "image.tif"
+
+    assert not transfer.copy_from_repository(source, str(target), len(DATA), "0" * 40)
+    assert not transfer.copy_from_repository(source, str(target), len(DATA), None)
+    missing = str(tmp_path / "missing.tif")
+    assert not transfer.copy_from_repository(missing, str(target), len(DATA), SHA1)
+    assert not target.exists()
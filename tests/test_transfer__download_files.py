@@ -0,0 +1,120 @@
+"""Tests for the 'transfer.download_files()' function."""
+
+import contextlib
+import threading
+
+from hrm_omero import transfer
+
+
+class FakePool:
+
+    """Stand-in for `omero.ConnectionPool` handing out the connection it was given."""
+
+    def __init__(self, conn, size):
+        self.conn = conn
+        self.size = size
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+    @contextlib.contextmanager
+    def connection(self, group=None):
+        assert group == -1
+        yield self.conn
+
+
+def fake_download(fail=None):
+    """Create a stand-in for `transfer.download_original_file()`.
+
+    Parameters
+    ----------
+    fail : int, optional
+        The ID of a file whose download should fail (after creating the file).
+
+    Returns
+    -------
+    (callable, list)
+        The function and the list of the IDs it has been called with (in order).
+    """
+    calls = []
+    lock = threading.Lock()
+
+    # pylint: disable-msg=unused-argument
+    def download(conn, file_id, target, chunk_size, sha1):
+        with lock:
+            calls.append(file_id)
+        with open(target, "w", encoding="utf-8") as outfile:
+            outfile.write(str(file_id))
+        if file_id == fail:
+            raise IOError("connection lost")
+        return 1, f"sha1-{file_id}"
+
+    return download, calls
+
+
+def downloads(tmp_path):
+    """Assemble a list of downloads (ID, target, size, hash) in a nested directory."""
+    return [
+        (1, (tmp_path / "a" / "small.txt").as_posix(), 10, None),
+        (2, (tmp_path / "a" / "b" / "large.txt").as_posix(), 1000, None),
+        (3, (tmp_path / "medium.txt").as_posix(), 100, None),
+    ]
+
+
+def test_sequential(tmp_path, monkeypatch):
+    """Test downloading files one after another.
+
+    Expected behavior is all files being downloaded, starting with the largest one,
+    returning the hash of each of them.
+    """
+    download, calls = fake_download()
+    monkeypatch.setattr(transfer, "download_original_file", download)
+
+    hashes = transfer.download_files(None, downloads(tmp_path))
+    assert calls == [2, 3, 1]
+    for file_id, target, _, _ in downloads(tmp_path):
+        with open(target, encoding="utf-8") as infile:
+            assert infile.read() == str(file_id)
+        assert hashes[target] == f"sha1-{file_id}"
+
+
+def test_parallel(tmp_path, monkeypatch):
+    """Test downloading files using several jobs.
+
+    Expected behavior is all files being downloaded using a pool having (at most) one
+    connection per file, returning the hash of each of them.
+    """
+    download, calls = fake_download()
+    pools = []
+
+    def pool_factory(conn, size):
+        pools.append(FakePool(conn, size))
+        return pools[-1]
+
+    monkeypatch.setattr(transfer, "download_original_file", download)
+    monkeypatch.setattr(transfer, "ConnectionPool", pool_factory)
+
+    hashes = transfer.download_files("conn", downloads(tmp_path), jobs=8)
+    assert sorted(hashes.values()) == ["sha1-1", "sha1-2", "sha1-3"]
+    assert sorted(calls) == [1, 2, 3]
+    assert [pool.size for pool in pools] == [3]
+
+
+def test_failure(tmp_path, monkeypatch):
+    """Test a download failing, both sequentially and in parallel.
+
+    Expected behavior is to report a failure and not leave any complete files behind,
+    but to keep the ones already downloaded as partial files marked as complete.
+    """
+    monkeypatch.setattr(transfer, "ConnectionPool", FakePool)
+    for jobs in [1, 2]:
+        download, _ = fake_download(fail=3)
+        monkeypatch.setattr(transfer, "download_original_file", download)
+
+        assert transfer.download_files(None, downloads(tmp_path), jobs) is None
+        assert not list(tmp_path.glob("**/*.txt"))
+        large = (tmp_path / "a" / "b" / "large.txt").as_posix()
+        assert transfer.read_progress(large) == {"file_id": 2, "size": 1, "offset": 1}
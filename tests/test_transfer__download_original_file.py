@@ -0,0 +1,127 @@
+"""Tests for the 'transfer.download_original_file()' function."""
+
+import hashlib
+from types import SimpleNamespace
+
+import pytest
+
+from hrm_omero import transfer
+
+DATA = bytes(range(256)) * 40
+
+SHA1 = hashlib.sha1(DATA).hexdigest()
+
+
+class FakeStore:
+
+    """Stand-in for OMERO's raw file store, optionally failing at a given offset."""
+
+    def __init__(self, data, fail_at=None):
+        self.data = data
+        self.fail_at = fail_at
+        self.reads = []
+        self.closed = False
+
+    def setFileId(self, file_id, ctx):  # pylint: disable-msg=invalid-name
+        assert file_id == 42
+        assert ctx == "ctx"
+
+    def size(self, ctx):  # pylint: disable-msg=unused-argument
+        return len(self.data)
+
+    def read(self, offset, length):
+        if self.fail_at is not None and offset >= self.fail_at:
+            raise IOError("connection lost")
+        self.reads.append((offset, length))
+        return self.data[offset : offset + length]
+
+    def close(self):
+        self.closed = True
+
+
+def fake_conn(store):
+    """Create a minimal stand-in for a BlitzGateway providing the given store."""
+    session = SimpleNamespace(createRawFileStore=lambda: store)
+    return SimpleNamespace(c=SimpleNamespace(sf=session), SERVICE_OPTS="ctx")
+
+
+def test_download(tmp_path):
+    """Test downloading a file in chunks.
+
+    Expected behavior is the complete file without any partial or progress files and
+    its hash (matching the expected one).
+    """
+    target = tmp_path / "image.tif"
+    store = FakeStore(DATA)
+    transferred, digest = transfer.download_original_file(
+        fake_conn(store), 42, str(target), 4096, SHA1.upper()
+    )
+
+    assert transferred == len(DATA)
+    assert digest == SHA1
+    assert target.read_bytes() == DATA
+    assert store.reads == [(0, 4096), (4096, 4096), (8192, 2048)]
+    assert store.closed
+    assert sorted(x.name for x in tmp_path.iterdir()) == ["image.tif"]
+
+
+def test_resume(tmp_path):
+    """Test resuming an interrupted download.
+
+    Expected behavior is to keep the partial file and its progress after the failure,
+    and to only request the missing chunks when resuming. Data beyond the recorded
+    offset is discarded, the hash still covers the complete file.
+    """
+    target = tmp_path / "image.tif"
+    with pytest.raises(IOError):
+        transfer.download_original_file(
+            fake_conn(FakeStore(DATA, fail_at=8192)), 42, str(target), 4096
+        )
+    assert not target.exists()
+    assert transfer.read_progress(str(target)) == {
+        "file_id": 42,
+        "size": len(DATA),
+        "offset": 8192,
+    }
+
+    # simulate garbage written after the last recorded offset:
+    with open(f"{target}.part", "ab") as partial:
+        partial.write(b"garbage")
+
+    store = FakeStore(DATA)
+    transferred, digest = transfer.download_original_file(
+        fake_conn(store), 42, str(target), 4096, SHA1
+    )
+    assert transferred == len(DATA) - 8192
+    assert digest == SHA1
+    assert store.reads == [(8192, 2048)]
+    assert target.read_bytes() == DATA
+    assert sorted(x.name for x in tmp_path.iterdir()) == ["image.tif"]
+
+
+def test_mismatching_progress(tmp_path):
+    """Test a progress file recorded for a different file.
+
+    Expected behavior is to start the download from scratch.
+    """
+    target = tmp_path / "image.tif"
+    (tmp_path / "image.tif.part").write_bytes(b"x" * 100)
+    transfer.write_progress(str(target), {"file_id": 23, "size": 100, "offset": 100})
+
+    store = FakeStore(DATA)
+    transfer.download_original_file(fake_conn(store), 42, str(target), 8192)
+    assert store.reads == [(0, 8192), (8192, 2048)]
+    assert target.read_bytes() == DATA
+
+
+def test_hash_mismatch(tmp_path):
+    """Test downloading a file not matching the expected hash.
+
+    Expected behavior is an IOError, leaving neither the file nor a partial one.
+    """
+    target = tmp_path / "image.tif"
+    with pytest.raises(IOError, match="SHA1 mismatch"):
+        transfer.download_original_file(
+            fake_conn(FakeStore(DATA)), 42, str(target), 4096, "0" * 40
+        )
+    assert not list(tmp_path.iterdir())
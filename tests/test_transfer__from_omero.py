@@ -0,0 +1,205 @@
+"""Tests for the 'transfer.from_omero()' function (not requiring an OMERO server)."""
+
+import hashlib
+import os
+from types import SimpleNamespace
+
+from hrm_omero import transfer
+from hrm_omero.misc import OmeroId
+
+IMAGES = {
+    1: (10, "Series 1"),
+    2: (10, "Series 2"),
+    3: (20, "other"),
+    4: (10, "user_2/sample.lif [Series 4]"),
+    5: (30, "no originals"),
+}
+
+FILESETS = {
+    10: [(100, "user_2/2022-02/17/sample.lif", 5, None)],
+    20: [
+        (200, "user_2/2022-03/01/ics/image.ics", 3, None),
+        (201, "user_2/2022-03/01/ids/image.ids", 7, None),
+    ],
+}
+
+
+def fake_conn():
+    """Create a minimal stand-in for a BlitzGateway providing a call context."""
+    return SimpleNamespace(SERVICE_OPTS=SimpleNamespace(setOmeroGroup=lambda x: None))
+
+
+def setup_fakes(monkeypatch):
+    """Replace querying OMERO, downloading files and fetching thumbnails.
+
+    Returns
+    -------
+    (list, list)
+        The lists of downloaded file IDs (one list per call) and of the thumbnails
+        (image ID and name) fetched.
+    """
+    downloads = []
+    thumbnails = []
+
+    # pylint: disable-msg=unused-argument
+    def download_files(conn, files, jobs, chunk_size):
+        downloads.append([x[0] for x in files])
+        for _, target, size, _ in files:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, "wb") as outfile:
+                outfile.write(b"x" * size)
+        return {}
+
+    # pylint: disable-msg=unused-argument
+    def fetch_thumbnail(conn, omero_id, dest):
+        thumbnails.append((omero_id.obj_id, dest))
+
+    # pylint: disable-msg=unused-argument
+    def query_filesets(conn, image_ids):
+        images = {x: IMAGES[x] for x in image_ids if x in IMAGES}
+        filesets = {x[0]: FILESETS[x[0]] for x in images.values() if x[0] in FILESETS}
+        return images, filesets
+
+    monkeypatch.setattr(transfer, "query_filesets", query_filesets)
+    monkeypatch.setattr(transfer, "download_files", download_files)
+    monkeypatch.setattr(transfer, "fetch_thumbnail", fetch_thumbnail)
+    return downloads, thumbnails
+
+
+def test_multiple_images(tmp_path, monkeypatch):
+    """Test downloading several images, two of them sharing a fileset.
+
+    Expected behavior is every fileset being downloaded once and a thumbnail for each
+    image, having the image name appended for the ones sharing a fileset.
+    """
+    downloads, thumbnails = setup_fakes(monkeypatch)
+    ids = [OmeroId(f"G:4:Image:{x}") for x in [1, 2, 3]]
+
+    assert transfer.from_omero.__wrapped__(fake_conn(), ids, str(tmp_path)) is True
+    assert downloads == [[100], [200, 201]]
+    assert (tmp_path / "sample.lif").exists()
+    assert (tmp_path / "ics" / "image.ics").exists()
+    assert thumbnails == [
+        ("1", f"{tmp_path}/sample.lif (Series 1)"),
+        ("2", f"{tmp_path}/sample.lif (Series 2)"),
+        ("3", f"{tmp_path}/ics/image.ics"),
+    ]
+
+
+def test_single_image(tmp_path, monkeypatch):
+    """Test downloading a single image of a multi-image fileset.
+
+    Expected behavior is the thumbnail being named after the first file only.
+    """
+    downloads, thumbnails = setup_fakes(monkeypatch)
+
+    ret = transfer.from_omero.__wrapped__(fake_conn(), OmeroId("G:4:Image:2"), tmp_path)
+    assert ret is True
+    assert downloads == [[100]]
+    assert thumbnails == [("2", f"{tmp_path}/sample.lif")]
+
+
+def test_missing_image(tmp_path, monkeypatch, capsys):
+    """Test requesting a list of images containing a non-existing one.
+
+    Expected behavior is to return False without downloading anything.
+    """
+    downloads, _ = setup_fakes(monkeypatch)
+    ids = [OmeroId(f"G:4:Image:{x}") for x in [1, 99]]
+
+    assert transfer.from_omero.__wrapped__(fake_conn(), ids, str(tmp_path)) is False
+    assert "can't find image with ID [99]" in capsys.readouterr().out
+    assert not downloads
+
+
+def test_repository(tmp_path, monkeypatch):
+    """Test downloading images with a managed repository on the local file system.
+
+    Expected behavior is the files being taken from the repository if their hash
+    matches, only the others being downloaded.
+    """
+    downloads, _ = setup_fakes(monkeypatch)
+    repository = tmp_path / "ManagedRepository"
+    for _, path, size, _ in FILESETS[20]:
+        (repository / path).parent.mkdir(parents=True, exist_ok=True)
+        (repository / path).write_bytes(b"r" * size)
+    filesets = {
+        20: [
+            (200, FILESETS[20][0][1], 3, hashlib.sha1(b"r" * 3).hexdigest()),
+            (201, FILESETS[20][1][1], 7, "0" * 40),
+        ]
+    }
+    monkeypatch.setattr(
+        transfer, "query_filesets", lambda conn, ids: ({3: (20, "other")}, filesets)
+    )
+
+    dest = tmp_path / "dest"
+    dest.mkdir()
+    ret = transfer.from_omero.__wrapped__(
+        fake_conn(), OmeroId("G:4:Image:3"), str(dest), repository_root=str(repository)
+    )
+    assert ret is True
+    assert downloads == [[201]]
+    assert (dest / "ics" / "image.ics").read_bytes() == b"r" * 3
+    assert (dest / "ids" / "image.ids").read_bytes() == b"x" * 7
+
+
+def test_failed_download(tmp_path, monkeypatch):
+    """Test a download failing for a fileset partly taken from the repository.
+
+    Expected behavior is to return False, the file taken from the repository being
+    removed again and no manifest being written.
+    """
+    setup_fakes(monkeypatch)
+    monkeypatch.setattr(transfer, "download_files", lambda *args: None)
+    repository = tmp_path / "ManagedRepository"
+    path = FILESETS[20][0][1]
+    (repository / path).parent.mkdir(parents=True)
+    (repository / path).write_bytes(b"r" * 3)
+    filesets = {
+        20: [
+            (200, path, 3, hashlib.sha1(b"r" * 3).hexdigest()),
+            (201, FILESETS[20][1][1], 7, "0" * 40),
+        ]
+    }
+    monkeypatch.setattr(
+        transfer, "query_filesets", lambda conn, ids: ({3: (20, "other")}, filesets)
+    )
+
+    dest = tmp_path / "dest"
+    dest.mkdir()
+    ret = transfer.from_omero.__wrapped__(
+        fake_conn(), OmeroId("G:4:Image:3"), str(dest), repository_root=str(repository)
+    )
+    assert ret is False
+    assert not (dest / "ics" / "image.ics").exists()
+    assert not (dest / transfer.MANIFEST_NAME).exists()
+    assert (repository / path).exists()
+
+
+def test_image_name_with_path(tmp_path, monkeypatch):
+    """Test downloading several images of a fileset, one name containing a path.
+
+    Expected behavior is the path separators being replaced in the thumbnail name.
+    """
+    _, thumbnails = setup_fakes(monkeypatch)
+    ids = [OmeroId(f"G:4:Image:{x}") for x in [1, 4]]
+
+    assert transfer.from_omero.__wrapped__(fake_conn(), ids, str(tmp_path)) is True
+    assert thumbnails == [
+        ("1", f"{tmp_path}/sample.lif (Series 1)"),
+        ("4", f"{tmp_path}/sample.lif (user_2_sample.lif [Series 4])"),
+    ]
+
+
+def test_no_original_files(tmp_path, monkeypatch, capsys):
+    """Test requesting an image whose fileset has no original files.
+
+    Expected behavior is to return False without downloading anything.
+    """
+    downloads, _ = setup_fakes(monkeypatch)
+    ids = [OmeroId(f"G:4:Image:{x}") for x in [1, 5]]
+
+    assert transfer.from_omero.__wrapped__(fake_conn(), ids, str(tmp_path)) is False
+    assert "no original file(s) for [5] found" in capsys.readouterr().out
+    assert not downloads
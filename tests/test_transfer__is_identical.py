@@ -0,0 +1,103 @@
+"""Tests for the 'transfer.is_identical()' function and the download manifest."""
+
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+
+from hrm_omero import transfer
+
+DATA = b"some image data"
+
+SHA1 = hashlib.sha1(DATA).hexdigest()
+
+
+def test_identical(tmp_path):
+    """Test an existing file matching size and hash of the original one.
+
+    Expected behavior is True, also without a manifest entry (requiring to read it).
+    """
+    path = tmp_path / "image.tif"
+    path.write_bytes(DATA)
+    assert transfer.is_identical(str(path), len(DATA), SHA1)
+
+
+def test_different(tmp_path):
+    """Test existing files differing from the original one or having no known hash.
+
+    Expected behavior is False in all cases.
+    """
+    path = tmp_path / "image.tif"
+    path.write_bytes(DATA)
+    assert not transfer.is_identical(str(path), len(DATA) + 1, SHA1)
+    assert not transfer.is_identical(str(path), len(DATA), "0" * 40)
+    assert not transfer.is_identical(str(path), len(DATA), None)
+
+
+def test_manifest_entry(tmp_path, monkeypatch):
+    """Test an existing file recorded in the manifest.
+
+    Expected behavior is True without reading the file in case size, hash and mtime
+    match the manifest entry, reading it otherwise.
+    """
+    path = tmp_path / "image.tif"
+    path.write_bytes(DATA)
+    stat_result = path.stat()
+    transfer.write_manifest(
+        str(tmp_path),
+        {
+            "image.tif": {
+                "file_id": 42,
+                "size": len(DATA),
+                "sha1": SHA1,
+                "mtime": stat_result.st_mtime,
+            }
+        },
+    )
+    entry = transfer.read_manifest(str(tmp_path))["image.tif"]
+
+    opened = []
+    real_open = open
+
+    def tracking_open(file, *args, **kwargs):
+        opened.append(file)
+        return real_open(file, *args, **kwargs)
+
+    monkeypatch.setattr("builtins.open", tracking_open)
+    assert transfer.is_identical(str(path), len(DATA), SHA1, entry)
+    assert not opened
+
+    entry["mtime"] = stat_result.st_mtime - 10
+    assert transfer.is_identical(str(path), len(DATA), SHA1, entry)
+    assert opened == [str(path)]
+
+
+def test_read_manifest(tmp_path):
+    """Test reading a missing or broken manifest.
+
+    Expected behavior is an empty dict.
+    """
+    assert transfer.read_manifest(str(tmp_path)) == {}
+    (tmp_path / transfer.MANIFEST_NAME).write_text("{broken", encoding="utf-8")
+    assert transfer.read_manifest(str(tmp_path)) == {}
+
+
+def test_update_manifest(tmp_path):
+    """Test adding entries to the manifest from several threads at once.
+
+    Expected behavior is no entry being lost and no temporary files being left over.
+    """
+    transfer.write_manifest(str(tmp_path), {"old.tif": {"file_id": 1}})
+
+    def update(number):
+        entry = {f"image-{number}.tif": {"file_id": number}}
+        transfer.update_manifest(str(tmp_path), entry)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(update, range(2, 50)))
+
+    manifest = transfer.read_manifest(str(tmp_path))
+    assert len(manifest) == 49
+    assert manifest["image-23.tif"] == {"file_id": 23}
+    assert sorted(x.name for x in tmp_path.iterdir()) == [
+        transfer.MANIFEST_NAME,
+        f"{transfer.MANIFEST_NAME}.lock",
+    ]
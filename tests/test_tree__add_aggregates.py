@@ -0,0 +1,52 @@
+"""Tests for the 'tree.add_aggregates()' function."""
+
+from hrm_omero import tree
+
+
+def test_add_aggregates(monkeypatch):
+    """Test adding the aggregate values to a level of nodes.
+
+    Expected behavior is one query per class having aggregates, nodes missing in the
+    result getting zero values and other nodes being left unchanged.
+    """
+    queries = []
+
+    # pylint: disable-msg=unused-argument
+    def fake_query(conn, obj_class, obj_ids, ctx=None):
+        queries.append((obj_class, sorted(obj_ids)))
+        return {23: (5, 1024), 24: (0, 0), 7: (2, 2048)}
+
+    monkeypatch.setattr(tree, "query_aggregates", fake_query)
+
+    nodes = [
+        tree.gen_node_dict("Project", 7, "project", "user", "G:4:"),
+        tree.gen_node_dict("Dataset", 23, "dataset", "user", "G:4:"),
+        tree.gen_node_dict("Dataset", 24, "empty", "user", "G:4:"),
+        tree.gen_node_dict("Dataset", 25, "unknown", "user", "G:4:"),
+        tree.gen_node_dict("Image", 42, "image", "user", "G:4:"),
+    ]
+    tree.add_aggregates(None, nodes)
+
+    assert sorted(queries) == [("Dataset", [23, 24, 25]), ("Project", [7])]
+    assert (nodes[0]["child_count"], nodes[0]["total_bytes"]) == (2, 2048)
+    assert (nodes[1]["child_count"], nodes[1]["total_bytes"]) == (5, 1024)
+    assert (nodes[2]["child_count"], nodes[2]["total_bytes"]) == (0, 0)
+    assert (nodes[3]["child_count"], nodes[3]["total_bytes"]) == (0, 0)
+    assert "child_count" not in nodes[4]
+    assert "total_bytes" not in nodes[4]
+
+
+def test_no_aggregates(monkeypatch):
+    """Test a level without any nodes supporting aggregates.
+
+    Expected behavior is that no query is run at all.
+    """
+
+    # pylint: disable-msg=unused-argument
+    def fake_query(conn, obj_class, obj_ids, ctx=None):
+        raise AssertionError("query_aggregates() must not be called")
+
+    monkeypatch.setattr(tree, "query_aggregates", fake_query)
+    nodes = [tree.gen_node_dict("Image", 42, "image", "user", "G:4:")]
+    tree.add_aggregates(None, nodes)
+    assert nodes == [tree.gen_node_dict("Image", 42, "image", "user", "G:4:")]
@@ -0,0 +1,116 @@
+"""Tests for the 'tree.expand_nodes()' function."""
+
+from types import SimpleNamespace
+
+from hrm_omero import tree, treecache
+
+
+class FakeContext(dict):
+
+    """Minimal stand-in for the call context (`ServiceOptsDict`) of a connection."""
+
+    def copy(self):
+        return FakeContext(self)
+
+    def setOmeroGroup(self, group):  # pylint: disable-msg=invalid-name
+        self["omero.group"] = str(group)
+
+
+def fake_conn():
+    """Create a minimal stand-in for a (connected) BlitzGateway."""
+    context = SimpleNamespace(userName="user")
+    return SimpleNamespace(SERVICE_OPTS=FakeContext(), getEventContext=lambda: context)
+
+
+def fake_query(calls):
+    """Create a stand-in for `tree.query_children_of()` recording its calls.
+
+    Every node gets one child, having the ID of its parent increased by one.
+    """
+
+    # pylint: disable-msg=unused-argument
+    def query_children_of(conn, obj_type, obj_ids, ctx=None):
+        calls.append((ctx["omero.group"], obj_type, sorted(obj_ids)))
+        child_type = {"Experimenter": "Project", "Project": "Dataset"}[obj_type]
+        return {x: [(child_type, x + 1, f"{child_type}-{x}", "user")] for x in obj_ids}
+
+    return query_children_of
+
+
+def base_tree():
+    """Generate a minimal base tree with two groups having two members in total."""
+    trees = []
+    for group_id, user_id in [(4, 7), (4, 8), (5, 7)]:
+        if not trees or trees[-1]["id"] != f"ExperimenterGroup:{group_id}":
+            trees.append(tree.gen_node("ExperimenterGroup", group_id, "group", None))
+            trees[-1]["children"] = []
+        user = tree.gen_node("Experimenter", user_id, "User", 7, f"G:{group_id}:", True)
+        trees[-1]["children"].append(user)
+    return trees
+
+
+def test_depth(monkeypatch):
+    """Test expanding a base tree by different numbers of levels.
+
+    Expected behavior is that the `load_on_demand` flag is only kept on the nodes of
+    the lowest level that have not been expanded.
+    """
+    calls = []
+    monkeypatch.setattr(tree, "query_children_of", fake_query(calls))
+
+    nodes = base_tree()
+    tree.expand_nodes(fake_conn(), nodes, 0)
+    assert nodes == base_tree()
+    assert not calls
+
+    nodes = base_tree()
+    tree.expand_nodes(fake_conn(), nodes, 2)
+    user = nodes[0]["children"][0]
+    assert "load_on_demand" not in user
+    project = user["children"][0]
+    assert project["id"] == "G:4:Project:8"
+    assert "load_on_demand" not in project
+    dataset = project["children"][0]
+    assert dataset["id"] == "G:4:Dataset:9"
+    assert dataset["load_on_demand"] is True
+    assert not dataset["children"]
+
+
+def test_single_query_per_level(monkeypatch):
+    """Test the number of queries needed for expanding several nodes.
+
+    Expected behavior is one query per level, group and class, using the group of the
+    nodes in the call context without (re-)connecting or switching the session group.
+    """
+    calls = []
+    monkeypatch.setattr(tree, "query_children_of", fake_query(calls))
+    monkeypatch.setattr(tree, "gen_children", None)  # must not be called
+
+    nodes = base_tree()
+    tree.expand_nodes(fake_conn(), nodes, 2)
+    assert calls == [
+        ("4", "Experimenter", [7, 8]),
+        ("5", "Experimenter", [7]),
+        ("4", "Project", [8, 9]),
+        ("5", "Project", [8]),
+    ]
+
+
+def test_cache(monkeypatch, tmp_path):
+    """Test expanding nodes using a tree cache.
+
+    Expected behavior is the children being queried only once and taken from the
+    cache when expanding the same nodes again.
+    """
+    calls = []
+    monkeypatch.setattr(tree, "query_children_of", fake_query(calls))
+    cache = treecache.TreeCache(str(tmp_path / "tree.db"))
+
+    first = base_tree()
+    tree.expand_nodes(fake_conn(), first, 1, cache)
+    assert len(calls) == 2
+
+    second = base_tree()
+    tree.expand_nodes(fake_conn(), second, 1, cache)
+    assert len(calls) == 2
+    assert second == first
@@ -0,0 +1,45 @@
+"""Tests for the 'tree.gen_base_tree()' and 'tree.gen_group_tree()' functions."""
+
+import json
+from types import SimpleNamespace
+
+from hrm_omero import tree, treecache, treenode
+
+MEMBERS = [
+    (4, "group", 7, "user", "Some", "", "User"),
+    (4, "group", 9, "other", "Another", "", "User"),
+    (5, "lab", 7, "user", "Some", "", "User"),
+]
+
+
+def fake_conn():
+    """Create a minimal stand-in for a BlitzGateway of the user with ID 7."""
+    context = SimpleNamespace(userName="user")
+    return SimpleNamespace(getUserId=lambda: 7, getEventContext=lambda: context)
+
+
+def test_serializable(monkeypatch, tmp_path):
+    """Test serializing the generated trees using `treenode.json_default()`.
+
+    Expected behavior is the same JSON structure as for plain dicts, also when the trees
+    are read from the cache.
+    """
+    # pylint: disable-msg=unused-argument
+    def query_group_members(conn, gid=None):
+        return [x for x in MEMBERS if gid is None or x[0] == int(gid)]
+
+    monkeypatch.setattr(tree, "query_group_members", query_group_members)
+    monkeypatch.setattr(tree, "query_hidden_groups", lambda conn, gids: set())
+    cache = treecache.TreeCache(str(tmp_path / "tree.db"))
+
+    for _ in range(2):  # the second round reads the trees from the cache
+        base_tree = tree.gen_base_tree(fake_conn(), cache)
+        decoded = json.loads(json.dumps(base_tree, default=treenode.json_default))
+        assert decoded == treenode.to_dicts(base_tree)
+        assert [x["label"] for x in decoded] == ["group", "lab"]
+        assert decoded[0]["children"][0]["id"] == "G:4:Experimenter:7"
+        assert decoded[0]["children"][0]["load_on_demand"] is True
+
+        group_tree = tree.gen_group_tree(fake_conn(), 4, cache)
+        serialized = json.dumps(group_tree, default=treenode.json_default)
+        assert json.loads(serialized) == decoded[0]
@@ -0,0 +1,62 @@
+"""Tests for the 'tree.group_trees_from_members()' function."""
+
+from hrm_omero import tree
+
+MEMBERS = [
+    (4, "lab", 9, "zoe", "Zoe", "", "Zed"),
+    (4, "lab", 7, "me", "Jane", "Mary", "Doe"),
+    (4, "lab", 8, "anon", "", "", ""),
+    (5, "facility", 7, "me", "Jane", "Mary", "Doe"),
+]
+
+
+def test_structure():
+    """Test assembling the group trees from a list of memberships.
+
+    Expected behavior is one tree per group, each starting with the current user
+    followed by the other members sorted by their label.
+    """
+    trees = {x["id"]: x for x in tree.group_trees_from_members(MEMBERS, 7)}
+    assert sorted(trees) == ["ExperimenterGroup:4", "ExperimenterGroup:5"]
+
+    lab = trees["ExperimenterGroup:4"]
+    assert lab["label"] == "lab"
+    assert lab["owner"] is None
+    assert [x["id"] for x in lab["children"]] == [
+        "G:4:Experimenter:7",
+        "G:4:Experimenter:8",
+        "G:4:Experimenter:9",
+    ]
+    assert [x["label"] for x in lab["children"]] == ["Jane Mary Doe", "anon", "Zoe Zed"]
+    assert lab["children"][0] == {
+        "children": [],
+        "class": "Experimenter",
+        "id": "G:4:Experimenter:7",
+        "label": "Jane Mary Doe",
+        "load_on_demand": True,
+        "owner": 7,
+    }
+
+    facility = trees["ExperimenterGroup:5"]
+    assert [x["id"] for x in facility["children"]] == ["G:5:Experimenter:7"]
+
+
+def test_empty():
+    """Test with no memberships (e.g. for a group the user is not a member of).
+
+    Expected behavior is an empty list.
+    """
+    assert tree.group_trees_from_members([], 7) == []
+
+
+def test_private_group():
+    """Test assembling the tree of a group whose members must be hidden.
+
+    Expected behavior is the group only containing the current user.
+    """
+    trees = tree.group_trees_from_members(MEMBERS, 7, hidden={4})
+    trees = {x["id"]: x for x in trees}
+    lab = trees["ExperimenterGroup:4"]
+    assert [x["id"] for x in lab["children"]] == ["G:4:Experimenter:7"]
+    facility = trees["ExperimenterGroup:5"]
+    assert [x["id"] for x in facility["children"]] == ["G:5:Experimenter:7"]
@@ -0,0 +1,45 @@
+"""Tests for the 'tree.iter_children()' function."""
+
+from hrm_omero import tree
+from hrm_omero.misc import OmeroId
+
+
+def fake_query(calls, count):
+    """Create a stand-in for `tree.query_children()` recording its calls."""
+
+    # pylint: disable-msg=unused-argument
+    def query_children(conn, omero_id, offset=0, limit=None):
+        calls.append((offset, limit))
+        end = count if limit is None else min(offset + limit, count)
+        return [("Image", i, f"image_{i:03}", "user") for i in range(offset, end)]
+
+    return query_children
+
+
+def test_chunks(monkeypatch):
+    """Test streaming the children of a dataset.
+
+    Expected behavior is one query per chunk, each with its own offset.
+    """
+    calls = []
+    monkeypatch.setattr(tree, "query_children", fake_query(calls, 5))
+    omero_id = OmeroId("G:4:Dataset:23")
+
+    children = list(tree.iter_children.__wrapped__(None, omero_id, chunk_size=2))
+    assert [x["id"] for x in children] == [f"G:4:Image:{i}" for i in range(5)]
+    assert calls == [(0, 2), (2, 2), (4, 2)]
+
+
+def test_several_queries(monkeypatch):
+    """Test streaming the children of a user (requiring two queries).
+
+    Expected behavior is the children being fetched only once (instead of once per
+    chunk), all of them being yielded.
+    """
+    calls = []
+    monkeypatch.setattr(tree, "query_children", fake_query(calls, 5))
+    omero_id = OmeroId("G:4:Experimenter:7")
+
+    children = list(tree.iter_children.__wrapped__(None, omero_id, chunk_size=2))
+    assert len(children) == 5
+    assert calls == [(0, None)]
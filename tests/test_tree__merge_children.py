@@ -0,0 +1,29 @@
+"""Tests for the 'tree.merge_children()' function."""
+
+from hrm_omero import tree
+
+# the rows as sorted by a database collation ignoring punctuation:
+PROJECTS = [
+    ("Project", 1, "a", "user"),
+    ("Project", 2, "_b", "user"),
+    ("Project", 3, "c", "user"),
+]
+DATASETS = [
+    ("Dataset", 4, "_a", "user"),
+    ("Dataset", 5, "b", "user"),
+    ("Dataset", 6, "B", "user"),
+]
+
+
+def test_pages():
+    """Test slicing the merged rows into pages.
+
+    Expected behavior is a consistent order, the pages neither overlapping nor skipping
+    any rows even if the server sorted the names differently.
+    """
+    merged = tree.merge_children([PROJECTS, DATASETS])
+    assert [row[2] for row in merged] == ["_a", "_b", "a", "b", "B", "c"]
+
+    pages = [tree.merge_children([PROJECTS, DATASETS], x, 2) for x in range(0, 6, 2)]
+    assert [row for page in pages for row in page] == merged
+    assert tree.merge_children([PROJECTS, DATASETS], 5, 10) == [merged[-1]]
@@ -0,0 +1,41 @@
+"""Tests for the 'tree.parse_since()' function."""
+
+import time
+
+import pytest
+
+from hrm_omero import tree
+
+
+def test_etag():
+    """Test parsing an etag.
+
+    Expected behavior is to get the event ID.
+    """
+    assert tree.parse_since("E123456") == ("id", 123456)
+
+
+def test_timestamp():
+    """Test parsing Unix timestamps and ISO 8601 dates.
+
+    Expected behavior is to get the time in milliseconds.
+    """
+    assert tree.parse_since("1637767800") == ("time", 1637767800000)
+    assert tree.parse_since("1637767800.5") == ("time", 1637767800500)
+
+    expected = int(time.mktime((2021, 11, 24, 16, 30, 0, 0, 0, -1)) * 1000)
+    assert tree.parse_since("2021-11-24T16:30:00") == ("time", expected)
+    assert tree.parse_since("2021-11-24 16:30:00") == ("time", expected)
+    assert tree.parse_since("2021-11-24T16:30") == ("time", expected)
+
+
+@pytest.mark.parametrize(
+    "since", ["", "E", "E12a", "yesterday", "2021-13-01", "inf", "-inf", "nan", "1e400"]
+)
+def test_invalid(since):
+    """Test parsing invalid values.
+
+    Expected behavior is a ValueError being raised.
+    """
+    with pytest.raises(ValueError):
+        tree.parse_since(since)
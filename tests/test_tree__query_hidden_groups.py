@@ -0,0 +1,45 @@
+"""Tests for the 'tree.query_hidden_groups()' function."""
+
+from types import SimpleNamespace
+
+from hrm_omero import tree
+
+PRIVATE = {4: True, 5: False, 6: True}
+
+
+def fake_conn(is_admin=False, leader_of=()):
+    """Create a minimal stand-in for a BlitzGateway knowing the groups in `PRIVATE`."""
+    context = SimpleNamespace(isAdmin=is_admin, leaderOfGroups=list(leader_of))
+
+    def get_objects(obj_type, ids):
+        assert obj_type == "ExperimenterGroup"
+        return [
+            SimpleNamespace(getId=lambda x=x: x, isPrivate=lambda x=x: PRIVATE[x])
+            for x in ids
+        ]
+
+    return SimpleNamespace(getEventContext=lambda: context, getObjects=get_objects)
+
+
+def test_member():
+    """Test with a regular member of the groups.
+
+    Expected behavior is all private groups being hidden.
+    """
+    assert tree.query_hidden_groups(fake_conn(), [4, 5, 6]) == {4, 6}
+
+
+def test_leader():
+    """Test with the leader of a private group.
+
+    Expected behavior is the group led by the user not being hidden.
+    """
+    assert tree.query_hidden_groups(fake_conn(leader_of=[4]), [4, 5, 6]) == {6}
+
+
+def test_admin():
+    """Test with an administrator.
+
+    Expected behavior is no group being hidden.
+    """
+    assert tree.query_hidden_groups(fake_conn(is_admin=True), [4, 5, 6]) == set()
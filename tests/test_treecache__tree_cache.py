@@ -0,0 +1,140 @@
+"""Tests for the 'treecache.TreeCache' class and the 'treecache.cached()' function."""
+
+import os
+import stat
+import threading
+from types import SimpleNamespace
+
+from hrm_omero import treecache
+
+NODES = [{"id": "G:4:Image:42", "label": "foo", "class": "Image", "children": []}]
+
+
+class FakeConnection:
+
+    """Minimal stand-in for a BlitzGateway, only providing the event context."""
+
+    def __init__(self, user):
+        self.user = user
+
+    def getEventContext(self):  # pylint: disable-msg=invalid-name
+        return SimpleNamespace(userName=self.user)
+
+
+def test_put_get(tmp_path):
+    """Test storing and retrieving a node.
+
+    Expected behavior is to get the node back for the same key only and the database
+    being accessible by the owner only.
+    """
+    path = (tmp_path / "cache" / "tree.db").as_posix()
+    cache = treecache.TreeCache(path)
+    assert cache.get("user1", 4, "G:4:Dataset:23") is None
+
+    cache.put("user1", 4, "G:4:Dataset:23", NODES)
+    assert cache.get("user1", 4, "G:4:Dataset:23") == NODES
+    assert cache.get("user1", "4", "G:4:Dataset:23") == NODES
+    assert cache.get("user2", 4, "G:4:Dataset:23") is None
+    assert cache.get("user1", 5, "G:4:Dataset:23") is None
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+
+
+def test_expired(tmp_path):
+    """Test retrieving an expired node.
+
+    Expected behavior is a cache miss.
+    """
+    cache = treecache.TreeCache((tmp_path / "tree.db").as_posix(), ttl=-1)
+    cache.put("user1", 4, "G:4:Dataset:23", NODES)
+    assert cache.get("user1", 4, "G:4:Dataset:23") is None
+
+
+def test_unusable_path(tmp_path):
+    """Test a cache whose database file can't be created.
+
+    Expected behavior is that all operations behave like a cache miss instead of
+    raising an error.
+    """
+    blocker = tmp_path / "not-a-directory"
+    blocker.write_text("", encoding="utf-8")
+    cache = treecache.TreeCache((blocker / "tree.db").as_posix())
+    cache.put("user1", 4, "G:4:Dataset:23", NODES)
+    assert cache.get("user1", 4, "G:4:Dataset:23") is None
+    cache.invalidate("G:4:Dataset:23")
+
+    conn = FakeConnection("user1")
+    assert treecache.cached(cache, conn, 4, "G:4:Dataset:23", lambda: NODES) == NODES
+
+
+def test_invalidate(tmp_path):
+    """Test invalidating a node cached for several users.
+
+    Expected behavior is that the entries of all users (including paginated ones) are
+    removed, others are kept.
+    """
+    cache = treecache.TreeCache((tmp_path / "tree.db").as_posix())
+    cache.put("user1", 4, "G:4:Dataset:23", NODES)
+    cache.put("user2", 4, "G:4:Dataset:23", NODES)
+    cache.put("user1", 4, "G:4:Dataset:24", NODES)
+    cache.put("user1", 4, "G:4:Dataset:23#0:50", NODES)
+
+    cache.invalidate("G:4:Dataset:23")
+    assert cache.get("user1", 4, "G:4:Dataset:23") is None
+    assert cache.get("user1", 4, "G:4:Dataset:23#0:50") is None
+    assert cache.get("user2", 4, "G:4:Dataset:23") is None
+    assert cache.get("user1", 4, "G:4:Dataset:24") == NODES
+
+
+def test_cached(tmp_path):
+    """Test the `cached()` helper function.
+
+    Expected behavior is to generate a node only once per user.
+    """
+    cache = treecache.TreeCache((tmp_path / "tree.db").as_posix())
+    calls = []
+
+    def generate():
+        calls.append(1)
+        return NODES
+
+    for user in ["user1", "user1", "user2"]:
+        conn = FakeConnection(user)
+        assert treecache.cached(cache, conn, 4, "G:4:Dataset:23", generate) == NODES
+    assert len(calls) == 2
+
+    assert treecache.cached(None, None, 4, "G:4:Dataset:23", generate) == NODES
+    assert len(calls) == 3
+
+
+def test_concurrent_access(tmp_path):
+    """Test using the cache from several threads at the same time.
+
+    Expected behavior is that all entries are stored.
+    """
+    cache = treecache.TreeCache((tmp_path / "tree.db").as_posix())
+    threads = [
+        threading.Thread(target=cache.put, args=(f"user{i}", 4, "ROOT", NODES))
+        for i in range(10)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for i in range(10):
+        assert cache.get(f"user{i}", 4, "ROOT") == NODES
+
+
+def test_from_config(tmp_path):
+    """Test creating the cache from the HRM configuration.
+
+    Expected behavior is `None` unless a cache file is configured.
+    """
+    assert treecache.from_config({}) is None
+
+    path = (tmp_path / "tree.db").as_posix()
+    cache = treecache.from_config({"OMERO_CONNECTOR_TREE_CACHE": path})
+    assert cache.ttl == treecache.TREE_CACHE_TTL
+
+    config = {"OMERO_CONNECTOR_TREE_CACHE": path, "OMERO_CONNECTOR_TREE_CACHE_TTL": "5"}
+    assert treecache.from_config(config).ttl == 5
@@ -0,0 +1,73 @@
+"""Memory benchmark of the tree node representations.
+
+A synthetic listing of 100'000 image nodes is generated and serialized once using the
+production path (`tree.gen_children()` followed by the compact
+`formatting.tree_to_json()`, i.e. `treenode.TreeNode` objects serialized through
+`treenode.json_default()`) and once using dicts (as created by `tree.gen_node_dict()`)
+serialized by the same function, which corresponds to the former implementation. The
+rows returned by the (fake) OMERO query are created in advance, as they are the same
+for both. The peak memory is measured using `tracemalloc`, together with the time
+spent.
+
+Use `pytest -s` to see the measured values.
+"""
+
+import time
+import tracemalloc
+
+from hrm_omero import formatting, tree
+from hrm_omero.misc import OmeroId
+
+NODE_COUNT = 100000
+
+
+def measure(function):
+    """Measure the peak memory allocated and the time spent by a function.
+
+    Parameters
+    ----------
+    function : callable
+        The function to call (without any arguments), returning the serialized tree.
+
+    Returns
+    -------
+    (int, float, str)
+        The peak number of bytes allocated, the duration in seconds and the result.
+    """
+    tracemalloc.start()
+    try:
+        start = time.perf_counter()
+        result = function()
+        duration = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return peak, duration, result
+
+
+def test_benchmark(monkeypatch):
+    """Compare generating and serializing the children using dicts and `TreeNode`s.
+
+    Expected behavior is the same JSON for both, the production path requiring less
+    memory than the dicts.
+    """
+    rows = [("Image", i, f"image_{i:06}.tif", "somebody") for i in range(NODE_COUNT)]
+    # pylint: disable-msg=unused-argument
+    monkeypatch.setattr(tree, "query_children", lambda conn, omero_id, *args: rows)
+    omero_id = OmeroId("G:4:Dataset:1")
+
+    def production():
+        children = tree.gen_children.__wrapped__(None, omero_id)
+        return formatting.tree_to_json(children, compact=True)
+
+    def baseline():
+        children = [tree.gen_node_dict(*row, "G:4:") for row in rows]
+        return formatting.tree_to_json(children, compact=True)
+
+    node_bytes, node_time, node_json = measure(production)
+    dict_bytes, dict_time, dict_json = measure(baseline)
+    print(f"dict:     {dict_bytes / NODE_COUNT:.0f} bytes per node, {dict_time:.2f}s")
+    print(f"TreeNode: {node_bytes / NODE_COUNT:.0f} bytes per node, {node_time:.2f}s")
+
+    assert node_json == dict_json
+    assert node_bytes < dict_bytes
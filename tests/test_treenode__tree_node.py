@@ -0,0 +1,81 @@
+"""Tests for the 'treenode.TreeNode' class and its JSON helper functions."""
+
+import json
+
+import pytest
+
+from hrm_omero import tree, treenode
+
+
+def test_dict_interface():
+    """Test accessing a node like the dict created by `tree.gen_node_dict()`.
+
+    Expected behavior is the same values, keys and equality as for the dict.
+    """
+    node = tree.gen_node("Dataset", 23, "dataset", "someone", "G:4:", True)
+    node_dict = tree.gen_node_dict("Dataset", 23, "dataset", "someone", "G:4:")
+    node_dict["load_on_demand"] = True
+    assert node == node_dict
+
+    for key in ["class", "id", "label", "owner", "load_on_demand"]:
+        assert key in node
+        assert node[key] == node_dict[key]
+    # nodes without children share an (immutable) empty tuple:
+    assert node["children"] == ()
+    assert "child_count" not in node
+    assert node.get("child_count", 5) == 5
+    with pytest.raises(KeyError):
+        node["total_bytes"]  # pylint: disable-msg=pointless-statement
+
+    assert node.pop("load_on_demand", False) is True
+    assert "load_on_demand" not in node
+    assert node.pop("load_on_demand", False) is False
+
+    node["child_count"] = 0
+    assert node["child_count"] == 0
+    node["children"] = [tree.gen_node("Image", 42, "image", "someone", "G:4:")]
+    assert node["children"][0]["id"] == "G:4:Image:42"
+
+
+def test_immutable():
+    """Test modifying the identifying items of a node.
+
+    Expected behavior is a KeyError being raised.
+    """
+    node = tree.gen_node("Dataset", 23, "dataset", "someone", "G:4:")
+    for key in ["class", "id", "label", "owner", "path"]:
+        with pytest.raises(KeyError):
+            node[key] = "foo"
+    with pytest.raises(KeyError):
+        node.pop("id")
+    with pytest.raises(AttributeError):
+        node.path = "foo"  # pylint: disable-msg=assigning-non-slot
+
+
+def test_json():
+    """Test serializing nodes to JSON and reading them back.
+
+    Expected behavior is the same JSON as for the dicts and equal nodes when reading it
+    back, other objects are left unchanged.
+    """
+    node = tree.gen_node("Project", 12, "project", "someone", "G:4:")
+    node["children"] = [tree.gen_node("Dataset", 23, "dataset", "someone", "G:4:")]
+    node["children"][0]["total_bytes"] = 1024
+    node_dict = tree.gen_node_dict("Project", 12, "project", "someone", "G:4:")
+    child_dict = tree.gen_node_dict("Dataset", 23, "dataset", "someone", "G:4:")
+    child_dict["total_bytes"] = 1024
+    node_dict["children"].append(child_dict)
+
+    page = {"children": [node], "total": 1}
+    serialized = json.dumps(page, sort_keys=True, default=treenode.json_default)
+    expected = json.dumps({"children": [node_dict], "total": 1}, sort_keys=True)
+    assert serialized == expected
+
+    loaded = json.loads(serialized, object_hook=treenode.from_json)
+    assert isinstance(loaded, dict)
+    assert isinstance(loaded["children"][0], treenode.TreeNode)
+    assert isinstance(loaded["children"][0]["children"][0], treenode.TreeNode)
+    assert loaded == {"children": [node_dict], "total": 1}
+
+    with pytest.raises(TypeError):
+        json.dumps(object(), default=treenode.json_default)